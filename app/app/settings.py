@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "core",
     "rest_framework",
     "rest_framework.authtoken",
@@ -47,6 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.InstrumentationMiddleware",
+    "core.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -80,16 +84,211 @@ WSGI_APPLICATION = "app.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+#
+# Connections come from an in-process pool (core.db.pool) and go back
+# to it at the end of each request. DB_POOL_MAX_SIZE=0 turns the pool
+# off, set DB_CONN_MAX_AGE then to keep connections open per thread.
+#
+# Every thread of a web worker that may query at once gets a connection
+# by default: the ASGI_THREADS view threads, the ASGI_STREAM_THREADS
+# threads streaming response bodies (core.asgi) and Django's thread for
+# other sync views. A host opens up to WEB_CONCURRENCY times as many,
+# which must stay below the server's max_connections.
+
+# Serve viewsets using core.views.AsyncViewSetMixin as async views from a
+# pool of ASGI_THREADS threads. Turned on by app/asgi.py.
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "").lower() in ("1", "true")
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", 32))
+# Streamed responses (exports) sent at once per worker, more wait
+ASGI_STREAM_THREADS = int(os.environ.get("ASGI_STREAM_THREADS", 4))
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "core.db.postgresql",
         "HOST": os.environ.get("HOST_DB"),
         "NAME": os.environ.get("DB_NAME"),
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASS"),
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 0)),
+        "POOL": {
+            "MAX_SIZE": int(
+                os.environ.get(
+                    "DB_POOL_MAX_SIZE", ASGI_THREADS + ASGI_STREAM_THREADS + 1
+                )
+            ),
+            "TIMEOUT": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+            "MAX_LIFETIME": float(
+                os.environ.get("DB_POOL_MAX_LIFETIME", 3600)
+            ),
+            "HEALTH_CHECK_AFTER": float(
+                os.environ.get("DB_POOL_HEALTH_CHECK_AFTER", 30)
+            ),
+        },
     }
 }
 
+# Streaming replicas of the default database, as comma separated hosts.
+# core.db.router sends the reads of safe recipe and tag requests there.
+DATABASE_REPLICAS = []
+for _index, _host in enumerate(
+    filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(","))
+):
+    DATABASES[f"replica_{_index}"] = {
+        **DATABASES["default"],
+        "HOST": _host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{_index}")
+
+DATABASE_ROUTERS = ["core.db.router.ReplicaRouter"]
+# Seconds reads stay on the primary after the user writes
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 5))
+# Cache shared by every process so pins reach every worker. Checked on
+# start up when DATABASE_REPLICAS are configured.
+REPLICA_PIN_CACHE_ALIAS = os.environ.get("REPLICA_PIN_CACHE_ALIAS", "shared")
+# Replicas further behind than this many seconds aren't read from
+REPLICA_MAX_LAG = float(os.environ.get("REPLICA_MAX_LAG", 5))
+REPLICA_CHECK_INTERVAL = float(os.environ.get("REPLICA_CHECK_INTERVAL", 5))
+
+
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+#
+# The "api" cache holds rendered recipe API data per user. Point
+# API_CACHE_BACKEND at django.core.cache.backends.filebased.FileBasedCache
+# (with a directory as API_CACHE_LOCATION) or a Redis backend such as
+# django_redis.cache.RedisCache (with a redis:// URL) to share it between
+# processes.
+#
+# The "shared" cache must be seen by every web worker and run_worker: it
+# holds the per-user data versions the "api" entries are keyed on. It
+# defaults to a table of the default database (created by `manage.py
+# createcachetable`); memcached or Redis through SHARED_CACHE_BACKEND and
+# SHARED_CACHE_LOCATION save the query per request.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": os.environ.get(
+            "SHARED_CACHE_BACKEND",
+            "django.core.cache.backends.db.DatabaseCache",
+        ),
+        "LOCATION": os.environ.get("SHARED_CACHE_LOCATION", "shared_cache"),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(
+                os.environ.get("SHARED_CACHE_MAX_ENTRIES", 1000000)
+            ),
+        },
+    },
+    "api": {
+        "BACKEND": os.environ.get(
+            "API_CACHE_BACKEND", "core.cache.LRUMemoryCache"
+        ),
+        "LOCATION": os.environ.get("API_CACHE_LOCATION", "recipe-api"),
+        "TIMEOUT": int(os.environ.get("API_CACHE_TIMEOUT", 300)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("API_CACHE_MAX_ENTRIES", 100000)),
+            "MAX_BYTES": int(os.environ.get("API_CACHE_MAX_BYTES", 64 << 20)),
+        },
+    },
+    # Request counters of core.throttling.SlidingWindowThrottle, point it
+    # at a shared backend (e.g. Redis) to limit across processes
+    "ratelimit": {
+        "BACKEND": os.environ.get(
+            "RATE_LIMIT_CACHE_BACKEND", "core.cache.LRUMemoryCache"
+        ),
+        "LOCATION": os.environ.get("RATE_LIMIT_CACHE_LOCATION", "ratelimit"),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(
+                os.environ.get("RATE_LIMIT_CACHE_SIZE", 100000)
+            ),
+        },
+    },
+    # token -> user lookups of user.authentication.CachedTokenAuthentication
+    "auth": {
+        "BACKEND": "core.cache.LRUMemoryCache",
+        "TIMEOUT": int(os.environ.get("AUTH_TOKEN_CACHE_TTL", 60)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", 10000)),
+        },
+    },
+}
+
+API_CACHE_ALIAS = "api"
+# Per-user data versions of the "api" entries, bumped on writes
+API_CACHE_VERSION_ALIAS = os.environ.get("API_CACHE_VERSION_ALIAS", "shared")
+
+AUTH_TOKEN_CACHE_ALIAS = "auth"
+
+RATE_LIMIT_CACHE_ALIAS = "ratelimit"
+
+# Content codings of core.middleware.CompressionMiddleware, preferred
+# first; br and zstd are offered when brotli and zstandard are installed
+COMPRESSION_ENCODINGS = os.environ.get(
+    "COMPRESSION_ENCODINGS", "br,zstd,gzip"
+).split(",")
+# Smaller bodies aren't worth compressing
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(
+    os.environ.get("COMPRESSION_BROTLI_QUALITY", 5)
+)
+COMPRESSION_ZSTD_LEVEL = int(os.environ.get("COMPRESSION_ZSTD_LEVEL", 3))
+# Holds compressed bodies next to the cached API responses they encode
+COMPRESSION_CACHE_ALIAS = API_CACHE_ALIAS
+
+# Optional CACHES alias shared between processes (e.g. "api" when that is
+# Redis) consulted after the in-process token cache
+AUTH_TOKEN_SHARED_CACHE_ALIAS = os.environ.get("AUTH_TOKEN_SHARED_CACHE_ALIAS")
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+#
+# New passwords are hashed with PASSWORD_HASHER (argon2 needs
+# argon2-cffi, bcrypt needs bcrypt). Hashes made by the others or with
+# other costs are upgraded on the next successful login.
+
+_PASSWORD_HASHERS = {
+    "argon2": "core.hashers.Argon2PasswordHasher",
+    "bcrypt": "core.hashers.BCryptSHA256PasswordHasher",
+    "pbkdf2": "core.hashers.PBKDF2PasswordHasher",
+}
+PASSWORD_HASHER = os.environ.get("PASSWORD_HASHER", "pbkdf2")
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path
+    for name, path in _PASSWORD_HASHERS.items()
+    if name != PASSWORD_HASHER
+]
+
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", 2))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", 102400))
+ARGON2_PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", 8))
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+PBKDF2_ITERATIONS = int(os.environ.get("PBKDF2_ITERATIONS", 260000))
+
+# Web server worker processes, as started by gunicorn.conf.py. With more
+# than one, API_CACHE_VERSION_ALIAS must name a shared cache.
+WEB_CONCURRENCY = int(
+    os.environ.get("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1)
+)
+
+# Hashes computed at once per process, and how many more may wait. A
+# host hashes up to PASSWORD_HASHING_WORKERS * WEB_CONCURRENCY passwords
+# at once, so by default the CPUs are split between the web workers.
+PASSWORD_HASHING_WORKERS = int(
+    os.environ.get(
+        "PASSWORD_HASHING_WORKERS",
+        max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY),
+    )
+)
+PASSWORD_HASHING_QUEUE = int(os.environ.get("PASSWORD_HASHING_QUEUE", 64))
+PASSWORD_HASHING_TIMEOUT = float(
+    os.environ.get("PASSWORD_HASHING_TIMEOUT", 5)
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -129,6 +328,30 @@ USE_TZ = True
 
 STATIC_URL = "/static/"
 
+# Uploaded files, served by core.views.media_view
+MEDIA_URL = "/media/"
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", BASE_DIR / "media")
+# Seconds media may be cached for, names change with the content
+MEDIA_MAX_AGE = int(os.environ.get("MEDIA_MAX_AGE", 365 * 24 * 3600))
+
+# Recipe images: largest upload in bytes and pixels, and the bounding
+# boxes and format of the thumbnails made for them by the task workers
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.environ.get("RECIPE_IMAGE_MAX_SIZE", 10 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get("RECIPE_IMAGE_MAX_PIXELS", 50_000_000)
+)
+RECIPE_IMAGE_THUMBNAIL_SIZES = [
+    int(size)
+    for size in os.environ.get(
+        "RECIPE_IMAGE_THUMBNAIL_SIZES", "160,480,1024"
+    ).split(",")
+]
+RECIPE_IMAGE_THUMBNAIL_FORMAT = os.environ.get(
+    "RECIPE_IMAGE_THUMBNAIL_FORMAT", "WEBP"
+)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -138,4 +361,74 @@ AUTH_USER_MODEL = "core.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # JSON through orjson, falling back to the json module without it
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    "DEFAULT_THROTTLE_CLASSES": ["core.throttling.SlidingWindowThrottle"],
+    # Proxies in front of the app appending to X-Forwarded-For; with 0
+    # rate limited clients are told apart by REMOTE_ADDR
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
 }
+
+# Request budgets per view throttle_scope (or "<scope>:<action>") as
+# requests/period, e.g. 100/min or 5/10s. Counted per user, or per IP
+# for anonymous requests, over a sliding window. Override or disable
+# (empty budget) some with RATE_LIMITS="token=10/min,tags=".
+RATE_LIMITS = {
+    "token": "20/min",
+    "user-create": "20/hour",
+    "user": "120/min",
+    "recipes": "600/min",
+    "recipes:bulk": "30/min",
+    "recipes:export": "10/min",
+    "recipes:upload_image": "30/min",
+    "tags": "600/min",
+}
+RATE_LIMITS.update(
+    item.split("=", 1)
+    for item in os.environ.get("RATE_LIMITS", "").split(",")
+    if item
+)
+
+# Background tasks (core.tasks): attempts before a task is given up,
+# seconds before a task still running is considered lost and rerun,
+# first retry delay (doubling on each retry) and run_worker processes
+TASK_MAX_ATTEMPTS = int(os.environ.get("TASK_MAX_ATTEMPTS", 3))
+TASK_VISIBILITY_TIMEOUT = int(os.environ.get("TASK_VISIBILITY_TIMEOUT", 300))
+TASK_RETRY_DELAY = int(os.environ.get("TASK_RETRY_DELAY", 10))
+TASK_WORKER_PROCESSES = int(os.environ.get("TASK_WORKER_PROCESSES", 2))
+
+# Default number of items per page on the paginated list endpoints
+API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", 50))
+
+# Fraction of requests timed by core.middleware.InstrumentationMiddleware
+INSTRUMENTATION_SAMPLE_RATE = float(
+    os.environ.get("INSTRUMENTATION_SAMPLE_RATE", 0.01)
+)
+# Identical SQL run this many times in one request is logged as an N+1
+INSTRUMENTATION_DUPLICATE_THRESHOLD = int(
+    os.environ.get("INSTRUMENTATION_DUPLICATE_THRESHOLD", 3)
+)
+
+# Directory shared by all workers of a host for aggregating /metrics,
+# metrics are per process when unset. Empty it when the server starts.
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 5))
+# Who may scrape /metrics: requests with "Authorization: Bearer
+# <METRICS_TOKEN>" when it is set, and clients (by REMOTE_ADDR) in
+# METRICS_ALLOWED_NETWORKS. Everyone else gets a 403.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_ALLOWED_NETWORKS = [
+    network.strip()
+    for network in os.environ.get(
+        "METRICS_ALLOWED_NETWORKS", "127.0.0.1/32,::1/128"
+    ).split(",")
+    if network.strip()
+]
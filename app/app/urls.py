@@ -17,8 +17,11 @@ from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularSwaggerView,
 )
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from core.views import media_view, metrics_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -30,4 +33,10 @@ urlpatterns = [
     ),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
+    path("metrics", metrics_view, name="metrics"),
+    re_path(
+        r"^%s(?P<path>.*)$" % settings.MEDIA_URL.lstrip("/"),
+        media_view,
+        name="media",
+    ),
 ]
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import signals  # noqa: F401
+        from core.cache import require_shared
+
+        if settings.DATABASE_REPLICAS:
+            require_shared(
+                "REPLICA_PIN_CACHE_ALIAS",
+                "between processes when DATABASE_REPLICAS are configured",
+            )
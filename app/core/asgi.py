@@ -0,0 +1,105 @@
+"""
+ASGI handler streaming responses from a thread instead of the event loop
+"""
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.handlers import asgi
+from django.db import connections
+
+_END = object()
+# Event loop -> semaphore bounding the streams it sends at once
+_streams = weakref.WeakKeyDictionary()
+
+
+def _stream_slots():
+    """Return the semaphore of the running loop, ASGI_STREAM_THREADS"""
+    loop = asyncio.get_running_loop()
+    if loop not in _streams:
+        _streams[loop] = asyncio.Semaphore(settings.ASGI_STREAM_THREADS)
+    return _streams[loop]
+
+
+def _headers(response):
+    """Return the response headers and cookies as ASGI header pairs"""
+    headers = []
+    for header, value in response.items():
+        if isinstance(header, str):
+            header = header.encode("ascii")
+        if isinstance(value, str):
+            value = value.encode("latin1")
+        headers.append((bytes(header), bytes(value)))
+    for cookie in response.cookies.values():
+        headers.append(
+            (b"Set-Cookie", cookie.output(header="").encode("ascii").strip())
+        )
+    return headers
+
+
+def _finish(response):
+    """Close the response and this thread's database connections"""
+    try:
+        response.close()
+    finally:
+        connections.close_all()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """Django's ASGI handler, iterating streamed bodies off the event loop
+
+    Django 3.2 iterates streaming responses on the event loop, where
+    generators reading the database raise SynchronousOnlyOperation.
+    """
+
+    async def send_response(self, response, send):
+        """Send the response, pulling streamed parts in a worker thread
+
+        All parts come from the same thread, which also closes the
+        response, so generators keep their database connection and
+        server-side cursor for the whole body. At most
+        ASGI_STREAM_THREADS bodies are streamed at once, so these
+        threads fit in the database connection pool.
+        """
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        async with _stream_slots():
+            await self._send_streaming(response, send)
+
+    async def _send_streaming(self, response, send):
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": _headers(response),
+        })
+        loop = asyncio.get_running_loop()
+        parts = iter(response)
+        executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="asgi-stream"
+        )
+        try:
+            while True:
+                part = await loop.run_in_executor(
+                    executor, next, parts, _END
+                )
+                if part is _END:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": True,
+                    })
+            await send({"type": "http.response.body"})
+        finally:
+            await loop.run_in_executor(executor, _finish, response)
+            executor.shutdown(wait=False)
+
+
+def get_asgi_application():
+    """Set up Django and return the ASGI application"""
+    django.setup(set_prefix=False)
+    return ASGIHandler()
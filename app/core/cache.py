@@ -0,0 +1,178 @@
+"""
+In-process LRU cache backend bounded by the size of the stored values,
+and checks of the caches that must be shared between processes
+"""
+import pickle
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+
+class LRUMemoryCache(BaseCache):
+    """Local memory cache evicting the least recently used entries
+
+    Unlike Django's LocMemCache the size limit is expressed in bytes of
+    pickled values (OPTIONS["MAX_BYTES"]) so that a few large list
+    responses can't crowd out memory. Hits, misses, evictions and the
+    bytes held are counted and reported by stats().
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._max_bytes = int(options.get("MAX_BYTES", 64 * 1024 * 1024))
+        self._cache = OrderedDict()  # key -> (pickled value, expiry)
+        self._lock = Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _has_expired(self, expiry):
+        return expiry is not None and expiry <= time.time()
+
+    def _drop(self, key):
+        value, _ = self._cache.pop(key)
+        self._bytes -= len(value)
+
+    def _get_live(self, key):
+        """Return the live entry for key, dropping it if expired"""
+        entry = self._cache.get(key)
+        if entry is not None and self._has_expired(entry[1]):
+            self._drop(key)
+            return None
+        return entry
+
+    def _store(self, key, value, timeout):
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        if len(pickled) > self._max_bytes:
+            # Would evict everything else and still not fit
+            if key in self._cache:
+                self._drop(key)
+            return False
+        if key in self._cache:
+            self._drop(key)
+        self._cache[key] = (pickled, self.get_backend_timeout(timeout))
+        self._bytes += len(pickled)
+        self._cull()
+        return True
+
+    def _cull(self):
+        while self._bytes > self._max_bytes or (
+            len(self._cache) > self._max_entries
+        ):
+            key = next(iter(self._cache))
+            self._drop(key)
+            self._evictions += 1
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            if self._get_live(key) is not None:
+                return False
+            return self._store(key, value, timeout)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            entry = self._get_live(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            self._cache.move_to_end(key)
+            self._hits += 1
+            pickled = entry[0]
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            self._store(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        with self._lock:
+            entry = self._get_live(key)
+            if entry is None:
+                return False
+            self._cache[key] = (entry[0], self.get_backend_timeout(timeout))
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            entry = self._get_live(key)
+            if entry is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(entry[0]) + delta
+            pickled = pickle.dumps(value, self.pickle_protocol)
+            self._bytes += len(pickled) - len(entry[0])
+            self._cache[key] = (pickled, entry[1])
+            self._cache.move_to_end(key)
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            return self._get_live(key) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            if key not in self._cache:
+                return False
+            self._drop(key)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return a snapshot of the cache counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._cache),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+            }
+
+
+def is_shared(alias):
+    """Return whether every process sees the same entries of the cache"""
+    return not isinstance(
+        caches[alias], (LRUMemoryCache, LocMemCache, DummyCache)
+    )
+
+
+def require_shared(setting, reason):
+    """Raise ImproperlyConfigured unless the cache named by setting is
+    shared, as reason ("between ...") requires
+    """
+    alias = getattr(settings, setting)
+    if not is_shared(alias):
+        raise ImproperlyConfigured(
+            f"{setting} must name a cache shared {reason}, not the "
+            f'{type(caches[alias]).__name__} of "{alias}".'
+        )
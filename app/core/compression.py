@@ -0,0 +1,127 @@
+"""
+Content codings for compressing responses
+"""
+import gzip
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class Gzip:
+    """gzip at COMPRESSION_GZIP_LEVEL"""
+
+    name = "gzip"
+
+    def compress(self, data):
+        return gzip.compress(
+            data, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0
+        )
+
+    def stream(self, chunks):
+        compressor = zlib.compressobj(
+            settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+class Brotli:
+    """Brotli at COMPRESSION_BROTLI_QUALITY, needs the brotli package"""
+
+    name = "br"
+
+    def compress(self, data):
+        return brotli.compress(
+            data, quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+
+    def stream(self, chunks):
+        compressor = brotli.Compressor(
+            quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class Zstd:
+    """Zstandard at COMPRESSION_ZSTD_LEVEL, needs the zstandard package"""
+
+    name = "zstd"
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(
+            level=settings.COMPRESSION_ZSTD_LEVEL
+        ).compress(data)
+
+    def stream(self, chunks):
+        compressor = zstandard.ZstdCompressor(
+            level=settings.COMPRESSION_ZSTD_LEVEL
+        ).compressobj()
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            data += compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+# Codings by Content-Encoding name, for the installed libraries
+CODECS = {Gzip.name: Gzip()}
+if brotli is not None:
+    CODECS[Brotli.name] = Brotli()
+if zstandard is not None:
+    CODECS[Zstd.name] = Zstd()
+
+
+def parse_accept_encoding(header):
+    """Return {coding: q} for an Accept-Encoding header"""
+    qualities = {}
+    for item in header.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+    return qualities
+
+
+def negotiate(header):
+    """Return the codec to answer an Accept-Encoding header with
+
+    The client's q values decide first, ties go to the earliest coding
+    in COMPRESSION_ENCODINGS. Returns None when nothing acceptable is
+    available.
+    """
+    qualities = parse_accept_encoding(header)
+    wildcard = qualities.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in settings.COMPRESSION_ENCODINGS:
+        q = qualities.get(name, wildcard)
+        if name in CODECS and q > best_q:
+            best, best_q = CODECS[name], q
+    return best
@@ -0,0 +1,195 @@
+"""
+In-process database connection pool
+"""
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+from core import metrics
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection became free within the pool's timeout"""
+
+
+class ConnectionPool:
+    """Thread safe pool of open connections for one database
+
+    Connections are handed out most recently used first, so a warm few
+    serve most requests, and are closed once older than max_lifetime. A
+    connection idle for longer than health_check_after seconds is pinged
+    with SELECT 1 before being handed out, and replaced if the server
+    has gone away.
+    """
+
+    def __init__(
+        self,
+        alias,
+        max_size=20,
+        timeout=10.0,
+        max_lifetime=3600.0,
+        health_check_after=30.0,
+    ):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self._idle = []  # (connection, returned at), most recent last
+        self._born = {}  # connection -> opened at
+        self._opening = 0
+        self._condition = threading.Condition()
+        self._labels = {"database": alias}
+
+    def acquire(self, connect):
+        """Return an idle connection or one opened with connect()"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            conn, idle_since = self._take(deadline)
+            if conn is None:
+                break
+            if self._healthy(conn, idle_since):
+                self._waited(started)
+                return conn
+            self._discard(conn)
+
+        try:
+            conn = connect()
+        finally:
+            with self._condition:
+                self._opening -= 1
+                self._condition.notify()
+        with self._condition:
+            self._born[conn] = time.monotonic()
+        metrics.inc("db_pool_connections_opened_total", self._labels)
+        self._waited(started)
+        return conn
+
+    def _take(self, deadline):
+        """Pop an idle connection, or return None after reserving a slot"""
+        with self._condition:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if len(self._born) + self._opening < self.max_size:
+                    # Reserve the slot; connect() runs outside the lock
+                    self._opening += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    metrics.inc("db_pool_timeouts_total", self._labels)
+                    raise PoolTimeout(
+                        f"No connection to {self.alias} free after "
+                        f"{self.timeout}s ({self.max_size} in use)"
+                    )
+                self._condition.wait(remaining)
+
+    def _healthy(self, conn, idle_since):
+        now = time.monotonic()
+        if conn.closed or now - self._born[conn] > self.max_lifetime:
+            return False
+        if now - idle_since < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if not conn.autocommit:
+                conn.rollback()
+            return True
+        except psycopg2.Error:
+            metrics.inc("db_pool_health_check_failures_total", self._labels)
+            return False
+
+    def _waited(self, started):
+        metrics.observe(
+            "db_pool_wait_seconds", self._labels, time.monotonic() - started
+        )
+
+    def release(self, conn):
+        """Return a connection, rolling back any open transaction"""
+        try:
+            status = conn.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                raise psycopg2.InterfaceError("connection is broken")
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            self._discard(conn)
+            return
+        if time.monotonic() - self._born[conn] > self.max_lifetime:
+            self._discard(conn)
+            return
+        with self._condition:
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._condition:
+            self._born.pop(conn, None)
+            self._condition.notify()
+
+    def close(self):
+        """Close every idle connection"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Return the pool's size, idle and in use connection counts"""
+        with self._condition:
+            size = len(self._born)
+            idle = len(self._idle)
+        return {"size": size, "idle": idle, "in_use": size - idle}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, key, **options):
+    """Return this process' pool for a database alias and its params
+
+    Pools are per process: after a fork the child opens its own
+    connections and leaves the parent's alone.
+    """
+    pool_key = (os.getpid(), alias, key)
+    with _pools_lock:
+        pool = _pools.get(pool_key)
+        if pool is None:
+            pool = _pools[pool_key] = ConnectionPool(alias, **options)
+    return pool
+
+
+def close_pools():
+    """Close the idle connections of every pool of this process"""
+    with _pools_lock:
+        pools = [
+            pool for key, pool in _pools.items() if key[0] == os.getpid()
+        ]
+    for pool in pools:
+        pool.close()
+
+
+def pool_gauges():
+    """Yield (name, labels, value) gauges of this process' pools"""
+    with _pools_lock:
+        pools = [
+            pool for key, pool in _pools.items() if key[0] == os.getpid()
+        ]
+    for pool in pools:
+        labels = {"database": pool.alias}
+        for name, value in pool.stats().items():
+            yield f"db_pool_{name}", labels, value
+        yield "db_pool_max_size", labels, pool.max_size
+
+
+metrics.register_gauges(pool_gauges)
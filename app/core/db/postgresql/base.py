@@ -0,0 +1,65 @@
+"""
+PostgreSQL backend handing out connections from core.db.pool
+"""
+from django.db.backends.postgresql import base, creation
+
+from core.db.pool import close_pools, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """Close pooled connections before test databases are dropped"""
+
+    def _create_test_db(self, verbosity, autoclobber, keepdb=False):
+        close_pools()
+        return super()._create_test_db(verbosity, autoclobber, keepdb)
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools()
+        return super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL connections pooled within the process
+
+    Configured by the POOL dict of the database settings (MAX_SIZE,
+    TIMEOUT, MAX_LIFETIME, HEALTH_CHECK_AFTER); a MAX_SIZE of 0 turns
+    pooling off. Closing a connection, which Django does at the end of
+    every request when CONN_MAX_AGE is 0, returns it to the pool.
+    """
+
+    creation_class = DatabaseCreation
+
+    def _pool(self, conn_params):
+        options = self.settings_dict.get("POOL") or {}
+        if not options.get("MAX_SIZE"):
+            return None
+        return get_pool(
+            self.alias,
+            tuple(sorted((k, str(v)) for k, v in conn_params.items())),
+            max_size=options["MAX_SIZE"],
+            timeout=options.get("TIMEOUT", 10.0),
+            max_lifetime=options.get("MAX_LIFETIME", 3600.0),
+            health_check_after=options.get("HEALTH_CHECK_AFTER", 30.0),
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self._pool(conn_params)
+        if pool is None:
+            self._pooled_by = None
+            return super().get_new_connection(conn_params)
+
+        connection = pool.acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+        )
+        # Set by the base class only for new connections
+        self.isolation_level = connection.isolation_level
+        self._pooled_by = pool
+        return connection
+
+    def _close(self):
+        pool = getattr(self, "_pooled_by", None)
+        if self.connection is None or pool is None:
+            return super()._close()
+        pool.release(self.connection)
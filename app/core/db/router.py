@@ -0,0 +1,164 @@
+"""
+Database router sending safe API reads to read replicas
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from core import metrics
+
+# Seconds the replica is behind, 0 when it has replayed all it received
+LAG_SQL = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+    "THEN 0 ELSE COALESCE(EXTRACT(EPOCH FROM "
+    "now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+_reads = ContextVar("replica_reads", default=False)
+_health = {}  # alias -> (healthy, lag, checked at)
+_checking = {}  # alias -> Lock held while checking
+
+
+@contextmanager
+def replica_reads():
+    """Let the enclosed reads go to a replica"""
+    token = _reads.set(True)
+    try:
+        yield
+    finally:
+        _reads.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Keep the enclosed reads on the primary, also in replica_reads()"""
+    token = _reads.set(False)
+    try:
+        yield
+    finally:
+        _reads.reset(token)
+
+
+def _pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+def pin(user_id):
+    """Keep the user's reads on the primary for REPLICA_PIN_SECONDS"""
+    if not settings.DATABASE_REPLICAS:
+        return
+    caches[settings.REPLICA_PIN_CACHE_ALIAS].set(
+        _pin_key(user_id), True, timeout=settings.REPLICA_PIN_SECONDS
+    )
+
+
+def is_pinned(user_id):
+    """Return whether the user wrote within the last few seconds"""
+    if not settings.DATABASE_REPLICAS:
+        # Everything is read from the primary, skip the cache lookup
+        return False
+    cache = caches[settings.REPLICA_PIN_CACHE_ALIAS]
+    return bool(cache.get(_pin_key(user_id)))
+
+
+def check_replica(alias):
+    """Measure replication lag, return (healthy, lag)"""
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = float(cursor.fetchone()[0])
+    except DatabaseError:
+        return False, None
+    return lag <= settings.REPLICA_MAX_LAG, lag
+
+
+def _fresh(state):
+    return state is not None and (
+        time.monotonic() - state[2] < settings.REPLICA_CHECK_INTERVAL
+    )
+
+
+def is_healthy(alias):
+    """Return the replica's health, rechecked every few seconds
+
+    One thread per process rechecks a stale result while the others
+    keep using it. A replica is unhealthy until its first check passes.
+    """
+    state = _health.get(alias)
+    if _fresh(state):
+        return state[0]
+    lock = _checking.setdefault(alias, threading.Lock())
+    if not lock.acquire(blocking=state is None):
+        return state[0]
+    try:
+        state = _health.get(alias)
+        if _fresh(state):
+            # Checked by the thread we waited for
+            return state[0]
+        healthy, lag = check_replica(alias)
+        _health[alias] = (healthy, lag, time.monotonic())
+        return healthy
+    finally:
+        lock.release()
+
+
+class ReplicaRouter:
+    """Route reads inside replica_reads() to a healthy replica
+
+    Replicas are the aliases in DATABASE_REPLICAS. Reads fall back to
+    the primary when none is healthy; writes, migrations and database
+    cache reads always use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _reads.get() or not settings.DATABASE_REPLICAS:
+            return None
+        if model._meta.app_label == "django_cache":
+            # DatabaseCache entries, like the shared data versions, must
+            # not lag behind the writes
+            return DEFAULT_DB_ALIAS
+        healthy = [
+            alias
+            for alias in settings.DATABASE_REPLICAS
+            if is_healthy(alias)
+        ]
+        if not healthy:
+            metrics.inc("db_replica_fallbacks_total", {})
+            return DEFAULT_DB_ALIAS
+        alias = random.choice(healthy)
+        metrics.inc("db_replica_reads_total", {"database": alias})
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Also for objects that were read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            # Replicas get the schema through replication
+            return False
+        return None
+
+
+def replica_gauges():
+    """Yield the last measured lag and health of every replica"""
+    for alias, (healthy, lag, _) in list(_health.items()):
+        labels = {"database": alias}
+        yield "db_replica_healthy", labels, int(healthy)
+        if lag is not None:
+            yield "db_replica_lag_seconds", labels, lag
+
+
+metrics.register_gauges(replica_gauges)
@@ -0,0 +1,121 @@
+"""
+Password hashers with tunable cost, run in a bounded thread pool
+"""
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class HashingBusy(APIException):
+    """Too many passwords are waiting to be hashed"""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many logins at once, try again shortly."
+    default_code = "hashing_busy"
+    # Sent as Retry-After by DRF's exception handler
+    wait = 1
+
+
+def _pool():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = settings.PASSWORD_HASHING_WORKERS
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="hasher"
+            )
+            _slots = threading.BoundedSemaphore(
+                workers + settings.PASSWORD_HASHING_QUEUE
+            )
+    return _executor, _slots
+
+
+def offload(func, *args):
+    """Run a hashing function in the pool and wait for its result
+
+    The hash libraries release the GIL, so at most
+    PASSWORD_HASHING_WORKERS hashes use CPU at a time and the rest of
+    the process keeps serving requests. Callers beyond the queue wait
+    up to PASSWORD_HASHING_TIMEOUT seconds, then get HashingBusy.
+    """
+    if getattr(_local, "in_pool", False):
+        # e.g. PBKDF2's verify() calling encode(): waiting on the pool
+        # from inside it could deadlock
+        return func(*args)
+    executor, slots = _pool()
+    if not slots.acquire(timeout=settings.PASSWORD_HASHING_TIMEOUT):
+        raise HashingBusy()
+    try:
+        return executor.submit(_run, func, *args).result()
+    finally:
+        slots.release()
+
+
+def _run(func, *args):
+    _local.in_pool = True
+    try:
+        return func(*args)
+    finally:
+        _local.in_pool = False
+
+
+class OffloadedHasherMixin:
+    """Compute hashes through offload()"""
+
+    def encode(self, password, salt, *args, **kwargs):
+        return offload(
+            functools.partial(
+                super().encode, password, salt, *args, **kwargs
+            )
+        )
+
+    def verify(self, password, encoded):
+        return offload(super().verify, password, encoded)
+
+
+class Argon2PasswordHasher(
+    OffloadedHasherMixin, hashers.Argon2PasswordHasher
+):
+    """Argon2 with costs from ARGON2_TIME_COST/MEMORY_COST/PARALLELISM"""
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class BCryptSHA256PasswordHasher(
+    OffloadedHasherMixin, hashers.BCryptSHA256PasswordHasher
+):
+    """bcrypt with BCRYPT_ROUNDS rounds"""
+
+    @property
+    def rounds(self):
+        return settings.BCRYPT_ROUNDS
+
+
+class PBKDF2PasswordHasher(
+    OffloadedHasherMixin, hashers.PBKDF2PasswordHasher
+):
+    """PBKDF2 with PBKDF2_ITERATIONS iterations"""
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
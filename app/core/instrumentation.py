@@ -0,0 +1,114 @@
+"""
+Per-request timing and SQL instrumentation
+"""
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from core import metrics
+
+# Modules wrapping query execution, never the call site of a query
+_WRAPPERS = {__file__, metrics.__file__}
+
+_current = ContextVar("instrumentation", default=None)
+
+
+class RequestMetrics:
+    """Timings and SQL statistics collected for one sampled request"""
+
+    def __init__(self):
+        self.timings = Counter()  # name -> seconds
+        self.active = set()
+        self.queries = 0
+        self.query_time = 0.0
+        self.statements = Counter()
+        self.call_sites = {}
+
+    def record_query(self, sql, duration):
+        self.queries += 1
+        self.query_time += duration
+        self.statements[sql] += 1
+        threshold = settings.INSTRUMENTATION_DUPLICATE_THRESHOLD
+        if self.statements[sql] == threshold:
+            # Only walk the stack once a statement looks like an N+1
+            self.call_sites[sql] = call_site()
+
+    def duplicates(self):
+        """Return (sql, count, call site) of repeated statements"""
+        return [
+            (sql, self.statements[sql], site)
+            for sql, site in self.call_sites.items()
+        ]
+
+
+def call_site():
+    """Return file:line (function) of the innermost project frame"""
+    base = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        if (
+            frame.filename.startswith(base)
+            and "site-packages" not in frame.filename
+            and frame.filename not in _WRAPPERS
+        ):
+            return f"{frame.filename}:{frame.lineno} ({frame.name})"
+    return "unknown"
+
+
+def current_metrics():
+    """Return the metrics of the request being sampled, if any"""
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """Collect metrics for the enclosed request"""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's metrics
+
+    Nested blocks with the same name (e.g. nested serializers) are only
+    counted once. Outside a sampled request this is a no-op.
+    """
+    metrics = _current.get()
+    if metrics is None or name in metrics.active:
+        yield
+        return
+    metrics.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - started
+        metrics.active.discard(name)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper timing queries of sampled requests"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - started)
+
+
+class TimedSerializerMixin:
+    """Count serializer to_representation time as 'serialize'"""
+
+    def to_representation(self, instance):
+        with timed("serialize"):
+            return super().to_representation(instance)
@@ -0,0 +1,473 @@
+"""
+Django management command benchmarking the recipe and user APIs.
+"""
+import json
+import time
+import uuid
+from decimal import Decimal
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe import stats
+
+PASSWORD = "BenchPass123"
+BULK_SIZE = 10
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of values"""
+    ordered = sorted(values)
+    rank = round(pct / 100 * len(ordered))
+    index = max(0, min(len(ordered) - 1, rank - 1))
+    return ordered[index]
+
+
+class Scenario:
+    """One endpoint call measured by the benchmark
+
+    request(bench, i) returns (method, url, payload) for iteration i so
+    that writes can use fresh objects on every call. It runs outside
+    the measurement, so it may create the objects a write consumes.
+    """
+
+    def __init__(
+        self, name, request, auth=True, admin=False, payload_format="json"
+    ):
+        self.name = name
+        self.request = request
+        self.auth = auth
+        self.admin = admin
+        self.payload_format = payload_format
+
+
+def _recipe_payload(bench, i):
+    return {
+        "title": f"Bench recipe {i}",
+        "time_minutes": 10 + i % 50,
+        "price": "4.50",
+        "tags": [{"name": name} for name in bench.tag_names[:2]],
+    }
+
+
+def _detail(bench, i):
+    return reverse("recipe:recipe-detail", args=[bench.recipe_ids[i]])
+
+
+def _image_payload(bench, i):
+    # The same image every time, stored once under its content hash
+    file = BytesIO()
+    Image.new("RGB", (64, 64), (200, 80, 20)).save(file, "JPEG")
+    file.seek(0)
+    file.name = "bench.jpg"
+    return {"image": file}
+
+
+def _bulk_patch_payload(bench, i):
+    return [
+        {"id": pk, "title": f"Bulk patched {i}"}
+        for pk in bench.recipe_ids[:BULK_SIZE]
+    ]
+
+
+def _bulk_delete_payload(bench, i):
+    recipes = [
+        Recipe.objects.create(
+            user=bench.user,
+            title=f"Bench doomed {i}-{n}",
+            time_minutes=10,
+            price=Decimal("4.50"),
+        )
+        for n in range(BULK_SIZE)
+    ]
+    return {"ids": [recipe.id for recipe in recipes]}
+
+
+SCENARIOS = [
+    Scenario(
+        "recipe-list",
+        lambda b, i: ("get", reverse("recipe:recipe-list"), None),
+    ),
+    Scenario(
+        "recipe-list-search",
+        lambda b, i: (
+            "get",
+            reverse("recipe:recipe-list") + "?search=recipe",
+            None,
+        ),
+    ),
+    Scenario(
+        "recipe-list-tags",
+        lambda b, i: (
+            "get",
+            reverse("recipe:recipe-list") + f"?tags={b.tag_ids[0]}",
+            None,
+        ),
+    ),
+    Scenario("recipe-detail", lambda b, i: ("get", _detail(b, i), None)),
+    Scenario(
+        "recipe-create",
+        lambda b, i: (
+            "post",
+            reverse("recipe:recipe-list"),
+            _recipe_payload(b, i),
+        ),
+    ),
+    Scenario(
+        "recipe-update",
+        lambda b, i: ("put", _detail(b, i), _recipe_payload(b, i)),
+    ),
+    Scenario(
+        "recipe-partial-update",
+        lambda b, i: ("patch", _detail(b, i), {"title": f"Patched {i}"}),
+    ),
+    Scenario(
+        "recipe-bulk",
+        lambda b, i: (
+            "post",
+            reverse("recipe:recipe-bulk"),
+            [_recipe_payload(b, i * BULK_SIZE + n) for n in range(BULK_SIZE)],
+        ),
+    ),
+    Scenario(
+        "recipe-bulk-update",
+        lambda b, i: (
+            "patch",
+            reverse("recipe:recipe-bulk"),
+            _bulk_patch_payload(b, i),
+        ),
+    ),
+    Scenario(
+        "recipe-bulk-delete",
+        lambda b, i: (
+            "delete",
+            reverse("recipe:recipe-bulk"),
+            _bulk_delete_payload(b, i),
+        ),
+    ),
+    Scenario(
+        "recipe-upload-image",
+        lambda b, i: (
+            "post",
+            reverse("recipe:recipe-upload-image", args=[b.recipe_ids[i]]),
+            _image_payload(b, i),
+        ),
+        payload_format="multipart",
+    ),
+    Scenario(
+        "recipe-stats",
+        lambda b, i: ("get", reverse("recipe:recipe-stats"), None),
+    ),
+    Scenario(
+        "cache-stats",
+        lambda b, i: ("get", reverse("recipe:cache-stats"), None),
+        admin=True,
+    ),
+    Scenario(
+        "recipe-export",
+        lambda b, i: ("get", reverse("recipe:recipe-export"), None),
+    ),
+    Scenario(
+        "recipe-delete",
+        lambda b, i: ("delete", _detail(b, -1 - i), None),
+    ),
+    Scenario(
+        "tag-list",
+        lambda b, i: ("get", reverse("recipe:tag-list"), None),
+    ),
+    Scenario(
+        "tag-list-assigned",
+        lambda b, i: (
+            "get",
+            reverse("recipe:tag-list") + "?assigned_only=1",
+            None,
+        ),
+    ),
+    Scenario(
+        "user-create",
+        lambda b, i: (
+            "post",
+            reverse("user:create"),
+            {
+                "email": f"{b.prefix}new-{i}@example.com",
+                "password": PASSWORD,
+                "name": "Bench",
+            },
+        ),
+        auth=False,
+    ),
+    Scenario(
+        "user-token",
+        lambda b, i: (
+            "post",
+            reverse("user:token"),
+            {"email": b.user.email, "password": PASSWORD},
+        ),
+        auth=False,
+    ),
+    Scenario("user-me", lambda b, i: ("get", reverse("user:me"), None)),
+    Scenario(
+        "user-me-update",
+        lambda b, i: ("patch", reverse("user:me"), {"name": f"Bench {i}"}),
+    ),
+]
+
+
+class Command(BaseCommand):
+    """Django command to benchmark API latency and query counts"""
+
+    help = (
+        "Seed a throwaway test database and measure latency percentiles, "
+        "throughput and SQL queries for every recipe and user endpoint. "
+        "Thumbnail tasks queued by recipe-upload-image aren't run"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument(
+            "--recipes", type=int, default=1000, help="Recipes per user"
+        )
+        parser.add_argument(
+            "--tags", type=int, default=20, help="Tags per user"
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=100,
+            help="Measured requests per endpoint",
+        )
+        parser.add_argument(
+            "--endpoints",
+            help="Comma separated endpoint names, all by default",
+        )
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Clear the response cache before every request",
+        )
+        parser.add_argument("--output", help="Write JSON results here")
+        parser.add_argument(
+            "--baseline", help="JSON results to compare against"
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed relative p95 slowdown against the baseline",
+        )
+        parser.add_argument(
+            "--no-test-db",
+            action="store_true",
+            help=(
+                "Seed the configured database instead of a test one, "
+                "deleting the seeded data afterwards"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for commands"""
+        # Fixture emails are unique per run, as --no-test-db runs share
+        # the database
+        self.prefix = f"bench-{uuid.uuid4().hex[:12]}-"
+        if options["no_test_db"]:
+            try:
+                results = self._run(options)
+            finally:
+                self._clean_up()
+        else:
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True
+            )
+            try:
+                results = self._run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        self._report(results)
+        if options["output"]:
+            with open(options["output"], "w") as out:
+                json.dump(results, out, indent=2)
+        if options["baseline"]:
+            self._compare(results, options["baseline"], options["tolerance"])
+
+    # Every scenario repeats one request far beyond any rate limit
+    @override_settings(RATE_LIMITS={})
+    def _run(self, options):
+        self._seed(options["users"], options["recipes"], options["tags"])
+        names = options["endpoints"]
+        scenarios = [
+            s for s in SCENARIOS
+            if not names or s.name in names.split(",")
+        ]
+        endpoints = {}
+        for scenario in scenarios:
+            endpoints[scenario.name] = self._measure(
+                scenario, options["requests"], options["cold"]
+            )
+        return {
+            "config": {
+                key: options[key]
+                for key in ("users", "recipes", "tags", "requests", "cold")
+            },
+            "endpoints": endpoints,
+        }
+
+    def _seed(self, users, recipes, tags):
+        """Create users with tagged recipes using batched inserts"""
+        self.stdout.write(
+            f"Seeding {users} users x {recipes} recipes x {tags} tags ..."
+        )
+        User = get_user_model()
+        for n in range(users):
+            user = User.objects.create_user(
+                f"{self.prefix}{n}@example.com", PASSWORD, name=f"Bench {n}"
+            )
+            user_tags = Tag.objects.bulk_create(
+                [Tag(user=user, name=f"Tag {t}") for t in range(tags)]
+            )
+            user_recipes = Recipe.objects.bulk_create(
+                [
+                    Recipe(
+                        user=user,
+                        title=f"Recipe {r}",
+                        description=f"Seeded recipe number {r}",
+                        time_minutes=5 + r % 120,
+                        price=Decimal(r % 500) / 10,
+                    )
+                    for r in range(recipes)
+                ],
+                batch_size=1000,
+            )
+            if user_tags:
+                Recipe.tag.through.objects.bulk_create(
+                    [
+                        Recipe.tag.through(
+                            recipe_id=recipe.id,
+                            tag_id=user_tags[r % len(user_tags)].id,
+                        )
+                        for r, recipe in enumerate(user_recipes)
+                    ],
+                    batch_size=1000,
+                )
+
+        # Measure as the first user
+        self.user = User.objects.get(email=f"{self.prefix}0@example.com")
+        self.token = Token.objects.create(user=self.user)
+        admin = User.objects.create_superuser(
+            f"{self.prefix}admin@example.com", PASSWORD
+        )
+        self.admin_token = Token.objects.create(user=admin)
+        self.tag_ids = list(
+            Tag.objects.filter(user=self.user).values_list("id", flat=True)
+        ) or [0]
+        self.tag_names = list(
+            Tag.objects.filter(user=self.user).values_list("name", flat=True)
+        )
+        self.recipe_ids = list(
+            Recipe.objects.filter(user=self.user).values_list("id", flat=True)
+        )
+
+    def _clean_up(self):
+        """Delete the users of this run, their recipes and tags with them"""
+        # Without the per-recipe statistics updates of the signals
+        with stats.deferred():
+            get_user_model().objects.filter(
+                email__startswith=self.prefix
+            ).delete()
+
+    def _measure(self, scenario, requests, cold):
+        """Time a scenario and count its queries"""
+        client = APIClient()
+        if scenario.auth:
+            token = self.admin_token if scenario.admin else self.token
+            client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        requests = min(requests, len(self.recipe_ids) // 2 or 1)
+
+        latencies = []
+        queries = []
+        statuses = set()
+        started = time.perf_counter()
+        for i in range(requests):
+            if cold:
+                caches[settings.API_CACHE_ALIAS].clear()
+            method, url, payload = scenario.request(self, i)
+            with CaptureQueriesContext(connection) as captured:
+                begin = time.perf_counter()
+                res = getattr(client, method)(
+                    url, payload, format=scenario.payload_format
+                )
+                if res.streaming:
+                    b"".join(res.streaming_content)
+                latencies.append((time.perf_counter() - begin) * 1000)
+            queries.append(len(captured))
+            statuses.add(res.status_code)
+        elapsed = time.perf_counter() - started
+
+        return {
+            "requests": requests,
+            "statuses": sorted(statuses),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "throughput_rps": round(requests / elapsed, 1),
+            "queries_avg": round(sum(queries) / len(queries), 2),
+            "queries_max": max(queries),
+        }
+
+    def _report(self, results):
+        self.stdout.write(
+            f"{'endpoint':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+            f"{'req/s':>10}{'queries':>10}  status"
+        )
+        for name, r in results["endpoints"].items():
+            self.stdout.write(
+                f"{name:<24}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+                f"{r['p99_ms']:>10.2f}{r['throughput_rps']:>10.1f}"
+                f"{r['queries_max']:>10}  {r['statuses']}"
+            )
+
+    def _compare(self, results, baseline_path, tolerance):
+        """Fail when an endpoint got slower or issues more queries"""
+        with open(baseline_path) as f:
+            baseline = json.load(f)["endpoints"]
+
+        regressions = []
+        for name, r in results["endpoints"].items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: p95 {r['p95_ms']:.2f}ms vs "
+                    f"{base['p95_ms']:.2f}ms baseline"
+                )
+            if r["queries_max"] > base["queries_max"]:
+                regressions.append(
+                    f"{name}: {r['queries_max']} queries vs "
+                    f"{base['queries_max']} baseline"
+                )
+
+        if regressions:
+            raise CommandError(
+                "Performance regressions:\n" + "\n".join(regressions)
+            )
+        self.stdout.write(
+            self.style.SUCCESS("No regressions against baseline")
+        )
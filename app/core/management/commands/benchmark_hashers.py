@@ -0,0 +1,91 @@
+"""
+Django management command measuring password hashing throughput.
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers, make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from core import hashers
+
+
+class Command(BaseCommand):
+    """Django command to benchmark login cost per hasher"""
+
+    help = (
+        "Measure how many password checks (logins) per second and per "
+        "core each configured hasher sustains through the hashing pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seconds",
+            type=float,
+            default=3,
+            help="Seconds to measure each hasher for",
+        )
+        parser.add_argument(
+            "--clients",
+            type=int,
+            default=(os.cpu_count() or 1) * 4,
+            help="Threads logging in at once",
+        )
+        parser.add_argument(
+            "--hashers",
+            help="Comma separated hasher class names, all by default",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for commands"""
+        available = {type(hasher).__name__: hasher for hasher in get_hashers()}
+        names = options["hashers"] or ",".join(available)
+        cores = min(settings.PASSWORD_HASHING_WORKERS, os.cpu_count() or 1)
+        self.stdout.write(
+            f"{'hasher':<30}{'ms/hash':>10}{'logins/s':>12}"
+            f"{'per core':>12}"
+        )
+        for name in names.split(","):
+            if name not in available:
+                raise CommandError(f"{name} isn't in PASSWORD_HASHERS")
+            hasher = available[name]
+            try:
+                encoded = make_password("benchmark-password", hasher=hasher)
+            except ValueError as error:
+                self.stderr.write(f"{name}: {error}")
+                continue
+
+            single = self._rate(hasher, encoded, 1, options["seconds"])
+            rate = self._rate(
+                hasher, encoded, options["clients"], options["seconds"]
+            )
+            self.stdout.write(
+                f"{name:<30}{1000 / single:>10.1f}{rate:>12.1f}"
+                f"{rate / cores:>12.1f}"
+            )
+
+    def _rate(self, hasher, encoded, clients, seconds):
+        """Return verified passwords per second over all clients"""
+        deadline = time.monotonic() + seconds
+        counts = [0] * clients
+
+        def client(index):
+            while time.monotonic() < deadline:
+                try:
+                    hasher.verify("benchmark-password", encoded)
+                except hashers.HashingBusy:
+                    continue
+                counts[index] += 1
+
+        threads = [
+            threading.Thread(target=client, args=(i,))
+            for i in range(clients)
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(counts) / (time.monotonic() - started)
@@ -0,0 +1,56 @@
+"""
+Django management command streaming a user's recipes to a file.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe
+from recipe.export import (
+    DEFAULT_CHUNK_SIZE,
+    FORMATS,
+    iter_recipes,
+)
+
+
+class Command(BaseCommand):
+    """Django command to export recipes as NDJSON or CSV"""
+
+    help = "Export a user's recipes with their tags as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="Owner of the recipes")
+        parser.add_argument(
+            "--type",
+            choices=sorted(FORMATS),
+            default="ndjson",
+            help="Output file type",
+        )
+        parser.add_argument(
+            "--output",
+            help="File to write to, standard output by default",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Rows fetched from the database at a time",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for commands"""
+        try:
+            user = get_user_model().objects.get(email=options["email"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+
+        stream, _ = FORMATS[options["type"]]
+        rows = iter_recipes(
+            Recipe.objects.filter(user=user),
+            chunk_size=options["chunk_size"],
+        )
+        if options["output"]:
+            with open(options["output"], "w", newline="") as out:
+                out.writelines(stream(rows))
+        else:
+            for line in stream(rows):
+                self.stdout.write(line, ending="")
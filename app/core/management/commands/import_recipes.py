@@ -0,0 +1,269 @@
+"""
+Django management command bulk loading recipes and tags from a file.
+"""
+import csv
+import io
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.cache import require_shared
+from core.models import Recipe, Tag
+from recipe import stats
+from recipe.cache import bump_user_version
+from recipe.export import FORMATS, TAG_SEPARATOR
+
+RECIPE_COLUMNS = [
+    "id",
+    "user_id",
+    "title",
+    "description",
+    "time_minutes",
+    "price",
+    "link",
+    "updated_at",
+    # Not null without a database default
+    "thumbnails",
+]
+
+
+def read_ndjson(stream):
+    """Yield (line number, row) for every non-blank line
+
+    Lines that aren't valid JSON yield None as the row.
+    """
+    for number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+def read_csv(stream):
+    """Yield (line number, row) with tags split into a list"""
+    for number, row in enumerate(csv.DictReader(stream), start=2):
+        tags = row.get("tags") or ""
+        row["tags"] = [name for name in tags.split(TAG_SEPARATOR) if name]
+        yield number, row
+
+
+READERS = {"ndjson": read_ndjson, "csv": read_csv}
+
+
+class Command(BaseCommand):
+    """Django command to bulk import recipes"""
+
+    help = (
+        "Import recipes and their tags from NDJSON or CSV as written by "
+        "export_recipes. Rows may name their owner in a 'user' column, "
+        "otherwise --email is used."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to read, - for stdin")
+        parser.add_argument(
+            "--type",
+            choices=sorted(FORMATS),
+            help="Input file type, guessed from the extension by default",
+        )
+        parser.add_argument("--email", help="Owner of rows without a user")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows written per transaction",
+        )
+        parser.add_argument(
+            "--method",
+            choices=["bulk", "copy"],
+            default="bulk",
+            help="bulk_create, or PostgreSQL COPY for the fastest load",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for commands"""
+        require_shared("API_CACHE_VERSION_ALIAS", "with the web processes")
+        file_type = options["type"] or options["path"].rsplit(".", 1)[-1]
+        if file_type not in READERS:
+            raise CommandError("Pass --type, the file type can't be guessed")
+        if options["method"] == "copy" and connection.vendor != "postgresql":
+            raise CommandError("--method copy needs PostgreSQL")
+
+        self.default_email = options["email"]
+        self.users = {}
+        self.tags = {}
+        self.skipped = 0
+        self.write = (
+            self._write_copy
+            if options["method"] == "copy"
+            else self._write_bulk
+        )
+
+        if options["path"] == "-":
+            self._load(READERS[file_type](sys.stdin), options["batch_size"])
+        else:
+            with open(options["path"], newline="") as stream:
+                self._load(READERS[file_type](stream), options["batch_size"])
+
+    def _load(self, rows, batch_size):
+        started = time.monotonic()
+        imported = 0
+        while True:
+            numbered_rows = list(islice(rows, batch_size))
+            if not numbered_rows:
+                break
+            batch = [
+                parsed
+                for parsed in map(self._parse, numbered_rows)
+                if parsed is not None
+            ]
+            if batch:
+                self._write_batch(batch)
+                imported += len(batch)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"Imported {imported} recipes "
+                f"({imported / elapsed if elapsed else 0:.0f} rows/s)"
+            )
+
+        # The batched writes skip the signals maintaining the statistics
+        stats.rebuild(user.pk for user in self.users.values())
+        for user in self.users.values():
+            bump_user_version(user.pk)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done: {imported} recipes imported, {self.skipped} skipped "
+                f"in {time.monotonic() - started:.1f}s"
+            )
+        )
+
+    def _parse(self, numbered_row):
+        """Return (user, Recipe, tag names) or None for an invalid row"""
+        number, row = numbered_row
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("not a JSON object")
+            user = self._user(row.get("user") or self.default_email)
+            recipe = Recipe(
+                user=user,
+                title=row["title"],
+                description=row.get("description") or "",
+                time_minutes=int(row["time_minutes"]),
+                price=Decimal(str(row["price"])),
+                link=row.get("link") or "",
+            )
+            recipe.clean_fields(exclude=["user"])
+        except (
+            KeyError,
+            TypeError,
+            ValueError,
+            InvalidOperation,
+            ValidationError,
+        ) as error:
+            self.skipped += 1
+            self.stderr.write(f"Line {number} skipped: {error!r}")
+            return None
+
+        return user, recipe, list(row.get("tags") or [])
+
+    def _user(self, email):
+        """Return the user with email, looked up once per import"""
+        if not email:
+            raise ValueError("row has no user and --email wasn't given")
+        if email not in self.users:
+            try:
+                self.users[email] = get_user_model().objects.get(email=email)
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user with email {email}")
+        return self.users[email]
+
+    def _tag_ids(self, batch):
+        """Resolve the tag names of a batch to ids, creating new tags"""
+        missing = {}
+        for user, _, names in batch:
+            for name in names:
+                if (user.pk, name) not in self.tags:
+                    missing.setdefault(user, set()).add(name)
+        for user, names in missing.items():
+            for name, tag in Tag.objects.get_or_create_many(
+                user, names
+            ).items():
+                self.tags[user.pk, name] = tag.id
+
+    def _write_batch(self, batch):
+        with transaction.atomic():
+            self._tag_ids(batch)
+            self.write(batch)
+
+    def _write_bulk(self, batch):
+        recipes = Recipe.objects.bulk_create(
+            [recipe for _, recipe, _ in batch]
+        )
+        Recipe.tag.through.objects.bulk_create(
+            self._through_rows(batch, [recipe.id for recipe in recipes])
+        )
+
+    def _write_copy(self, batch):
+        """Load the batch with COPY using ids reserved from the sequence"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                "FROM generate_series(1, %s)",
+                [Recipe._meta.db_table, len(batch)],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+
+            now = timezone.now().isoformat()
+            recipes = io.StringIO()
+            # Quote everything so empty strings don't load as NULL
+            writer = csv.writer(recipes, quoting=csv.QUOTE_ALL)
+            for pk, (user, recipe, _) in zip(ids, batch):
+                writer.writerow(
+                    [
+                        pk,
+                        user.pk,
+                        recipe.title,
+                        recipe.description,
+                        recipe.time_minutes,
+                        recipe.price,
+                        recipe.link,
+                        now,
+                        "{}",
+                    ]
+                )
+            self._copy(cursor, Recipe._meta.db_table, RECIPE_COLUMNS, recipes)
+
+            through = io.StringIO()
+            writer = csv.writer(through)
+            for row in self._through_rows(batch, ids):
+                writer.writerow([row.recipe_id, row.tag_id])
+            self._copy(
+                cursor,
+                Recipe.tag.through._meta.db_table,
+                ["recipe_id", "tag_id"],
+                through,
+            )
+
+    def _copy(self, cursor, table, columns, buffer):
+        buffer.seek(0)
+        cursor.cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH CSV",
+            buffer,
+        )
+
+    def _through_rows(self, batch, ids):
+        Through = Recipe.tag.through
+        return [
+            Through(recipe_id=pk, tag_id=self.tags[user.pk, name])
+            for pk, (user, _, names) in zip(ids, batch)
+            for name in set(names)
+        ]
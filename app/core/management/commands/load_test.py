@@ -0,0 +1,170 @@
+"""
+Django management command load testing a running API server.
+"""
+import asyncio
+import json
+import resource
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.commands.benchmark_api import percentile
+
+
+class HTTPError(Exception):
+    """The server answered with something that isn't HTTP/1.1"""
+
+
+async def read_response(reader):
+    """Read one response, return (status, keep alive)"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        status = int(lines[0].split()[1])
+    except (IndexError, ValueError):
+        raise HTTPError(lines[0])
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("connection", "").lower() != "close"
+
+
+class Command(BaseCommand):
+    """Django command to load test the API over HTTP"""
+
+    help = (
+        "Hold many concurrent keep-alive connections against a running "
+        "server and report throughput and latency percentiles. Compare "
+        "'manage.py runserver' with 'gunicorn' (ASGI) on the same URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="e.g. http://localhost:8000/api/...")
+        parser.add_argument("--connections", type=int, default=1000)
+        parser.add_argument(
+            "--duration", type=float, default=30, help="Seconds to run"
+        )
+        parser.add_argument("--token", help="API token to authenticate with")
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=30,
+            help="Seconds before a request counts as failed",
+        )
+        parser.add_argument("--output", help="Write JSON results here")
+
+    def handle(self, *args, **options):
+        """Entrypoint for commands"""
+        url = urlsplit(options["url"])
+        if url.scheme != "http" or not url.hostname:
+            raise CommandError("Only http:// URLs are supported")
+        self._raise_file_limit(options["connections"])
+
+        self.host = url.hostname
+        self.port = url.port or 80
+        path = url.path or "/"
+        if url.query:
+            path += "?" + url.query
+        headers = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {url.netloc}",
+            "Connection: keep-alive",
+        ]
+        if options["token"]:
+            headers.append(f"Authorization: Token {options['token']}")
+        self.request = ("\r\n".join(headers) + "\r\n\r\n").encode()
+        self.timeout = options["timeout"]
+
+        results = asyncio.run(
+            self._run(options["connections"], options["duration"])
+        )
+        self._report(results)
+        if options["output"]:
+            with open(options["output"], "w") as out:
+                json.dump(results, out, indent=2)
+
+    def _raise_file_limit(self, connections):
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = connections + 64
+        if soft < wanted:
+            if hard != resource.RLIM_INFINITY and hard < wanted:
+                raise CommandError(
+                    f"Open file limit {hard} is too low for {connections} "
+                    "connections, raise it with ulimit -n"
+                )
+            resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+    async def _run(self, connections, duration):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        deadline = time.monotonic() + duration
+        started = time.monotonic()
+        await asyncio.gather(
+            *(self._client(deadline) for _ in range(connections))
+        )
+        elapsed = time.monotonic() - started
+
+        completed = len(self.latencies)
+        latencies = self.latencies or [0.0]
+        return {
+            "connections": connections,
+            "duration_s": round(elapsed, 2),
+            "requests": completed,
+            "errors": self.errors,
+            "statuses": self.statuses,
+            "throughput_rps": round(completed / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+        }
+
+    async def _client(self, deadline):
+        """Send requests over one connection until the deadline"""
+        writer = None
+        while time.monotonic() < deadline:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port),
+                        self.timeout,
+                    )
+                begin = time.perf_counter()
+                writer.write(self.request)
+                status, keep_alive = await asyncio.wait_for(
+                    read_response(reader), self.timeout
+                )
+                self.latencies.append((time.perf_counter() - begin) * 1000)
+                key = str(status)
+                self.statuses[key] = self.statuses.get(key, 0) + 1
+            except (
+                OSError,
+                ValueError,
+                HTTPError,
+                asyncio.TimeoutError,
+                asyncio.IncompleteReadError,
+            ):
+                self.errors += 1
+                keep_alive = False
+                await asyncio.sleep(0.1)
+            if not keep_alive and writer is not None:
+                writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    def _report(self, results):
+        for key, value in results.items():
+            self.stdout.write(f"{key:<16}{value}")
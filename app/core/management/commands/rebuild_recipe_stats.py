@@ -0,0 +1,80 @@
+"""
+Django management command recomputing the recipe statistics.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from recipe import stats
+
+
+def _rebuild(user_ids):
+    """Rebuild a batch on the worker thread's own connection"""
+    try:
+        stats.rebuild(user_ids)
+    finally:
+        connections.close_all()
+    return len(user_ids)
+
+
+class Command(BaseCommand):
+    """Django command to rebuild recipe statistics from the recipes"""
+
+    help = (
+        "Recompute per-user recipe statistics and tag recipe counts, "
+        "repairing any drift of the incremental updates"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            help="Comma separated user ids, all users by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Users rebuilt per transaction",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Batches rebuilt in parallel, 1 to rebuild inline",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for commands"""
+        if options["batch_size"] < 1 or options["workers"] < 1:
+            raise CommandError("--batch-size and --workers must be positive")
+        users = get_user_model().objects.order_by("pk")
+        if options["users"]:
+            try:
+                ids = [int(pk) for pk in options["users"].split(",")]
+            except ValueError:
+                raise CommandError("--users takes comma separated ids")
+            users = users.filter(pk__in=ids)
+        user_ids = list(users.values_list("pk", flat=True))
+        size = options["batch_size"]
+        batches = [
+            user_ids[start:start + size]
+            for start in range(0, len(user_ids), size)
+        ]
+
+        done = 0
+        if options["workers"] == 1:
+            for batch in batches:
+                stats.rebuild(batch)
+                done += len(batch)
+                self.stdout.write(f"Rebuilt {done}/{len(user_ids)} users")
+        else:
+            with ThreadPoolExecutor(options["workers"]) as pool:
+                futures = [pool.submit(_rebuild, batch) for batch in batches]
+                for future in as_completed(futures):
+                    done += future.result()
+                    self.stdout.write(f"Rebuilt {done}/{len(user_ids)} users")
+        self.stdout.write(
+            self.style.SUCCESS(f"Done: statistics of {done} users rebuilt")
+        )
@@ -0,0 +1,141 @@
+"""
+Django management command running queued background tasks.
+"""
+import logging
+import multiprocessing
+import signal
+import threading
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connections
+from django.utils.module_loading import autodiscover_modules
+
+from core.cache import require_shared
+
+logger = logging.getLogger(__name__)
+
+STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+def run(stop, batch_size, poll_interval, burst):
+    """Run tasks until stop is set, or until none are due in burst mode
+
+    Returns the number of tasks run.
+    """
+    # Imported here so worker processes can set Django up first
+    from core import tasks
+
+    autodiscover_modules("tasks")
+    done = 0
+    while True:
+        try:
+            ran = tasks.work(batch_size, stop)
+        except DatabaseError:
+            # Lost connection or lock contention, retried after a pause
+            logger.exception("Claiming tasks failed")
+            ran = None
+        else:
+            done += ran
+        if stop.is_set() or (burst and ran is not None):
+            return done
+        if not ran:
+            stop.wait(poll_interval)
+        close_old_connections()
+
+
+def _process(stop, *args):
+    """Entrypoint of a worker process"""
+    django.setup()
+    for signum in STOP_SIGNALS:
+        signal.signal(signum, lambda *_: stop.set())
+    try:
+        run(stop, *args)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    """Django command to run background tasks"""
+
+    help = (
+        "Run tasks queued with core.tasks, until stopped with SIGINT or "
+        "SIGTERM, which let running tasks finish"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=settings.TASK_WORKER_PROCESSES,
+            help="Worker processes, 1 to run tasks in this process",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10,
+            help="Tasks claimed by a worker at a time",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when no task is due",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once no task is due",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for commands"""
+        # Tasks invalidate cached API responses by bumping data versions,
+        # which a per-process cache would keep from the web processes
+        require_shared("API_CACHE_VERSION_ALIAS", "with the web processes")
+        processes = options["processes"]
+        if processes < 1 or options["batch_size"] < 1:
+            raise CommandError("--processes and --batch-size must be positive")
+        worker_args = (
+            options["batch_size"],
+            options["poll_interval"],
+            options["burst"],
+        )
+
+        if processes == 1:
+            stop = threading.Event()
+            previous = {
+                signum: signal.signal(signum, lambda *_: stop.set())
+                for signum in STOP_SIGNALS
+            }
+            try:
+                done = run(stop, *worker_args)
+            finally:
+                for signum, handler in previous.items():
+                    signal.signal(signum, handler)
+            self.stdout.write(self.style.SUCCESS(f"Done: {done} tasks run"))
+            return
+
+        # Connections must not be shared with the forked processes
+        connections.close_all()
+        context = multiprocessing.get_context()
+        stop = context.Event()
+        workers = [
+            context.Process(
+                target=_process, args=(stop, *worker_args), daemon=True
+            )
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {processes} worker processes")
+        for signum in STOP_SIGNALS:
+            signal.signal(signum, lambda *_: stop.set())
+        for worker in workers:
+            worker.join()
+            if worker.exitcode:
+                logger.error(
+                    "Worker %s exited with %s", worker.pid, worker.exitcode
+                )
+        self.stdout.write(self.style.SUCCESS("Done: workers stopped"))
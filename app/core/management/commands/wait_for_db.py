@@ -1,9 +1,10 @@
 """
 Django management command for waiting for the postgres db to finish setting up.
 """
+import random
 import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from psycopg2 import OperationalError as Psycopg2OpError
 from django.db.utils import OperationalError
 
@@ -11,18 +12,49 @@ from django.db.utils import OperationalError
 class Command(BaseCommand):
     """Django command to wait for database"""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="Seconds to keep trying before giving up",
+        )
+        parser.add_argument(
+            "--initial-delay",
+            type=float,
+            default=0.1,
+            help="Seconds to wait after the first failed attempt",
+        )
+        parser.add_argument(
+            "--max-delay",
+            type=float,
+            default=5,
+            help="Longest wait between two attempts",
+        )
+
     def handle(self, *args, **options):
         """Entrypoint for commands"""
         self.stdout.write("Waiting for database connection ... ")
-        db_up = False
-        while not db_up:
+        deadline = time.monotonic() + options["timeout"]
+        delay = options["initial_delay"]
+        while True:
             try:
                 self.check(databases=["default"])  # check for problems method
-                db_up = True
+                break
             except (Psycopg2OpError, OperationalError):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f"Database unavailable after {options['timeout']}s"
+                    )
+                # Jitter so that replicas started together spread out
+                wait = min(delay / 2 + random.uniform(0, delay / 2), remaining)
                 self.stdout.write(
-                    self.style.WARNING("Database unavailable, Waiting ...")
+                    self.style.WARNING(
+                        f"Database unavailable, retrying in {wait:.2f}s ..."
+                    )
                 )
-                time.sleep(1)
+                time.sleep(wait)
+                delay = min(delay * 2, options["max_delay"])
 
         self.stdout.write(self.style.SUCCESS("Database available"))
@@ -0,0 +1,291 @@
+"""
+Process metrics exported in the Prometheus text format
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "http_requests_total": ("counter", "Requests by route and status"),
+    "http_request_duration_seconds": (
+        "histogram",
+        "Request latency by route",
+    ),
+    "http_requests_throttled_total": (
+        "counter",
+        "Requests rejected by rate limits, by scope",
+    ),
+    "http_responses_compressed_total": (
+        "counter",
+        "Compressed responses by content coding",
+    ),
+    "http_response_bytes_saved_total": (
+        "counter",
+        "Bytes saved by compressing non-streaming responses",
+    ),
+    "db_queries_total": ("counter", "SQL statements executed"),
+    "db_query_duration_seconds": ("histogram", "SQL statement latency"),
+    "db_connections_created_total": (
+        "counter",
+        "Database connections opened or checked out of the pool",
+    ),
+    "cache_hits_total": ("counter", "Cache lookups that found a value"),
+    "cache_misses_total": ("counter", "Cache lookups that found nothing"),
+    "cache_evictions_total": ("counter", "Entries evicted to make room"),
+    "cache_hit_ratio": ("gauge", "Hits over lookups"),
+    "cache_entries": ("gauge", "Entries held in process caches"),
+    "cache_bytes": ("gauge", "Bytes held in process caches"),
+    "db_pool_size": ("gauge", "Open pooled connections"),
+    "db_pool_idle": ("gauge", "Pooled connections waiting for a request"),
+    "db_pool_in_use": ("gauge", "Pooled connections checked out"),
+    "db_pool_max_size": ("gauge", "Pooled connections allowed"),
+    "db_pool_wait_seconds": ("histogram", "Time to check out a connection"),
+    "db_pool_connections_opened_total": (
+        "counter",
+        "Connections the pool opened",
+    ),
+    "db_pool_timeouts_total": (
+        "counter",
+        "Checkouts that gave up waiting for a free connection",
+    ),
+    "db_replica_reads_total": ("counter", "Reads routed to a replica"),
+    "db_replica_fallbacks_total": (
+        "counter",
+        "Reads sent to the primary as no replica was healthy",
+    ),
+    "db_replica_healthy": ("gauge", "1 if the replica passed its check"),
+    "db_replica_lag_seconds": ("gauge", "Replication lag at last check"),
+    "db_pool_health_check_failures_total": (
+        "counter",
+        "Idle connections found dead when checked out",
+    ),
+    "tasks_total": ("counter", "Background tasks run, by outcome"),
+    "task_duration_seconds": ("histogram", "Background task run time"),
+}
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+_last_flush = 0.0
+_gauge_sources = []
+
+
+def _shard():
+    """Return this thread's counters, registering them on first use
+
+    Every thread only ever writes its own shard, so recording needs no
+    lock; shards are summed when metrics are read.
+    """
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = {"counters": defaultdict(float), "histograms": {}}
+        with _shards_lock:
+            _shards.append(shard)
+        _local.shard = shard
+    return shard
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def inc(name, labels, value=1):
+    """Increment a counter"""
+    _shard()["counters"][_key(name, labels)] += value
+
+
+def observe(name, labels, value):
+    """Record value in a histogram"""
+    histograms = _shard()["histograms"]
+    key = _key(name, labels)
+    histogram = histograms.get(key)
+    if histogram is None:
+        # One count per bucket plus +Inf, then sum and count
+        histogram = histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0, 0]
+    histogram[bisect_left(BUCKETS, value)] += 1
+    histogram[-2] += value
+    histogram[-1] += 1
+
+
+def register_gauges(source):
+    """Add gauges read when metrics are collected
+
+    source() must yield (name, labels, value) for the current process.
+    """
+    _gauge_sources.append(source)
+
+
+def _cache_gauges():
+    """Return the counters and gauges of caches that keep stats()"""
+    counters, gauges = {}, {}
+    for alias in settings.CACHES:
+        stats = getattr(caches[alias], "stats", None)
+        if stats is None:
+            continue
+        stats = stats()
+        labels = (("cache", alias),)
+        counters[("cache_hits_total", labels)] = stats["hits"]
+        counters[("cache_misses_total", labels)] = stats["misses"]
+        counters[("cache_evictions_total", labels)] = stats["evictions"]
+        gauges[("cache_entries", labels)] = stats["entries"]
+        gauges[("cache_bytes", labels)] = stats["bytes"]
+    return counters, gauges
+
+
+def snapshot():
+    """Return this process' metrics summed over all threads"""
+    counters = defaultdict(float)
+    histograms = {}
+    with _shards_lock:
+        shards = list(_shards)
+    for shard in shards:
+        for key, value in dict(shard["counters"]).items():
+            counters[key] += value
+        for key, values in dict(shard["histograms"]).items():
+            total = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(list(values)):
+                total[i] += value
+    cache_counters, gauges = _cache_gauges()
+    counters.update(cache_counters)
+    for source in _gauge_sources:
+        for name, labels, value in source():
+            gauges[_key(name, labels)] = value
+    return {
+        "counters": [[*key, value] for key, value in counters.items()],
+        "histograms": [[*key, value] for key, value in histograms.items()],
+        "gauges": [[*key, value] for key, value in gauges.items()],
+    }
+
+
+def flush(force=False):
+    """Write this process' snapshot to METRICS_DIR for other workers
+
+    Writes are rate limited to one per METRICS_FLUSH_INTERVAL seconds
+    unless forced, and are atomic so readers never see partial files.
+    """
+    global _last_flush
+    directory = settings.METRICS_DIR
+    now = time.monotonic()
+    if not directory or (
+        not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL
+    ):
+        return
+    _last_flush = now
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _snapshots():
+    """Yield the snapshot of every worker, or of this process alone
+
+    Counters of workers that have exited are kept so totals never go
+    backwards; their gauges are dropped once the file goes stale.
+    """
+    directory = settings.METRICS_DIR
+    if not directory:
+        yield snapshot(), True
+        return
+    flush(force=True)
+    stale_before = time.time() - settings.METRICS_FLUSH_INTERVAL * 3
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            live = os.path.getmtime(path) >= stale_before
+        except (OSError, ValueError):
+            continue
+        yield data, live
+
+
+def collect():
+    """Return (counters, histograms, gauges) aggregated over workers"""
+    counters = defaultdict(float)
+    histograms = {}
+    gauges = defaultdict(float)
+    for data, live in _snapshots():
+        for name, labels, value in data["counters"]:
+            counters[name, tuple(map(tuple, labels))] += value
+        for name, labels, values in data["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                total[i] += value
+        if live:
+            for name, labels, value in data["gauges"]:
+                gauges[name, tuple(map(tuple, labels))] += value
+
+    for (name, labels), hits in list(counters.items()):
+        if name == "cache_hits_total":
+            lookups = hits + counters[("cache_misses_total", labels)]
+            gauges[("cache_hit_ratio", labels)] = (
+                hits / lookups if lookups else 0.0
+            )
+    return counters, histograms, gauges
+
+
+def _labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format"""
+    counters, histograms, gauges = collect()
+    samples = defaultdict(list)
+    for (name, labels), value in counters.items():
+        samples[name].append(f"{name}{_labels(labels)} {value:g}")
+    for (name, labels), value in gauges.items():
+        samples[name].append(f"{name}{_labels(labels)} {value:g}")
+    for (name, labels), values in histograms.items():
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), values):
+            cumulative += count
+            le = bound if isinstance(bound, str) else f"{bound:g}"
+            samples[name].append(
+                f"{name}_bucket{_labels(labels, le=le)} {cumulative}"
+            )
+        samples[name].append(f"{name}_sum{_labels(labels)} {values[-2]:g}")
+        samples[name].append(f"{name}_count{_labels(labels)} {values[-1]}")
+
+    lines = []
+    for name in sorted(samples):
+        kind, text = HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(sorted(samples[name]))
+    return "\n".join(lines) + "\n"
+
+
+def count_query(execute, sql, params, many, context):
+    """connection.execute_wrapper counting every query"""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        labels = {"database": context["connection"].alias}
+        inc("db_queries_total", labels)
+        observe(
+            "db_query_duration_seconds",
+            labels,
+            time.perf_counter() - started,
+        )
@@ -0,0 +1,253 @@
+"""
+Middleware for the API
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+from core import compression, instrumentation, metrics
+
+logger = logging.getLogger("core.instrumentation")
+
+
+class AsyncCapableMiddleware:
+    """Middleware running natively under both WSGI and ASGI
+
+    Subclasses implement __call__ for sync and __acall__ for async
+    requests; __call__ must start by returning self.__acall__(request)
+    when is_async is set. This avoids a thread switch per middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Make Django treat instances as coroutine functions
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+
+class CompressionMiddleware(AsyncCapableMiddleware):
+    """Compress responses with the best coding the client accepts
+
+    Offers the codings of core.compression in COMPRESSION_ENCODINGS
+    order. Bodies smaller than COMPRESSION_MIN_SIZE are sent as they
+    are; streaming responses are compressed chunk by chunk, flushing
+    after every chunk so clients still receive them progressively.
+
+    Views may set response.compression_cache_key to the cache key of
+    the uncompressed payload; compressed bodies are then kept next to
+    it in the COMPRESSION_CACHE_ALIAS cache and reused.
+    """
+
+    # Under ASGI, bodies at least this large are compressed in a thread
+    # instead of on the event loop
+    offload_size = 64 * 1024
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if response.streaming or len(response.content) < self.offload_size:
+            return self.compress(request, response)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.compress, request, response
+        )
+
+    def compress(self, request, response):
+        if not self.compressible(response):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        codec = compression.negotiate(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        if codec is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = codec.stream(
+                response.streaming_content
+            )
+            del response["Content-Length"]
+        else:
+            body = self.compressed_body(response, codec)
+            saved = len(response.content) - len(body)
+            if saved <= 0:
+                return response
+            response.content = body
+            response["Content-Length"] = str(len(body))
+            metrics.inc(
+                "http_response_bytes_saved_total",
+                {"encoding": codec.name},
+                saved,
+            )
+
+        # A strong ETag would claim byte equality with the original
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = codec.name
+        metrics.inc(
+            "http_responses_compressed_total", {"encoding": codec.name}
+        )
+        return response
+
+    def compressible(self, response):
+        if (
+            response.has_header("Content-Encoding")
+            or response.status_code == 206
+            or "no-transform" in response.get("Cache-Control", "")
+        ):
+            return False
+        content_type = response.get("Content-Type", "").split(";")[0]
+        if not (
+            content_type.startswith("text/")
+            or content_type.endswith(("json", "xml", "javascript"))
+        ):
+            return False
+        return (
+            response.streaming
+            or len(response.content) >= settings.COMPRESSION_MIN_SIZE
+        )
+
+    def compressed_body(self, response, codec):
+        key = getattr(response, "compression_cache_key", None)
+        if key is None:
+            return codec.compress(response.content)
+
+        # The same payload renders differently per media type
+        content_type = response["Content-Type"].replace(" ", "")
+        key = f"{key}:{content_type}:{codec.name}"
+        cache = caches[settings.COMPRESSION_CACHE_ALIAS]
+        body = cache.get(key)
+        if body is None:
+            body = codec.compress(response.content)
+            cache.set(key, body)
+        return body
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """Count requests and their latency per route for /metrics"""
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, elapsed):
+        match = request.resolver_match
+        route = match.view_name if match else "unmatched"
+        metrics.inc(
+            "http_requests_total",
+            {
+                "route": route,
+                "method": request.method,
+                "status": str(response.status_code),
+            },
+        )
+        metrics.observe(
+            "http_request_duration_seconds", {"route": route}, elapsed
+        )
+        metrics.flush()
+
+
+class InstrumentationMiddleware(AsyncCapableMiddleware):
+    """Time sampled requests and report them as Server-Timing headers
+
+    A fraction of requests (INSTRUMENTATION_SAMPLE_RATE) records the
+    number and duration of SQL queries, authentication, serialization
+    and total view time. Results are sent as a Server-Timing header and
+    logged as one JSON line; statements repeated at least
+    INSTRUMENTATION_DUPLICATE_THRESHOLD times are logged as likely N+1
+    queries together with the code that issued them. Unsampled requests
+    only pay for one random() call.
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+            return self.get_response(request)
+
+        with instrumentation.collect() as metrics:
+            started = time.perf_counter()
+            response = self.get_response(request)
+            total = time.perf_counter() - started
+        return self.report(request, response, metrics, total)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        with instrumentation.collect() as metrics:
+            started = time.perf_counter()
+            response = await self.get_response(request)
+            total = time.perf_counter() - started
+        return self.report(request, response, metrics, total)
+
+    def report(self, request, response, metrics, total):
+        response["Server-Timing"] = self.server_timing(metrics, total)
+        self.log(request, response, metrics, total)
+        return response
+
+    def server_timing(self, metrics, total):
+        entries = [
+            f'db;dur={metrics.query_time * 1000:.1f};'
+            f'desc="{metrics.queries} queries"'
+        ]
+        for name, seconds in sorted(metrics.timings.items()):
+            entries.append(f"{name};dur={seconds * 1000:.1f}")
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+    def log(self, request, response, metrics, total):
+        duplicates = metrics.duplicates()
+        logger.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "total_ms": round(total * 1000, 2),
+                    "db_ms": round(metrics.query_time * 1000, 2),
+                    "queries": metrics.queries,
+                    "duplicate_queries": len(duplicates),
+                    **{
+                        f"{name}_ms": round(seconds * 1000, 2)
+                        for name, seconds in metrics.timings.items()
+                    },
+                }
+            )
+        )
+        for sql, count, site in duplicates:
+            logger.warning(
+                json.dumps(
+                    {
+                        "event": "duplicate_query",
+                        "path": request.path,
+                        "count": count,
+                        "sql": sql,
+                        "call_site": site,
+                    }
+                )
+            )
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:27
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('pg_catalog.english', coalesce({row}title, '')), 'A')"
+    " || setweight(to_tsvector('pg_catalog.english', "
+    "coalesce({row}description, '')), 'B')"
+)
+
+CREATE_TRIGGER = """
+CREATE FUNCTION core_recipe_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {document};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description ON core_recipe
+    FOR EACH ROW EXECUTE PROCEDURE core_recipe_search_vector_update();
+
+UPDATE core_recipe SET search_vector = {backfill};
+""".format(
+    document=SEARCH_DOCUMENT.format(row="NEW."),
+    backfill=SEARCH_DOCUMENT.format(row=""),
+)
+
+DROP_TRIGGER = """
+DROP TRIGGER core_recipe_search_vector_trigger ON core_recipe;
+DROP FUNCTION core_recipe_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_tag_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
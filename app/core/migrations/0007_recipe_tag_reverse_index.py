@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:31
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Index the auto-created recipe-tag table from the tag side
+
+    The unique (recipe_id, tag_id) constraint already covers lookups by
+    recipe; this covers "recipes with tag X" and "tags in use" lookups
+    with an index-only scan.
+    """
+
+    dependencies = [
+        ('core', '0006_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX core_recipe_tag_tag_recipe_idx "
+            "ON core_recipe_tag (tag_id, recipe_id);",
+            "DROP INDEX core_recipe_tag_tag_recipe_idx;",
+        ),
+    ]
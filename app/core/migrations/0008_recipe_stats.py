@@ -0,0 +1,64 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:09
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def populate(apps, schema_editor):
+    """Compute the statistics of existing recipes with set-based queries"""
+    Recipe = apps.get_model("core", "Recipe")
+    RecipeStats = apps.get_model("core", "RecipeStats")
+    Tag = apps.get_model("core", "Tag")
+
+    totals = (
+        Recipe.objects.values("user_id")
+        .annotate(
+            recipe_count=Count("id"),
+            total_time_minutes=Sum("time_minutes"),
+            total_price=Sum("price"),
+            min_price=Min("price"),
+            max_price=Max("price"),
+        )
+        .order_by()
+    )
+    RecipeStats.objects.bulk_create(
+        (RecipeStats(**row) for row in totals.iterator()), batch_size=1000
+    )
+    tagged = (
+        Recipe.tag.through.objects.filter(tag_id=OuterRef("pk"))
+        .order_by()
+        .values("tag_id")
+        .annotate(count=Count("recipe_id"))
+        .values("count")
+    )
+    Tag.objects.update(recipe_count=Coalesce(Subquery(tagged), 0))
+
+
+class Migration(migrations.Migration):
+    """Per-user recipe statistics and per-tag recipe counts"""
+
+    dependencies = [
+        ('core', '0007_recipe_tag_reverse_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_stats', serialize=False, to='core.user')),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('total_time_minutes', models.BigIntegerField(default=0)),
+                ('total_price', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=5, null=True)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=5, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to='recipes/images/'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:46
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Fold tags sharing a user and name into the oldest of them"""
+    Tag = apps.get_model("core", "Tag")
+    Through = apps.get_model("core", "Recipe").tag.through
+
+    duplicates = (
+        Tag.objects.values("user_id", "name")
+        .annotate(keep=Min("id"), count=Count("id"))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    for row in duplicates.iterator():
+        others = Tag.objects.filter(
+            user_id=row["user_id"], name=row["name"]
+        ).exclude(id=row["keep"])
+        recipe_ids = (
+            Through.objects.filter(tag__in=others)
+            .values_list("recipe_id", flat=True)
+            .distinct()
+        )
+        # Recipes already carrying the kept tag just lose the duplicate
+        Through.objects.bulk_create(
+            [Through(recipe_id=pk, tag_id=row["keep"]) for pk in recipe_ids],
+            ignore_conflicts=True,
+        )
+        others.delete()
+        Tag.objects.filter(id=row["keep"]).update(
+            recipe_count=Through.objects.filter(tag_id=row["keep"]).count()
+        )
+
+
+class Migration(migrations.Migration):
+    """Merge tags sharing a user and name before they're made unique
+
+    Separate from the constraint, as PostgreSQL can't alter a table with
+    deferred checks of deleted rows pending in the same transaction.
+    """
+
+    dependencies = [
+        ('core', '0011_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """One tag per user and name, so concurrent writes can't duplicate"""
+
+    dependencies = [
+        ('core', '0012_merge_duplicate_tags'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='tag_user_name_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='tag_user_name_uniq'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_tag_user_name_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_user_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_user_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_user_title_idx',
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'price', 'id'], name='recipe_user_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'time_minutes', 'id'], name='recipe_user_time_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'title', 'id'], name='recipe_user_title_id_idx'),
+        ),
+    ]
@@ -1,7 +1,10 @@
 """
 Database Models
 """
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -62,11 +65,65 @@ class Recipe(models.Model):
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
     tag = models.ManyToManyField("Tag")
+    # Stored under its content hash by recipe.images, with thumbnails as
+    # {bounding box size: name} once a task worker has made them
+    image = models.ImageField(
+        null=True, blank=True, upload_to="recipes/images/"
+    )
+    thumbnails = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Weighted title/description document kept up to date by a database
+    # trigger (see migration 0006) so bulk writes are covered too
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"], name="recipe_user_id_idx"),
+            # Range filters and (sort key, id) cursors of the recipe list
+            models.Index(
+                fields=["user", "price", "id"],
+                name="recipe_user_price_id_idx",
+            ),
+            models.Index(
+                fields=["user", "time_minutes", "id"],
+                name="recipe_user_time_id_idx",
+            ),
+            models.Index(
+                fields=["user", "title", "id"],
+                name="recipe_user_title_id_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="recipe_search_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class TagManager(models.Manager):
+    """Manager for Tags"""
+
+    def get_or_create_many(self, user, names):
+        """Returns a name -> tag map, creating missing tags in one query
+
+        Tags created by a concurrent request meanwhile are skipped by
+        the insert and read back with the new ones.
+        """
+        names = set(names)
+        tags = {
+            tag.name: tag for tag in self.filter(user=user, name__in=names)
+        }
+        missing = sorted(names - tags.keys())
+        if missing:
+            self.bulk_create(
+                [self.model(user=user, name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            for tag in self.filter(user=user, name__in=missing):
+                tags[tag.name] = tag
+
+        return tags
+
+
 class Tag(models.Model):
     """Model for Tags"""
 
@@ -75,6 +132,66 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # Recipes carrying the tag, maintained by recipe.stats
+    recipe_count = models.IntegerField(default=0)
+
+    objects = TagManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"], name="tag_user_name_uniq"
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class RecipeStats(models.Model):
+    """Per-user recipe aggregates, maintained by recipe.stats"""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="recipe_stats",
+    )
+    recipe_count = models.IntegerField(default=0)
+    total_time_minutes = models.BigIntegerField(default=0)
+    total_price = models.DecimalField(
+        max_digits=15, decimal_places=2, default=0
+    )
+    min_price = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    max_price = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+
+    def __str__(self):
+        return f"Recipe statistics of {self.user_id}"
+
+
+class Task(models.Model):
+    """Call of a core.tasks task waiting for a worker"""
+
+    name = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField()
+    # Claimed tasks are hidden until their visibility timeout runs out
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    failed_at = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["available_at"],
+                name="task_available_idx",
+                condition=models.Q(failed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
@@ -0,0 +1,35 @@
+"""
+JSON parser decoding with orjson
+"""
+import codecs
+
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from core.renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(parsers.JSONParser):
+    """Parse UTF-8 JSON bodies with orjson
+
+    orjson rejects NaN and Infinity like JSONParser's strict mode. Other
+    encodings and installs without orjson use JSONParser.
+    """
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if (
+            orjson is None
+            or not self.strict
+            or codecs.lookup(encoding).name != "utf-8"
+        ):
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -0,0 +1,48 @@
+"""
+JSON renderer encoding with orjson
+"""
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Encodes what orjson can't natively (Decimal, lazy strings, ...)
+_default = encoders.JSONEncoder().default
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """Render JSON with orjson, several times faster than json.dumps
+
+    Output matches JSONRenderer's compact form. Indented responses (as
+    asked for with "Accept: application/json; indent=4" or by the
+    browsable API) and installs without orjson use JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        if data is None:
+            return b""
+
+        ret = orjson.dumps(
+            data,
+            default=_default,
+            # Datetimes formatted like DRF, non-str keys converted like json
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        if b"\xe2\x80" in ret:
+            # Escaped like JSONRenderer so the JSON is valid JavaScript
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
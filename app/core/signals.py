@@ -0,0 +1,22 @@
+"""
+Signal handlers for the core app
+"""
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core import instrumentation, metrics
+
+
+@receiver(connection_created)
+def install_query_wrappers(sender, connection, **kwargs):
+    """Count and time the queries of every new database connection
+
+    The wrappers are installed on the connection rather than per request
+    so that queries run in any thread (e.g. the ASGI view pool) are seen.
+    """
+    metrics.inc(
+        "db_connections_created_total", {"database": connection.alias}
+    )
+    for wrapper in (metrics.count_query, instrumentation.query_wrapper):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
@@ -0,0 +1,200 @@
+"""
+Background tasks queued in the database and run by manage.py run_worker
+"""
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from core import metrics
+from core.models import Task
+
+logger = logging.getLogger(__name__)
+
+# Task functions by name, filled by @task as modules are imported
+REGISTRY = {}
+# Appended to last_error of tasks whose final attempt never finished
+LOST_ERROR = "\nThe worker running the last attempt was lost."
+
+
+class TaskFunction:
+    """A function that can be queued for a worker, made with @task"""
+
+    def __init__(self, func, name, max_attempts, visibility_timeout):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.visibility_timeout = visibility_timeout
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<task {self.name}>"
+
+    def enqueue(self, *args, **kwargs):
+        """Queue a call with JSON serializable arguments
+
+        Queued inside a transaction, workers only see the task once it
+        commits, and never if it rolls back.
+        """
+        return Task.objects.create(
+            name=self.name,
+            args=list(args),
+            kwargs=kwargs,
+            max_attempts=self.max_attempts,
+        )
+
+
+def task(func=None, *, name=None, max_attempts=None, visibility_timeout=None):
+    """Register a function as a task, usable as @task or @task(...)
+
+    Tasks are named after their module and function by default. A task
+    still running after visibility_timeout seconds is considered lost
+    and run again, so they should be safe to repeat.
+    """
+
+    def register(func):
+        task_function = TaskFunction(
+            func,
+            name or f"{func.__module__}.{func.__qualname__}",
+            max_attempts or settings.TASK_MAX_ATTEMPTS,
+            visibility_timeout or settings.TASK_VISIBILITY_TIMEOUT,
+        )
+        REGISTRY[task_function.name] = task_function
+        return task_function
+
+    return register if func is None else register(func)
+
+
+def claim(limit):
+    """Return up to limit due tasks, hidden from other workers
+
+    Rows are locked with SKIP LOCKED where the database has it, and a
+    task is only taken if no other worker claimed it in the meantime.
+    Due tasks without attempts left, whose last run killed or hung its
+    worker, are marked failed instead.
+    """
+    now = timezone.now()
+    using = router.db_for_write(Task)
+    pending = Task.objects.using(using).filter(
+        failed_at__isnull=True, available_at__lte=now
+    )
+    lost = list(
+        pending.filter(attempts__gte=F("max_attempts")).values_list(
+            "pk", "name"
+        )
+    )
+    if lost:
+        Task.objects.using(using).filter(
+            pk__in=[pk for pk, _ in lost]
+        ).update(
+            failed_at=now,
+            last_error=Concat(F("last_error"), Value(LOST_ERROR)),
+        )
+        for pk, name in lost:
+            logger.error("Task %s #%s lost its worker, giving up", name, pk)
+            metrics.inc("tasks_total", {"task": name, "outcome": "failed"})
+
+    due = pending.filter(attempts__lt=F("max_attempts")).order_by(
+        "available_at"
+    )
+    if connections[using].features.has_select_for_update_skip_locked:
+        due = due.select_for_update(skip_locked=True)
+
+    claimed = []
+    with transaction.atomic(using=using):
+        for row in due[:limit]:
+            function = REGISTRY.get(row.name)
+            timeout = (
+                function.visibility_timeout
+                if function
+                else settings.TASK_VISIBILITY_TIMEOUT
+            )
+            row.available_at = now + timedelta(seconds=timeout)
+            taken = Task.objects.using(using).filter(
+                pk=row.pk, attempts=row.attempts
+            ).update(
+                attempts=F("attempts") + 1, available_at=row.available_at
+            )
+            if taken:
+                row.attempts += 1
+                claimed.append(row)
+    return claimed
+
+
+def execute(row):
+    """Run a claimed task, then delete it or schedule its retry"""
+    started = time.monotonic()
+    try:
+        function = REGISTRY.get(row.name)
+        if function is None:
+            raise LookupError(f"Unknown task {row.name}")
+        function.func(*row.args, **row.kwargs)
+    except Exception:
+        outcome = _failed(row, traceback.format_exc())
+    else:
+        outcome = "succeeded"
+        # Unless it timed out and another worker took it over
+        Task.objects.filter(pk=row.pk, attempts=row.attempts).delete()
+
+    metrics.observe(
+        "task_duration_seconds",
+        {"task": row.name},
+        time.monotonic() - started,
+    )
+    metrics.inc("tasks_total", {"task": row.name, "outcome": outcome})
+    return outcome
+
+
+def _failed(row, error):
+    """Schedule the retry of a failed task, or give up on it"""
+    now = timezone.now()
+    current = Task.objects.filter(pk=row.pk, attempts=row.attempts)
+    if row.attempts >= row.max_attempts:
+        logger.error("Task %s failed, giving up\n%s", row, error)
+        current.update(failed_at=now, last_error=error)
+        return "failed"
+
+    logger.warning("Task %s failed, retrying\n%s", row, error)
+    # Exponential backoff
+    delay = settings.TASK_RETRY_DELAY * 2 ** (row.attempts - 1)
+    current.update(
+        available_at=now + timedelta(seconds=delay), last_error=error
+    )
+    return "retried"
+
+
+def release(rows):
+    """Make claimed tasks that weren't run due again"""
+    for row in rows:
+        Task.objects.filter(pk=row.pk, attempts=row.attempts).update(
+            attempts=F("attempts") - 1, available_at=timezone.now()
+        )
+
+
+def work(batch_size=10, stop=None):
+    """Run due tasks until none are left, return how many ran
+
+    stop is an Event set to finish after the current task.
+    """
+    done = 0
+    while stop is None or not stop.is_set():
+        rows = claim(batch_size)
+        if not rows:
+            break
+        for index, row in enumerate(rows):
+            if stop is not None and stop.is_set():
+                release(rows[index:])
+                break
+            execute(row)
+            done += 1
+        metrics.flush()
+    return done
@@ -0,0 +1,97 @@
+"""
+Tests for the ASGI handler
+"""
+import asyncio
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import TransactionTestCase, override_settings
+
+from core.asgi import ASGIHandler
+
+
+class ASGIHandlerTests(TransactionTestCase):
+    """Test responses sent by core.asgi.ASGIHandler"""
+
+    def send_response(self, response):
+        """Send the response and return the ASGI messages"""
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(ASGIHandler().send_response)(response, send)
+        return messages
+
+    def test_streamed_body_read_off_the_loop(self):
+        """Test generators reading the database stream from one thread"""
+        get_user_model().objects.create_user("a@example.com", "pass123")
+        threads = set()
+
+        def stream():
+            for email in get_user_model().objects.values_list(
+                "email", flat=True
+            ):
+                threads.add(threading.get_ident())
+                yield email
+            threads.add(threading.get_ident())
+            yield "\n"
+
+        response = StreamingHttpResponse(stream(), content_type="text/plain")
+        response.set_cookie("seen", "1")
+
+        messages = self.send_response(response)
+
+        self.assertEqual(messages[0]["type"], "http.response.start")
+        self.assertIn(
+            (b"Content-Type", b"text/plain"), messages[0]["headers"]
+        )
+        self.assertTrue(
+            any(name == b"Set-Cookie" for name, _ in messages[0]["headers"])
+        )
+        self.assertEqual(
+            b"".join(m.get("body", b"") for m in messages[1:]),
+            b"a@example.com\n",
+        )
+        self.assertNotIn("more_body", messages[-1])
+        self.assertEqual(len(threads), 1)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_plain_response_sent_by_django(self):
+        """Test other responses are sent as before"""
+        messages = self.send_response(HttpResponse(b"done"))
+
+        self.assertEqual(messages[0]["status"], 200)
+        self.assertEqual(messages[1]["body"], b"done")
+
+    @override_settings(ASGI_STREAM_THREADS=1)
+    def test_streams_at_once_bounded(self):
+        """Test bodies beyond ASGI_STREAM_THREADS wait for a thread"""
+        lock = threading.Lock()
+        active = [0, 0]  # now, most at once
+
+        def stream():
+            with lock:
+                active[0] += 1
+                active[1] = max(active)
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            yield b"done"
+
+        async def send(message):
+            pass
+
+        async def send_both():
+            handler = ASGIHandler()
+            await asyncio.gather(*(
+                handler.send_response(StreamingHttpResponse(stream()), send)
+                for _ in range(2)
+            ))
+
+        async_to_sync(send_both)()
+
+        self.assertEqual(active[1], 1)
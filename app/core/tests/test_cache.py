@@ -0,0 +1,69 @@
+"""
+Tests for the LRU memory cache backend
+"""
+from django.test import SimpleTestCase
+
+from core.cache import LRUMemoryCache
+
+
+def create_cache(**options):
+    """Helper to create and return an isolated cache"""
+    return LRUMemoryCache("test", {"OPTIONS": options})
+
+
+class LRUMemoryCacheTests(SimpleTestCase):
+    """Tests for the bounded LRU cache"""
+
+    def test_get_and_set(self):
+        """Test values round trip and misses return the default"""
+        cache = create_cache()
+        cache.set("key", {"value": 1})
+
+        self.assertEqual(cache.get("key"), {"value": 1})
+        self.assertIsNone(cache.get("missing"))
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_evicts_least_recently_used_by_size(self):
+        """Test the oldest unused entries go first when over MAX_BYTES"""
+        cache = create_cache(MAX_BYTES=300)
+        cache.set("a", "x" * 100)
+        cache.set("b", "x" * 100)
+        cache.get("a")  # a is now the most recently used
+        cache.set("c", "x" * 100)
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        stats = cache.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertLessEqual(stats["bytes"], 300)
+
+    def test_oversized_value_not_stored(self):
+        """Test a value larger than the whole cache is skipped"""
+        cache = create_cache(MAX_BYTES=50)
+        cache.set("small", 1)
+        cache.set("big", "x" * 100)
+
+        self.assertNotIn("big", cache)
+        self.assertEqual(cache.get("small"), 1)
+
+    def test_expired_entries_are_dropped(self):
+        """Test entries are not returned after their timeout"""
+        cache = create_cache()
+        cache.set("key", "value", timeout=-1)
+
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+    def test_incr_and_delete(self):
+        """Test counters increment in place and keys can be removed"""
+        cache = create_cache()
+        cache.set("count", 1)
+
+        self.assertEqual(cache.incr("count"), 2)
+        self.assertTrue(cache.delete("count"))
+        with self.assertRaises(ValueError):
+            cache.incr("count")
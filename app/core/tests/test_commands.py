@@ -1,13 +1,22 @@
 """
 Test the custom django management commands
 """
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
-from django.test import SimpleTestCase
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.db.utils import OperationalError
 from psycopg2 import OperationalError as Psycopg2Error
 
+from core.models import Recipe, Tag
+
 
 @patch("core.management.commands.wait_for_db.Command.check")
 class CommandTests(SimpleTestCase):
@@ -28,3 +37,220 @@ class CommandTests(SimpleTestCase):
         call_command("wait_for_db")
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=["default"])
+
+    @patch("time.sleep")
+    def test_wait_for_db_backoff(self, patched_sleep, patched_check):
+        """Test the wait between attempts grows up to max_delay"""
+        patched_check.side_effect = [OperationalError] * 8 + [True]
+
+        call_command("wait_for_db", max_delay=2, stdout=StringIO())
+
+        waits = [c.args[0] for c in patched_sleep.call_args_list]
+        self.assertLessEqual(waits[0], 0.1)
+        self.assertGreater(waits[-1], 1)
+        self.assertTrue(all(wait <= 2 for wait in waits))
+
+    @patch("time.sleep")
+    def test_wait_for_db_deadline(self, patched_sleep, patched_check):
+        """Test giving up once the timeout has passed"""
+        patched_check.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            call_command("wait_for_db", timeout=0, stdout=StringIO())
+
+        patched_sleep.assert_not_called()
+
+
+class ExportRecipesCommandTests(TestCase):
+    """Test the export_recipes command"""
+
+    def test_export_recipes_ndjson(self):
+        """Test the user's recipes are written one per line"""
+        user = get_user_model().objects.create_user(
+            "test@example.com", "TestPass123"
+        )
+        recipe = Recipe.objects.create(
+            user=user,
+            title="Soup",
+            time_minutes=20,
+            price=Decimal("4.00"),
+        )
+        recipe.tag.add(Tag.objects.create(user=user, name="Warm"))
+        out = StringIO()
+
+        call_command("export_recipes", "test@example.com", stdout=out)
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["title"], "Soup")
+        self.assertEqual(rows[0]["tags"], ["Warm"])
+
+    def test_export_recipes_unknown_user(self):
+        """Test an unknown email is reported as an error"""
+        with self.assertRaises(CommandError):
+            call_command("export_recipes", "nobody@example.com")
+
+
+class ImportRecipesCommandTests(TestCase):
+    """Test the import_recipes command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "test@example.com", "TestPass123"
+        )
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write_file(self, name, content):
+        """Write content to a temporary file and return its path"""
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_import_ndjson_with_tags(self):
+        """Test recipes load in batches and tags are reused"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        lines = [
+            {"title": f"Recipe {i}", "time_minutes": i + 1,
+             "price": "2.50", "tags": ["Vegan", "Quick"]}
+            for i in range(5)
+        ]
+        path = self.write_file(
+            "recipes.ndjson", "\n".join(json.dumps(r) for r in lines)
+        )
+        out = StringIO()
+
+        call_command(
+            "import_recipes", path, email=self.user.email,
+            batch_size=2, stdout=out,
+        )
+
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 5)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        for recipe in recipes:
+            self.assertEqual(
+                sorted(t.name for t in recipe.tag.all()), ["Quick", "Vegan"]
+            )
+        self.assertIn("5 recipes imported", out.getvalue())
+
+    def test_import_csv_with_user_column(self):
+        """Test rows can name their owner and CSV tags are split"""
+        path = self.write_file(
+            "recipes.csv",
+            "user,title,time_minutes,price,tags\n"
+            f"{self.user.email},Soup,20,4.00,Warm|Quick\n",
+        )
+
+        call_command("import_recipes", path, stdout=StringIO())
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, "Soup")
+        self.assertEqual(recipe.price, Decimal("4.00"))
+        self.assertEqual(recipe.tag.count(), 2)
+
+    def test_import_skips_invalid_rows(self):
+        """Test invalid rows are reported and the rest are loaded"""
+        path = self.write_file(
+            "recipes.ndjson",
+            '{"title": "Good", "time_minutes": 5, "price": "1.00"}\n'
+            '{"title": "Bad", "time_minutes": "soon", "price": "1.00"}\n'
+            '{"title": "Too pricey", "time_minutes": 5, "price": "10000"}\n'
+            "not json\n",
+        )
+        out, err = StringIO(), StringIO()
+
+        call_command(
+            "import_recipes", path, email=self.user.email,
+            stdout=out, stderr=err,
+        )
+
+        self.assertEqual(
+            list(Recipe.objects.values_list("title", flat=True)), ["Good"]
+        )
+        self.assertIn("3 skipped", out.getvalue())
+        self.assertIn("Line 2 skipped", err.getvalue())
+
+    def test_import_unknown_user(self):
+        """Test an unknown owner aborts the import"""
+        path = self.write_file(
+            "recipes.ndjson",
+            '{"title": "Soup", "time_minutes": 5, "price": "1.00"}\n',
+        )
+
+        with self.assertRaises(CommandError):
+            call_command(
+                "import_recipes", path, email="nobody@example.com",
+                stdout=StringIO(),
+            )
+
+
+class BenchmarkApiCommandTests(TestCase):
+    """Test the benchmark_api command"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        # For the images uploaded by recipe-upload-image
+        media = override_settings(MEDIA_ROOT=self.dir)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def run_benchmark(self, **options):
+        call_command(
+            "benchmark_api",
+            users=2,
+            recipes=6,
+            tags=2,
+            requests=3,
+            no_test_db=True,
+            stdout=StringIO(),
+            **options,
+        )
+
+    def test_benchmark_writes_results(self):
+        """Test every endpoint is measured and written as JSON"""
+        output = os.path.join(self.dir, "results.json")
+        self.run_benchmark(output=output)
+
+        with open(output) as f:
+            results = json.load(f)
+        self.assertEqual(results["config"]["recipes"], 6)
+        self.assertIn("recipe-list", results["endpoints"])
+        self.assertIn("user-me", results["endpoints"])
+        for name, result in results["endpoints"].items():
+            self.assertEqual(result["requests"], 3)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertTrue(
+                all(code < 400 for code in result["statuses"]), name
+            )
+
+    def test_benchmark_cleans_up_fixtures(self):
+        """Test runs on the configured database leave no data behind"""
+        for _ in range(2):
+            self.run_benchmark(endpoints="recipe-list,user-create")
+
+        self.assertFalse(
+            get_user_model().objects.filter(
+                email__startswith="bench-"
+            ).exists()
+        )
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_baseline_regression(self):
+        """Test a slower run than the baseline fails"""
+        baseline = os.path.join(self.dir, "baseline.json")
+        with open(baseline, "w") as f:
+            json.dump(
+                {
+                    "endpoints": {
+                        "recipe-list": {"p95_ms": 0.0, "queries_max": 0},
+                    },
+                },
+                f,
+            )
+
+        with self.assertRaisesMessage(CommandError, "recipe-list"):
+            self.run_benchmark(endpoints="recipe-list", baseline=baseline)
@@ -0,0 +1,158 @@
+"""
+Tests for response compression
+"""
+import gzip
+import json
+from unittest.mock import patch
+
+import brotli
+import zstandard
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import compression
+from core.middleware import CompressionMiddleware
+from core.models import Recipe
+
+RECIPES_URL = reverse("recipe:recipe-list")
+EXPORT_URL = reverse("recipe:recipe-export")
+
+
+def decode(body, encoding):
+    """Return body decoded from the given content coding"""
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "br":
+        return brotli.decompress(body)
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    return body
+
+
+def decompress(res):
+    """Return the decoded body of a possibly streamed response"""
+    if res.streaming:
+        body = b"".join(res.streaming_content)
+    else:
+        body = res.content
+    return decode(body, res.get("Content-Encoding"))
+
+
+class NegotiateTests(SimpleTestCase):
+    """Test choosing a content coding"""
+
+    def test_server_preference_breaks_ties(self):
+        """Test equally acceptable codings go by COMPRESSION_ENCODINGS"""
+        codec = compression.negotiate("gzip, deflate, br, zstd")
+
+        self.assertEqual(codec.name, "br")
+
+    def test_client_quality_wins(self):
+        """Test the client's q values decide first"""
+        codec = compression.negotiate("br;q=0.5, gzip;q=0.9")
+
+        self.assertEqual(codec.name, "gzip")
+
+    def test_refused_and_unknown_codings(self):
+        """Test q=0 and unsupported codings are never chosen"""
+        self.assertIsNone(compression.negotiate("gzip;q=0, deflate"))
+        self.assertIsNone(compression.negotiate(""))
+        self.assertIsNone(compression.negotiate("identity"))
+
+    def test_wildcard(self):
+        """Test * accepts any coding not listed"""
+        codec = compression.negotiate("br;q=0, *;q=0.1")
+
+        self.assertEqual(codec.name, "zstd")
+
+    def test_streams_decode(self):
+        """Test streamed output decodes to the input"""
+        chunks = [b"line %d\n" % i for i in range(1000)]
+        for codec in compression.CODECS.values():
+            stream = b"".join(codec.stream(iter(chunks)))
+
+            self.assertEqual(decode(stream, codec.name), b"".join(chunks))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(TestCase):
+    """Test compressing API responses"""
+
+    def setUp(self):
+        caches[settings.API_CACHE_ALIAS].clear()
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipes(self, count):
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=self.user, title=f"Soup {i}", time_minutes=5, price=1
+            )
+            for i in range(count)
+        )
+
+    def test_list_compressed(self):
+        """Test each coding decodes to the uncompressed response"""
+        self.create_recipes(20)
+        plain = self.client.get(RECIPES_URL)
+
+        for encoding in ("gzip", "br", "zstd"):
+            res = self.client.get(
+                RECIPES_URL, HTTP_ACCEPT_ENCODING=encoding
+            )
+
+            self.assertEqual(res["Content-Encoding"], encoding)
+            self.assertEqual(res["Content-Length"], str(len(res.content)))
+            self.assertLess(len(res.content), len(plain.content))
+            self.assertIn("Accept-Encoding", res["Vary"])
+            self.assertEqual(decompress(res), plain.content)
+
+    def test_small_response_not_compressed(self):
+        """Test bodies under COMPRESSION_MIN_SIZE are sent as they are"""
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+        json.loads(res.content)
+
+    def test_export_streamed_compressed(self):
+        """Test streaming exports are compressed chunk by chunk"""
+        self.create_recipes(20)
+
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertFalse(res.has_header("Content-Length"))
+        self.assertEqual(len(decompress(res).splitlines()), 20)
+
+    def test_compressed_body_cached(self):
+        """Test a cached response isn't compressed again"""
+        self.create_recipes(20)
+        self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING="br")
+
+        with patch.object(
+            compression.Brotli, "compress", side_effect=AssertionError
+        ):
+            res = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING="br")
+
+        self.assertEqual(res["X-Cache"], "HIT")
+        self.assertEqual(res["Content-Encoding"], "br")
+        json.loads(decompress(res))
+
+    @patch.object(CompressionMiddleware, "offload_size", 0)
+    async def test_async_request_compressed_in_thread(self):
+        """Test large bodies are compressed off the event loop"""
+        # Django 3.2's AsyncClient sends extra kwargs as header names
+        res = await self.async_client.get(
+            reverse("metrics"), **{"Accept-Encoding": "gzip"}
+        )
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertIn(b"# TYPE", decompress(res))
@@ -0,0 +1,126 @@
+"""
+Tests for the database connection pool
+"""
+import threading
+from unittest.mock import MagicMock
+
+import psycopg2
+from django.test import SimpleTestCase
+from psycopg2 import extensions
+
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection for the pool"""
+
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = True
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollback = MagicMock()
+        self.ping_error = None
+
+    def get_transaction_status(self):
+        return self.status
+
+    def cursor(self):
+        cursor = MagicMock()
+        if self.ping_error:
+            cursor.__enter__.return_value.execute.side_effect = (
+                self.ping_error
+            )
+        return cursor
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test ConnectionPool"""
+
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+    def test_connection_reused(self):
+        """Test a released connection is handed out again"""
+        pool = ConnectionPool("default")
+
+        conn = pool.acquire(self.connect)
+        pool.release(conn)
+
+        self.assertIs(pool.acquire(self.connect), conn)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(pool.stats(), {"size": 1, "idle": 0, "in_use": 1})
+
+    def test_timeout_when_exhausted(self):
+        """Test checkouts beyond max_size wait then time out"""
+        pool = ConnectionPool("default", max_size=1, timeout=0.01)
+        pool.acquire(self.connect)
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(self.connect)
+
+    def test_waiter_gets_released_connection(self):
+        """Test a waiting checkout is served by the next release"""
+        pool = ConnectionPool("default", max_size=1, timeout=5)
+        conn = pool.acquire(self.connect)
+        result = []
+        waiter = threading.Thread(
+            target=lambda: result.append(pool.acquire(self.connect))
+        )
+
+        waiter.start()
+        pool.release(conn)
+        waiter.join()
+
+        self.assertEqual(result, [conn])
+
+    def test_open_transaction_rolled_back(self):
+        """Test connections come back without an open transaction"""
+        pool = ConnectionPool("default")
+        conn = pool.acquire(self.connect)
+        conn.status = extensions.TRANSACTION_STATUS_INTRANS
+
+        pool.release(conn)
+
+        conn.rollback.assert_called_once()
+
+    def test_broken_connection_discarded(self):
+        """Test a broken connection isn't put back"""
+        pool = ConnectionPool("default")
+        conn = pool.acquire(self.connect)
+        conn.status = extensions.TRANSACTION_STATUS_UNKNOWN
+
+        pool.release(conn)
+
+        self.assertTrue(conn.closed)
+        self.assertIsNot(pool.acquire(self.connect), conn)
+        self.assertEqual(pool.stats()["size"], 1)
+
+    def test_failed_health_check_replaces_connection(self):
+        """Test idle connections that fail SELECT 1 are replaced"""
+        pool = ConnectionPool("default", health_check_after=0)
+        conn = pool.acquire(self.connect)
+        pool.release(conn)
+        conn.ping_error = psycopg2.OperationalError("server closed")
+
+        fresh = pool.acquire(self.connect)
+
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(conn.closed)
+
+    def test_old_connection_retired(self):
+        """Test connections older than max_lifetime are closed"""
+        pool = ConnectionPool("default", max_lifetime=0)
+        conn = pool.acquire(self.connect)
+
+        pool.release(conn)
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()["size"], 0)
@@ -0,0 +1,163 @@
+"""
+Tests for the read replica router
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db import router
+from core.models import Recipe
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+@override_settings(DATABASE_REPLICAS=["replica_0", "replica_1"])
+class ReplicaRouterTests(SimpleTestCase):
+    """Test ReplicaRouter"""
+
+    def setUp(self):
+        self.router = router.ReplicaRouter()
+        router._health.clear()
+
+    def test_reads_outside_context_use_default_routing(self):
+        """Test reads outside replica_reads() aren't routed"""
+        self.assertIsNone(self.router.db_for_read(Recipe))
+
+    @patch("core.db.router.is_healthy", return_value=True)
+    def test_reads_inside_context_use_replica(self, is_healthy):
+        """Test reads inside replica_reads() go to a replica"""
+        with router.replica_reads():
+            alias = self.router.db_for_read(Recipe)
+
+        self.assertIn(alias, ["replica_0", "replica_1"])
+
+    @patch("core.db.router.is_healthy")
+    def test_unhealthy_replica_skipped(self, is_healthy):
+        """Test only healthy replicas are read from"""
+        is_healthy.side_effect = lambda alias: alias == "replica_1"
+        with router.replica_reads():
+            for _ in range(10):
+                self.assertEqual(
+                    self.router.db_for_read(Recipe), "replica_1"
+                )
+
+    @patch("core.db.router.is_healthy", return_value=False)
+    def test_falls_back_to_primary(self, is_healthy):
+        """Test reads use the primary when no replica is healthy"""
+        with router.replica_reads():
+            alias = self.router.db_for_read(Recipe)
+
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+
+    @patch("core.db.router.is_healthy", return_value=True)
+    def test_database_cache_reads_use_primary(self, is_healthy):
+        """Test the shared cache table isn't read from a lagging replica"""
+        with router.replica_reads():
+            alias = self.router.db_for_read(
+                caches["shared"].cache_model_class
+            )
+
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+
+    def test_pin_cache_must_be_shared(self):
+        """Test replicas can't be used with a per-process pin cache"""
+        config = apps.get_app_config("core")
+        with override_settings(REPLICA_PIN_CACHE_ALIAS="shared"):
+            config.ready()
+
+        with override_settings(REPLICA_PIN_CACHE_ALIAS="default"):
+            with self.assertRaises(ImproperlyConfigured):
+                config.ready()
+
+        with override_settings(
+            DATABASE_REPLICAS=[], REPLICA_PIN_CACHE_ALIAS="default"
+        ):
+            config.ready()
+
+    def test_writes_use_primary(self):
+        """Test writes always go to the primary"""
+        with router.replica_reads():
+            alias = self.router.db_for_write(Recipe)
+
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+
+    def test_no_migrations_on_replicas(self):
+        """Test replicas get no migrations"""
+        self.assertFalse(self.router.allow_migrate("replica_0", "recipe"))
+        self.assertIsNone(self.router.allow_migrate("default", "recipe"))
+
+    @override_settings(REPLICA_MAX_LAG=5, REPLICA_CHECK_INTERVAL=60)
+    @patch("core.db.router.check_replica")
+    def test_health_cached(self, check_replica):
+        """Test replica health is rechecked only after the interval"""
+        check_replica.return_value = (False, 30.0)
+
+        self.assertFalse(router.is_healthy("replica_0"))
+        self.assertFalse(router.is_healthy("replica_0"))
+
+        check_replica.assert_called_once_with("replica_0")
+
+    @patch("core.db.router.connections")
+    def test_unreachable_replica_unhealthy(self, connections):
+        """Test a replica that can't be queried is unhealthy"""
+        connections.__getitem__.return_value.cursor.side_effect = (
+            DatabaseError("could not connect")
+        )
+
+        self.assertEqual(router.check_replica("replica_0"), (False, None))
+
+
+@override_settings(DATABASE_REPLICAS=["replica_0"])
+@patch("core.db.router.is_healthy", return_value=False)
+class ReplicaReadViewTests(TestCase):
+    """Test which requests read from replicas"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_safe_request_reads_replica(self, is_healthy):
+        """Test listing recipes tries the replicas"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        is_healthy.assert_called_with("replica_0")
+
+    def test_write_pins_user_to_primary(self, is_healthy):
+        """Test reads right after a write skip the replicas"""
+        payload = {
+            "title": "Sample recipe",
+            "time_minutes": 5,
+            "price": Decimal("5.50"),
+        }
+        res = self.client.post(RECIPES_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(router.is_pinned(self.user.pk))
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        is_healthy.assert_not_called()
+
+    def test_replica_reads_end_when_view_raises(self, is_healthy):
+        """Test a failing request doesn't leave reads on the replicas"""
+        with patch(
+            "recipe.views.RecipeViewset.list", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.client.get(RECIPES_URL)
+
+        self.assertFalse(router._reads.get())
@@ -0,0 +1,99 @@
+"""
+Tests for the password hashers
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import hashers
+
+TOKEN_URL = reverse("user:token")
+
+PBKDF2_FIRST = [
+    "core.hashers.PBKDF2PasswordHasher",
+    "core.hashers.Argon2PasswordHasher",
+]
+ARGON2_FIRST = list(reversed(PBKDF2_FIRST))
+
+
+@override_settings(
+    PBKDF2_ITERATIONS=1000, ARGON2_MEMORY_COST=1024, ARGON2_PARALLELISM=1
+)
+class HasherTests(TestCase):
+    """Test hashing passwords through the pool"""
+
+    def setUp(self):
+        caches[settings.RATE_LIMIT_CACHE_ALIAS].clear()
+        self.client = APIClient()
+        self.credentials = {
+            "email": "user@example.com",
+            "password": "testpass123",
+        }
+
+    def create_user(self):
+        return get_user_model().objects.create_user(**self.credentials)
+
+    def login(self):
+        return self.client.post(TOKEN_URL, self.credentials)
+
+    def test_rehash_with_preferred_hasher_on_login(self):
+        """Test hashes of other hashers are upgraded on login"""
+        with self.settings(PASSWORD_HASHERS=PBKDF2_FIRST):
+            user = self.create_user()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$"))
+
+        with self.settings(PASSWORD_HASHERS=ARGON2_FIRST):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("argon2$"))
+
+    def test_rehash_when_cost_changes(self):
+        """Test raising the cost upgrades hashes on login"""
+        user = self.create_user()
+
+        with self.settings(PBKDF2_ITERATIONS=2000):
+            self.login()
+
+        user.refresh_from_db()
+        self.assertIn("$2000$", user.password)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1)
+    def test_single_worker_verifies(self):
+        """Test hashers calling encode() from verify() don't deadlock"""
+        self.patch_pool(None, None)
+        self.create_user()
+
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(PASSWORD_HASHING_TIMEOUT=0.01)
+    def test_busy_pool_returns_503(self):
+        """Test logins are turned away while the queue is full"""
+        self.create_user()
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        executor, _ = hashers._pool()
+        self.patch_pool(executor, slots)
+
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn("Retry-After", res)
+
+    def patch_pool(self, executor, slots):
+        old = hashers._executor, hashers._slots
+        hashers._executor, hashers._slots = executor, slots
+
+        def restore():
+            hashers._executor, hashers._slots = old
+
+        self.addCleanup(restore)
@@ -0,0 +1,106 @@
+"""
+Tests for the Prometheus metrics endpoint
+"""
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import metrics
+
+METRICS_URL = reverse("metrics")
+
+
+class MetricsEndpointTests(TestCase):
+    """Test the /metrics endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_scrapers_outside_allowed_networks_forbidden(self):
+        """Test other clients can't read the metrics without the token"""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR="203.0.113.7")
+
+        self.assertEqual(res.status_code, 403)
+
+    @override_settings(
+        METRICS_TOKEN="s3cret", METRICS_ALLOWED_NETWORKS=["10.0.0.0/8"]
+    )
+    def test_scrape_with_token_or_from_allowed_network(self):
+        """Test the bearer token or an allowed address give access"""
+        outside = {"REMOTE_ADDR": "203.0.113.7"}
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION="Bearer wrong", **outside
+        )
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION="Bearer s3cret", **outside
+        )
+        self.assertEqual(res.status_code, 200)
+
+        res = self.client.get(METRICS_URL, REMOTE_ADDR="10.1.2.3")
+        self.assertEqual(res.status_code, 200)
+
+    def test_request_and_db_metrics(self):
+        """Test requests are counted per route with latency histograms"""
+        self.client.get(reverse("recipe:recipe-list"))
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res["Content-Type"].startswith("text/plain"))
+        body = res.content.decode()
+        self.assertIn(
+            'http_requests_total{method="GET",route="recipe:recipe-list",'
+            'status="200"}',
+            body,
+        )
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+        self.assertIn(
+            'http_request_duration_seconds_bucket{route="recipe:recipe-list"'
+            ',le="+Inf"}',
+            body,
+        )
+        self.assertIn('db_queries_total{database="default"}', body)
+        self.assertIn('cache_hit_ratio{cache="api"}', body)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test an observation lands in its bucket and every larger one"""
+        metrics.observe("test_seconds", {"case": "cumulative"}, 0.3)
+
+        body = metrics.render()
+
+        bucket = 'test_seconds_bucket{case="cumulative",le='
+        self.assertIn(bucket + '"0.25"} 0', body)
+        self.assertIn(bucket + '"0.5"} 1', body)
+        self.assertIn(bucket + '"+Inf"} 1', body)
+        self.assertIn('test_seconds_count{case="cumulative"} 1', body)
+
+    def test_workers_aggregated_from_files(self):
+        """Test counters written by other workers are summed"""
+        with tempfile.TemporaryDirectory() as directory:
+            other = {
+                "counters": [["test_total", [["worker", "x"]], 5]],
+                "histograms": [],
+                "gauges": [["test_gauge", [], 2]],
+            }
+            with open(os.path.join(directory, "1.json"), "w") as f:
+                json.dump(other, f)
+            metrics.inc("test_total", {"worker": "x"}, 3)
+
+            with override_settings(METRICS_DIR=directory):
+                body = self.client.get(METRICS_URL).content.decode()
+                own = os.path.join(directory, f"{os.getpid()}.json")
+                self.assertTrue(os.path.exists(own))
+
+        self.assertIn('test_total{worker="x"} 8', body)
+        self.assertIn("test_gauge 2", body)
@@ -0,0 +1,82 @@
+"""
+Tests for the instrumentation middleware
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import instrumentation
+from core.models import Recipe, Tag
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0)
+class InstrumentationMiddlewareTests(TestCase):
+    """Test the instrumentation middleware"""
+
+    def setUp(self):
+        caches[settings.API_CACHE_ALIAS].clear()
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        """Test sampled requests report db, serialize and total time"""
+        Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price="1.00"
+        )
+
+        with self.assertLogs("core.instrumentation", "INFO") as logs:
+            res = self.client.get(RECIPES_URL)
+
+        timing = res["Server-Timing"]
+        self.assertIn("db;dur=", timing)
+        self.assertIn("serialize;dur=", timing)
+        self.assertIn("total;dur=", timing)
+        self.assertIn('"path": "/api/recipe/recipes/"', logs.output[0])
+
+    def test_auth_time_reported(self):
+        """Test token authentication time is reported"""
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        with self.assertLogs("core.instrumentation", "INFO"):
+            res = client.get(reverse("user:me"))
+
+        self.assertIn("auth;dur=", res["Server-Timing"])
+
+    async def test_async_request(self):
+        """Test requests served over ASGI are instrumented too"""
+        with self.assertLogs("core.instrumentation", "INFO"):
+            res = await self.async_client.get(reverse("metrics"))
+
+        self.assertIn("total;dur=", res["Server-Timing"])
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0.0)
+    def test_unsampled_request(self):
+        """Test requests outside the sample are left alone"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn("Server-Timing", res)
+
+    @override_settings(INSTRUMENTATION_DUPLICATE_THRESHOLD=3)
+    def test_duplicate_queries_detected(self):
+        """Test repeated statements are reported with their call site"""
+        tags = [Tag.objects.create(user=self.user, name=n) for n in "abc"]
+
+        with instrumentation.collect() as metrics:
+            for tag in tags:
+                list(Tag.objects.filter(pk=tag.pk))
+
+        self.assertEqual(metrics.queries, 3)
+        [(sql, count, site)] = metrics.duplicates()
+        self.assertEqual(count, 3)
+        self.assertIn("test_middleware.py", site)
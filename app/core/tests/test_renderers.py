@@ -0,0 +1,79 @@
+"""
+Tests for the orjson renderer and parser
+"""
+import io
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+
+DATA = OrderedDict(
+    [
+        ("id", 1),
+        ("price", Decimal("5.50")),
+        ("title", "Crème brûlée\u2028"),
+        ("when", datetime(2024, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc)),
+        ("uuid", uuid.UUID(int=1)),
+        ("detail", gettext_lazy("Not found.")),
+        ("counts", {1: 2}),
+        ("tags", [{"id": 1, "name": "Vegan"}]),
+        ("link", None),
+    ]
+)
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """Test ORJSONRenderer"""
+
+    def test_same_output_as_json_renderer(self):
+        """Test the output is byte for byte JSONRenderer's"""
+        self.assertEqual(
+            ORJSONRenderer().render(DATA), JSONRenderer().render(DATA)
+        )
+
+    def test_indent_uses_json_renderer(self):
+        """Test pretty printed responses are still indented"""
+        content = ORJSONRenderer().render(
+            {"id": 1}, "application/json; indent=2"
+        )
+
+        self.assertEqual(content, b'{\n  "id": 1\n}')
+
+    def test_none_renders_empty(self):
+        """Test no data renders an empty body"""
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+
+class ORJSONParserTests(SimpleTestCase):
+    """Test ORJSONParser"""
+
+    def parse(self, content, encoding="utf-8"):
+        return ORJSONParser().parse(
+            io.BytesIO(content), parser_context={"encoding": encoding}
+        )
+
+    def test_parse(self):
+        """Test a UTF-8 body is parsed"""
+        data = self.parse('{"title": "Crème", "tags": [1]}'.encode())
+
+        self.assertEqual(data, {"title": "Crème", "tags": [1]})
+
+    def test_other_encoding(self):
+        """Test bodies in other charsets are decoded first"""
+        data = self.parse('{"title": "Crème"}'.encode("latin-1"), "latin-1")
+
+        self.assertEqual(data, {"title": "Crème"})
+
+    def test_invalid_json(self):
+        """Test malformed JSON and NaN are rejected"""
+        for content in (b"{", b'{"price": NaN}'):
+            with self.assertRaises(ParseError):
+                self.parse(content)
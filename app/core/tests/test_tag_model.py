@@ -2,6 +2,7 @@
 Tests for the Tag models
 """
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 from django.test import TestCase
 from core.models import Tag
 
@@ -23,3 +24,26 @@ class TagModelTests(TestCase):
         tag = Tag.objects.create(user=user, name="Tag1")
 
         self.assertEqual(str(tag), tag.name)
+
+    def test_tag_name_unique_per_user(self):
+        """Test a user can't have two tags of the same name"""
+        user = create_user()
+        Tag.objects.create(user=user, name="Tag1")
+        Tag.objects.create(
+            user=create_user(email="other@example.com"), name="Tag1"
+        )
+
+        with self.assertRaises(IntegrityError):
+            Tag.objects.create(user=user, name="Tag1")
+
+    def test_get_or_create_many(self):
+        """Test existing tags are reused and missing ones created once"""
+        user = create_user()
+        existing = Tag.objects.create(user=user, name="Old")
+
+        tags = Tag.objects.get_or_create_many(user, ["Old", "New", "New"])
+        again = Tag.objects.get_or_create_many(user, ["New"])
+
+        self.assertEqual(tags["Old"], existing)
+        self.assertEqual(again["New"], tags["New"])
+        self.assertEqual(Tag.objects.filter(user=user).count(), 2)
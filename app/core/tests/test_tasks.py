@@ -0,0 +1,195 @@
+"""
+Tests for the background task queue
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import metrics, tasks
+from core.models import Task
+
+calls = []
+
+
+@tasks.task
+def record_call(*args, **kwargs):
+    """Remember the arguments it was called with"""
+    calls.append((args, kwargs))
+
+
+@tasks.task(max_attempts=2, visibility_timeout=60)
+def broken():
+    """Always fail"""
+    raise ValueError("broken")
+
+
+def due_now():
+    """Make every queued task due"""
+    Task.objects.update(available_at=timezone.now())
+
+
+@override_settings(TASK_RETRY_DELAY=10)
+class TaskQueueTests(TestCase):
+    """Tests for queueing and running tasks"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_task_is_registered_and_callable(self):
+        """Test the decorator names the task and keeps it callable"""
+        name = f"{__name__}.record_call"
+        self.assertIs(tasks.REGISTRY[name], record_call)
+        record_call(1)
+        self.assertEqual(calls, [((1,), {})])
+
+    def test_enqueue_and_work(self):
+        """Test queued calls run in order and are removed"""
+        record_call.enqueue(1, flag=True)
+        record_call.enqueue(2)
+        self.assertEqual(calls, [])
+
+        self.assertEqual(tasks.work(), 2)
+
+        self.assertEqual(calls, [((1,), {"flag": True}), ((2,), {})])
+        self.assertFalse(Task.objects.exists())
+
+    def test_enqueue_rolled_back(self):
+        """Test tasks queued in a rolled back transaction are dropped"""
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            record_call.enqueue()
+            raise RuntimeError
+
+        self.assertFalse(Task.objects.exists())
+
+    def test_failed_task_retried_with_backoff(self):
+        """Test failures are retried later, then given up"""
+        broken.enqueue()
+        before = timezone.now()
+
+        with self.assertLogs("core.tasks", "WARNING"):
+            self.assertEqual(tasks.work(), 1)
+        row = Task.objects.get()
+        self.assertEqual(row.attempts, 1)
+        self.assertIsNone(row.failed_at)
+        self.assertIn("ValueError: broken", row.last_error)
+        self.assertGreaterEqual(
+            row.available_at, before + timedelta(seconds=10)
+        )
+        self.assertEqual(tasks.work(), 0)
+
+        due_now()
+        with self.assertLogs("core.tasks", "ERROR"):
+            self.assertEqual(tasks.work(), 1)
+        row = Task.objects.get()
+        self.assertEqual(row.attempts, 2)
+        self.assertIsNotNone(row.failed_at)
+        due_now()
+        self.assertEqual(tasks.work(), 0)
+
+    def test_unknown_task_fails(self):
+        """Test rows naming no registered task are retried, not lost"""
+        Task.objects.create(name="gone.task", max_attempts=3)
+
+        with self.assertLogs("core.tasks", "WARNING"):
+            tasks.work()
+
+        self.assertIn("Unknown task gone.task", Task.objects.get().last_error)
+
+    def test_claimed_task_hidden_until_visibility_timeout(self):
+        """Test a lost task is run again, and the late finish ignored"""
+        record_call.enqueue()
+        [first] = tasks.claim(10)
+        self.assertEqual(tasks.claim(10), [])
+
+        Task.objects.update(available_at=timezone.now())
+        [second] = tasks.claim(10)
+        self.assertEqual(second.attempts, 2)
+
+        tasks.execute(first)
+        self.assertTrue(Task.objects.exists())
+        tasks.execute(second)
+        self.assertFalse(Task.objects.exists())
+
+    def test_lost_task_without_attempts_left_fails(self):
+        """Test a task killing its worker isn't claimed past max_attempts"""
+        broken.enqueue()
+        for attempt in range(2):
+            [row] = tasks.claim(10)
+            # The worker dies, the visibility timeout runs out
+            due_now()
+
+        with self.assertLogs("core.tasks", "ERROR"):
+            self.assertEqual(tasks.claim(10), [])
+
+        row = Task.objects.get()
+        self.assertEqual(row.attempts, 2)
+        self.assertIsNotNone(row.failed_at)
+        self.assertIn("was lost", row.last_error)
+        due_now()
+        self.assertEqual(tasks.claim(10), [])
+
+    def test_stop_releases_claimed_tasks(self):
+        """Test tasks claimed but not run are due again after a stop"""
+        stop = type("Stop", (), {"is_set": lambda self: bool(calls)})()
+        record_call.enqueue(1)
+        record_call.enqueue(2)
+
+        self.assertEqual(tasks.work(stop=stop), 1)
+
+        row = Task.objects.get()
+        self.assertEqual((row.args, row.attempts), ([2], 0))
+        self.assertLessEqual(row.available_at, timezone.now())
+
+    def test_metrics(self):
+        """Test runs are counted and timed per task and outcome"""
+        record_call.enqueue()
+
+        with patch.object(metrics, "inc") as inc, patch.object(
+            metrics, "observe"
+        ) as observe:
+            tasks.work()
+
+        name = f"{__name__}.record_call"
+        inc.assert_any_call(
+            "tasks_total", {"task": name, "outcome": "succeeded"}
+        )
+        self.assertIn(
+            ("task_duration_seconds", {"task": name}),
+            [call.args[:2] for call in observe.call_args_list],
+        )
+
+
+class RunWorkerCommandTests(TestCase):
+    """Tests for the run_worker command"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_burst_runs_due_tasks(self):
+        """Test --burst runs the queued tasks in process and exits"""
+        for i in range(3):
+            record_call.enqueue(i)
+
+        out = StringIO()
+        call_command(
+            "run_worker", processes=1, batch_size=2, burst=True, stdout=out
+        )
+
+        self.assertEqual(len(calls), 3)
+        self.assertIn("3 tasks run", out.getvalue())
+
+    @override_settings(API_CACHE_VERSION_ALIAS="api")
+    def test_version_store_must_be_shared(self):
+        """Test tasks can't bump versions the web processes don't see"""
+        record_call.enqueue(0)
+
+        with self.assertRaises(ImproperlyConfigured):
+            call_command("run_worker", processes=1, burst=True)
+
+        self.assertEqual(calls, [])
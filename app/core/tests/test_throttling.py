@@ -0,0 +1,150 @@
+"""
+Tests for the sliding window rate limits
+"""
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.throttling import SlidingWindowThrottle, parse_rate
+
+TOKEN_URL = reverse("user:token")
+RECIPES_URL = reverse("recipe:recipe-list")
+EXPORT_URL = reverse("recipe:recipe-export")
+
+
+class ParseRateTests(SimpleTestCase):
+    """Test parse_rate"""
+
+    def test_rates(self):
+        """Test periods with and without a multiplier"""
+        self.assertEqual(parse_rate("100/min"), (100, 60))
+        self.assertEqual(parse_rate("5/10s"), (5, 10))
+        self.assertEqual(parse_rate("20/hour"), (20, 3600))
+        self.assertEqual(parse_rate("1/d"), (1, 86400))
+
+    def test_invalid_rates(self):
+        """Test malformed and zero budgets are rejected"""
+        for rate in ("100", "0/min", "10/week", "x/min"):
+            with self.assertRaises(ImproperlyConfigured):
+                parse_rate(rate)
+
+
+class View:
+    """Stand-in for a throttled viewset"""
+
+    throttle_scope = "recipes"
+    action = "list"
+
+
+@override_settings(RATE_LIMITS={"recipes": "10/min"})
+class SlidingWindowThrottleTests(SimpleTestCase):
+    """Test the sliding window"""
+
+    def setUp(self):
+        caches[settings.RATE_LIMIT_CACHE_ALIAS].clear()
+        self.request = APIRequestFactory().get("/")
+        self.request.user = AnonymousUser()
+        patcher = patch("core.throttling.time.time")
+        self.time = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def allow(self, count=1):
+        """Return whether each of count requests is allowed"""
+        self.throttle = SlidingWindowThrottle()
+        return [
+            self.throttle.allow_request(self.request, View())
+            for _ in range(count)
+        ]
+
+    def test_budget_per_window(self):
+        """Test requests beyond the budget are rejected"""
+        self.time.return_value = 600.0
+
+        self.assertEqual(self.allow(11), [True] * 10 + [False])
+        # The next window opens with these 10 weighing 10 * 54/60 at 6s
+        self.assertAlmostEqual(self.throttle.wait(), 66.0)
+
+    def test_previous_window_slides_out(self):
+        """Test the previous window counts by how much still overlaps"""
+        self.time.return_value = 650.0
+        self.allow(10)
+
+        # 55s of the previous window overlap: 10 * 55/60 + 1 > 10
+        self.time.return_value = 665.0
+        self.assertEqual(self.allow(), [False])
+        self.assertAlmostEqual(self.throttle.wait(), 1.0)
+
+        # 53s overlap: 10 * 53/60 + 1 <= 10
+        self.time.return_value = 667.0
+        self.assertEqual(self.allow(), [True])
+
+    def test_rejected_requests_not_counted(self):
+        """Test hammering doesn't push the limit further out"""
+        self.time.return_value = 600.0
+        self.allow(50)
+
+        self.time.return_value = 720.0
+        self.assertEqual(self.allow(10), [True] * 10)
+
+    def test_unlisted_scope_unlimited(self):
+        """Test views without a budget aren't limited"""
+        self.time.return_value = 600.0
+        with override_settings(RATE_LIMITS={"recipes": ""}):
+            self.assertEqual(self.allow(20), [True] * 20)
+
+
+class RateLimitApiTests(TestCase):
+    """Test rate limits on the API"""
+
+    def setUp(self):
+        caches[settings.RATE_LIMIT_CACHE_ALIAS].clear()
+        self.client = APIClient()
+
+    @override_settings(RATE_LIMITS={"token": "2/min"})
+    def test_token_limited_per_address(self):
+        """Test token requests are limited per client address"""
+        payload = {"email": "user@example.com", "password": "wrong"}
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(TOKEN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(res["Retry-After"]), 0)
+
+        res = self.client.post(TOKEN_URL, payload, REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(
+        RATE_LIMITS={"recipes": "2/min", "recipes:export": "1/min"}
+    )
+    def test_recipes_limited_per_user_and_action(self):
+        """Test users and actions have separate budgets"""
+        users = [
+            get_user_model().objects.create_user(f"{name}@example.com", "pw")
+            for name in ("first", "second")
+        ]
+        self.client.force_authenticate(users[0])
+        statuses = [self.client.get(RECIPES_URL).status_code for _ in "abc"]
+        export = self.client.get(EXPORT_URL).status_code
+        self.client.force_authenticate(users[1])
+        other = self.client.get(RECIPES_URL).status_code
+
+        self.assertEqual(
+            statuses,
+            [
+                status.HTTP_200_OK,
+                status.HTTP_200_OK,
+                status.HTTP_429_TOO_MANY_REQUESTS,
+            ],
+        )
+        self.assertEqual(export, status.HTTP_200_OK)
+        self.assertEqual(other, status.HTTP_200_OK)
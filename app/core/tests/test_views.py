@@ -0,0 +1,61 @@
+"""
+Tests for the shared view helpers
+"""
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Recipe
+from recipe.views import RecipeViewset
+
+
+@override_settings(ASYNC_VIEWS=True)
+class AsyncViewSetTests(TransactionTestCase):
+    """Test viewsets served as async views"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "testpass123"
+        )
+        Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price="1.00"
+        )
+        self.factory = APIRequestFactory()
+
+    def call(self, actions, path, **kwargs):
+        view = RecipeViewset.as_view(actions)
+        request = self.factory.get(path)
+        force_authenticate(request, self.user)
+        return view, async_to_sync(view)(request, **kwargs)
+
+    def test_view_is_async(self):
+        """Test the view is a coroutine function keeping DRF attributes"""
+        view = RecipeViewset.as_view({"get": "list"})
+
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertTrue(view.csrf_exempt)
+        self.assertIs(view.cls, RecipeViewset)
+
+    def test_list_rendered_in_pool(self):
+        """Test list responses come back rendered"""
+        _, res = self.call({"get": "list"}, "/api/recipe/recipes/")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            json.loads(res.content)["results"][0]["title"], "Soup"
+        )
+
+    def test_streamed_export_left_to_handler(self):
+        """Test streamed bodies are passed on unread for core.asgi"""
+        _, res = self.call(
+            {"get": "export"}, "/api/recipe/recipes/export/"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.streaming)
+        lines = b"".join(res.streaming_content).splitlines()
+        self.assertEqual(json.loads(lines[0])["title"], "Soup")
@@ -0,0 +1,99 @@
+"""
+Sliding window rate limiting for API views
+"""
+import functools
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+from core import metrics
+
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+RATE_RE = re.compile(r"^([1-9]\d*)/(\d*)([smhd])[a-z]*$")
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """Return (requests, seconds) of a rate like 100/min or 5/10s"""
+    match = RATE_RE.match(rate.strip().lower())
+    if match is None:
+        raise ImproperlyConfigured(f"Invalid rate limit {rate!r}")
+    requests, count, unit = match.groups()
+    return int(requests), int(count or 1) * UNITS[unit]
+
+
+def _incr(cache, key, timeout):
+    """Atomically increment a counter, creating it on first use"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout):
+            return 1
+        # Created by a concurrent request in between
+        return cache.incr(key)
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """Limit requests to the budget of the view's throttle_scope
+
+    Budgets come from RATE_LIMITS, looked up as "<scope>:<action>"
+    first so single viewset actions can get their own, then as
+    "<scope>". Authenticated requests are counted per user, anonymous
+    ones per client address.
+
+    Each budget is enforced over a sliding window approximated from
+    two fixed window counters: the current window's count plus the
+    previous window's, weighted by how much of it still overlaps. This
+    takes one counter increment and one read in the RATE_LIMIT_CACHE_ALIAS
+    cache per request. Rejected requests don't use up the budget, so
+    clients retrying after Retry-After get through.
+    """
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        if scope is None:
+            return True
+        action_scope = f"{scope}:{getattr(view, 'action', None)}"
+        if action_scope in settings.RATE_LIMITS:
+            scope = action_scope
+        rate = settings.RATE_LIMITS.get(scope)
+        if not rate:
+            return True
+
+        limit, period = parse_rate(rate)
+        if request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        window, offset = divmod(time.time(), period)
+        key = f"ratelimit:{scope}:{ident}:{int(window)}"
+        previous_key = f"ratelimit:{scope}:{ident}:{int(window) - 1}"
+
+        cache = caches[settings.RATE_LIMIT_CACHE_ALIAS]
+        current = _incr(cache, key, 2 * period)
+        previous = cache.get(previous_key, 0)
+        if previous * (1 - offset / period) + current <= limit:
+            return True
+
+        cache.decr(key)
+        metrics.inc("http_requests_throttled_total", {"scope": scope})
+        self.delay = self._delay(limit, period, offset, previous, current - 1)
+        return False
+
+    @staticmethod
+    def _delay(limit, period, offset, previous, current):
+        """Return the seconds until one more request fits the budget"""
+        room = limit - current - 1
+        if room >= 0:
+            # Until enough of the previous window has slid out
+            return period * (1 - room / previous) - offset
+        # This window is full: into the next one until the weight of
+        # this window's requests leaves room
+        return period - offset + period * (1 - (limit - 1) / current)
+
+    def wait(self):
+        return self.delay
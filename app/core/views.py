@@ -0,0 +1,165 @@
+"""
+Shared views and view helpers
+"""
+import asyncio
+import contextvars
+import functools
+import ipaddress
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from django.views.static import serve
+from rest_framework.permissions import SAFE_METHODS
+
+from core import metrics
+from core.db import router
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _may_scrape(request):
+    """Return whether the request sent METRICS_TOKEN as a bearer token or
+    comes from one of the METRICS_ALLOWED_NETWORKS
+    """
+    if settings.METRICS_TOKEN and constant_time_compare(
+        request.META.get("HTTP_AUTHORIZATION", ""),
+        f"Bearer {settings.METRICS_TOKEN}",
+    ):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in settings.METRICS_ALLOWED_NETWORKS
+    )
+
+
+@require_GET
+def metrics_view(request):
+    """Return process and worker metrics for Prometheus to scrape"""
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@require_GET
+def media_view(request, path):
+    """Serve an uploaded file, cacheable for MEDIA_MAX_AGE
+
+    Upload names are content hashes, a changed file gets a new URL.
+    A web server in front can serve MEDIA_ROOT the same way instead.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if response.status_code == 200:
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=settings.MEDIA_MAX_AGE,
+            immutable=True,
+        )
+    return response
+
+
+def get_view_executor():
+    """Return the pool running sync views under ASGI"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASGI_THREADS,
+                thread_name_prefix="asgi-view",
+            )
+    return _executor
+
+
+def _run_view(view, request, *args, **kwargs):
+    """Run a sync view to completion in a pool thread"""
+    # request_started/finished only manage the event loop's connections
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        # Streamed bodies are iterated in a thread by core.asgi
+        if callable(getattr(response, "render", None)):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+class AsyncViewSetMixin:
+    """Serve the viewset as an async view when ASYNC_VIEWS is on
+
+    Under ASGI, Django 3.2 runs every sync view on a single shared
+    thread. With this mixin requests run concurrently in a pool of
+    ASGI_THREADS threads instead (which also bounds the database
+    connections per worker), and slow clients only hold the event loop.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.ASYNC_VIEWS:
+            return view
+
+        @functools.wraps(view)
+        async def async_view(request, *args, **kwargs):
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                get_view_executor(),
+                functools.partial(
+                    context.run, _run_view, view, request, *args, **kwargs
+                ),
+            )
+
+        return async_view
+
+
+class ReplicaReadMixin:
+    """Send the reads of safe requests to replicas (core.db.router)
+
+    Users who wrote through the viewset are pinned to the primary for
+    REPLICA_PIN_SECONDS afterwards so they always read their writes.
+    Responses stored in the API response cache are still built from
+    the primary, see recipe.cache.CachedResponseMixin.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not router.is_pinned(
+            request.user.pk
+        ):
+            self._replica_reads = router.replica_reads()
+            self._replica_reads.__enter__()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and request.user.is_authenticated
+        ):
+            router.pin(request.user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Also when the view raised, or the thread's next request
+            # would read from replicas too
+            replica_reads = getattr(self, "_replica_reads", None)
+            if replica_reads is not None:
+                self._replica_reads = None
+                replica_reads.__exit__(None, None, None)
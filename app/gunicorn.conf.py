@@ -0,0 +1,41 @@
+"""
+Gunicorn configuration for serving the API over ASGI with uvicorn workers
+
+Run from the app directory with:
+
+    gunicorn
+
+Each worker runs an event loop for connections, ASGI_THREADS threads for
+views and up to ASGI_STREAM_THREADS threads streaming response bodies.
+The database connection pool of a worker is sized for all of them plus
+Django's own thread for other sync views (see DATABASES in settings).
+"""
+import multiprocessing
+import os
+import shutil
+
+wsgi_app = "app.asgi:application"
+worker_class = "uvicorn.workers.UvicornWorker"
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(
+    os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1)
+)
+# Connections accepted while all workers are busy
+backlog = int(os.environ.get("BACKLOG", 2048))
+keepalive = int(os.environ.get("KEEPALIVE", 5))
+timeout = int(os.environ.get("WORKER_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.environ.get("MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", 1000))
+
+accesslog = os.environ.get("ACCESS_LOG", "-")
+
+
+def on_starting(server):
+    """Start /metrics from zero on every server start"""
+    directory = os.environ.get("METRICS_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
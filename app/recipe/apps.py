@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        from core.cache import require_shared
+        from recipe import signals  # noqa: F401
+
+        if settings.WEB_CONCURRENCY > 1:
+            workers = settings.WEB_CONCURRENCY
+            require_shared(
+                "API_CACHE_VERSION_ALIAS",
+                f"between the {workers} WEB_CONCURRENCY workers",
+            )
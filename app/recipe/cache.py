@@ -0,0 +1,144 @@
+"""
+Per-user versioned response cache for the recipe API
+"""
+import hashlib
+import uuid
+from functools import partial
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.db import router
+
+_counters = {"hits": 0, "misses": 0}
+_counters_lock = Lock()
+
+
+def get_response_cache():
+    """Return the cache backend holding API responses"""
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def get_version_cache():
+    """Return the cache shared by all processes holding data versions"""
+    return caches[settings.API_CACHE_VERSION_ALIAS]
+
+
+def _version_key(user_id):
+    return f"recipe-api:version:{user_id}"
+
+
+def get_user_version(user_id):
+    """Return the current data version of the user"""
+    cache = get_version_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Random, so that a version evicted from the cache never comes
+        # back as one older entries were stored under
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, timeout=None):
+            # Seeded by another request meanwhile
+            version = cache.get(key, version)
+    return version
+
+
+def _replace_user_version(user_id):
+    get_version_cache().set(
+        _version_key(user_id), uuid.uuid4().hex, timeout=None
+    )
+
+
+def bump_user_version(user_id):
+    """Invalidate every cached response of the user after the commit
+
+    Bumping before the commit would let a concurrent read cache the
+    rows as they were under the new version. The version is replaced
+    rather than incremented, which no backend can lose to a race.
+    """
+    transaction.on_commit(partial(_replace_user_version, user_id))
+
+
+def _record(counter):
+    with _counters_lock:
+        _counters[counter] += 1
+
+
+def get_cache_stats():
+    """Return response cache hit/miss counts and backend statistics"""
+    with _counters_lock:
+        hits, misses = _counters["hits"], _counters["misses"]
+    lookups = hits + misses
+    stats = {
+        "backend": type(get_response_cache()).__name__,
+        "responses": {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        },
+    }
+    backend_stats = getattr(get_response_cache(), "stats", None)
+    if backend_stats is not None:
+        stats["store"] = backend_stats()
+    return stats
+
+
+class CachedResponseMixin:
+    """Serve read actions from the per-user response cache
+
+    Entries are keyed on the user's data version which is bumped on every
+    recipe or tag write (see recipe.signals), so stale entries are never
+    read and simply age out of the backend. Misses read the primary:
+    rows from a lagging replica would be cached under the new version
+    and outlive the lag by API_CACHE_TIMEOUT.
+    """
+
+    def _response_cache_key(self, request):
+        user_id = request.user.pk
+        params = sorted(request.query_params.lists())
+        raw = f"{request.get_host()}{request.path}?{params}"
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        version = get_user_version(user_id)
+        return f"recipe-api:{user_id}:{version}:{self.action}:{digest}"
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        """Return the cached response or call handler and cache it"""
+        cache = get_response_cache()
+        key = self._response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            _record("hits")
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            # Compressed bodies of the entry (core.middleware)
+            response.compression_cache_key = key
+            return response
+
+        _record("misses")
+        with router.primary_reads():
+            response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data)
+            response.compression_cache_key = key
+        response["X-Cache"] = "MISS"
+        return response
+
+
+class CachedListMixin(CachedResponseMixin):
+    """Cache the list action"""
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+
+class CachedRetrieveMixin(CachedResponseMixin):
+    """Cache the retrieve action"""
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
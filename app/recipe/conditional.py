@@ -0,0 +1,115 @@
+"""
+Conditional GET (ETag / Last-Modified) support for the recipe API
+"""
+import hashlib
+
+from django.db.models import (
+    Count,
+    Max,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+
+
+def make_etag(*parts):
+    """Return a weak ETag built from the given validator parts"""
+    raw = ":".join(str(part) for part in parts)
+    return 'W/"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+
+class ConditionalResponseMixin:
+    """Answer conditional requests before any serialization happens
+
+    Validators are computed from updated_at columns with a single cheap
+    query, so a matching If-None-Match/If-Modified-Since returns a 304
+    without fetching or serializing the rows.
+    """
+
+    def conditional_response(
+        self, request, handler, etag, last_modified, *args, **kwargs
+    ):
+        """Return a 304 if the client copy is fresh, else call handler"""
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if not_modified is not None:
+            response = not_modified
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+        response["ETag"] = etag
+        if timestamp is not None:
+            response["Last-Modified"] = http_date(timestamp)
+        return response
+
+
+class ConditionalListMixin(ConditionalResponseMixin):
+    """Conditional GET for the list action
+
+    The list validator is the (latest updated_at, row count) pair of the
+    user's rows plus the query string. The row count catches deletions,
+    which can't move the latest updated_at forward; for the same reason
+    no Last-Modified is sent for lists and clients should use the ETag.
+    """
+
+    def list_validator_parts(self, request):
+        """Return more state the list depends on, beyond its own rows"""
+        return []
+
+    def list_validators(self, request):
+        """Return the ETag of the list for this request"""
+        summary = self.get_queryset().order_by().aggregate(
+            latest=Max("updated_at"),
+            count=Count("id"),
+        )
+        return make_etag(
+            self.basename,
+            summary["latest"],
+            summary["count"],
+            *self.list_validator_parts(request),
+            sorted(request.query_params.lists()),
+        )
+
+    def list(self, request, *args, **kwargs):
+        etag = self.list_validators(request)
+        return self.conditional_response(
+            request, super().list, etag, None, *args, **kwargs
+        )
+
+
+class ConditionalRetrieveMixin(ConditionalResponseMixin):
+    """Conditional GET for the retrieve action"""
+
+    def retrieve_validators(self, request, pk):
+        """Return the ETag and last modification time of one object"""
+        try:
+            updated_at = (
+                self.get_queryset()
+                .filter(pk=pk)
+                .values_list("updated_at", flat=True)
+                .first()
+            )
+        except (TypeError, ValueError):
+            updated_at = None
+        etag = make_etag(
+            self.basename,
+            pk,
+            updated_at,
+            # Representations differ with ?fields=
+            sorted(request.query_params.lists()),
+        )
+        return etag, updated_at
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        etag, updated_at = self.retrieve_validators(request, lookup)
+        if updated_at is None:
+            # Missing or not the user's: let the handler raise the 404
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            request, super().retrieve, etag, updated_at, *args, **kwargs
+        )
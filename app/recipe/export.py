@@ -0,0 +1,77 @@
+"""
+Streaming export of recipe collections as NDJSON or CSV
+"""
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.models import Recipe
+
+EXPORT_FIELDS = ["id", "title", "description", "time_minutes", "price", "link"]
+CSV_HEADER = EXPORT_FIELDS + ["tags"]
+TAG_SEPARATOR = "|"
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def iter_recipes(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield recipe dicts with their tag names, one chunk at a time
+
+    Recipes are read through a server-side cursor and the tags of each
+    chunk are fetched with a single query, so memory use depends on the
+    chunk size only.
+    """
+    rows = queryset.order_by("id").values(*EXPORT_FIELDS).iterator(
+        chunk_size=chunk_size
+    )
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        tags = defaultdict(list)
+        tagged = (
+            Recipe.tag.through.objects.filter(
+                recipe_id__in=[row["id"] for row in chunk]
+            )
+            .order_by("tag__name")
+            .values_list("recipe_id", "tag__name")
+        )
+        for recipe_id, name in tagged:
+            tags[recipe_id].append(name)
+
+        for row in chunk:
+            row["tags"] = tags[row["id"]]
+            yield row
+
+
+def stream_ndjson(rows):
+    """Yield one JSON document per line"""
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Yield CSV lines with a header, tags joined by TAG_SEPARATOR"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in rows:
+        yield writer.writerow(
+            [row[field] for field in EXPORT_FIELDS]
+            + [TAG_SEPARATOR.join(row["tags"])]
+        )
+
+
+FORMATS = {
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+    "csv": (stream_csv, "text/csv"),
+}
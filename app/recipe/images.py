@@ -0,0 +1,148 @@
+"""
+Recipe image uploads and thumbnails
+"""
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import (
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Accepted image formats and the extension they're stored with
+FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+IMAGE_DIR = "recipes/images"
+THUMBNAIL_DIR = "recipes/thumbnails"
+# Thumbnail formats keeping transparency, others get a white background
+ALPHA_FORMATS = {"PNG", "WEBP"}
+
+
+class InvalidImage(ValueError):
+    """The upload isn't an accepted image"""
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Streams uploaded files to disk, hashing them on the way
+
+    Uploads larger than max_size are cut off without reading the rest
+    of the request, leaving too_large set.
+    """
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or settings.RECIPE_IMAGE_MAX_SIZE
+        self.received = 0
+        self.too_large = False
+
+    def handle_raw_input(self, input_data, META, content_length, *args):
+        if content_length > self.max_size + 64 * 1024:
+            # Too large even allowing for the multipart framing: skip
+            # parsing, nothing is read
+            self.too_large = True
+            return QueryDict(), MultiValueDict()
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.too_large = True
+            raise StopUpload(connection_reset=True)
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.digest.hexdigest()
+        return file
+
+
+def inspect(file):
+    """Return the format of an uploaded image from its header
+
+    Only the header is parsed, the pixels aren't decoded. Raises
+    InvalidImage for other files and images over RECIPE_IMAGE_MAX_PIXELS.
+    """
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            image_format = image.format
+            width, height = image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise InvalidImage("Upload a JPEG, PNG or WebP image.")
+    finally:
+        file.seek(0)
+    if image_format not in FORMATS:
+        raise InvalidImage("Upload a JPEG, PNG or WebP image.")
+    if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+        raise InvalidImage(
+            f"Images can have at most "
+            f"{settings.RECIPE_IMAGE_MAX_PIXELS} pixels."
+        )
+    return image_format
+
+
+def store(file, image_format):
+    """Save an upload under its content hash, return the stored name
+
+    Uploads of the same image share the stored file.
+    """
+    name = f"{IMAGE_DIR}/{file.sha256}.{FORMATS[image_format]}"
+    if not default_storage.exists(name):
+        # Moved rather than copied by FileSystemStorage
+        name = default_storage.save(name, file)
+    return name
+
+
+def _for_format(image, image_format):
+    """Return the image in a mode the thumbnail format can be saved in"""
+    transparent = "A" in image.getbands() or "transparency" in image.info
+    if not transparent:
+        return image if image.mode == "RGB" else image.convert("RGB")
+    image = image if image.mode == "RGBA" else image.convert("RGBA")
+    if image_format.upper() in ALPHA_FORMATS:
+        return image
+    # A plain RGB conversion would show the colour under transparent
+    # pixels, often black
+    flattened = Image.new("RGB", image.size, "white")
+    flattened.paste(image, mask=image.getchannel("A"))
+    return flattened
+
+
+def make_thumbnails(name):
+    """Save the thumbnails of a stored image, return {size: name}
+
+    Thumbnails are named after the hash of their own content, so they
+    can be cached forever.
+    """
+    sizes = sorted(settings.RECIPE_IMAGE_THUMBNAIL_SIZES, reverse=True)
+    thumbnail_format = settings.RECIPE_IMAGE_THUMBNAIL_FORMAT
+    thumbnails = {}
+    with default_storage.open(name) as source, Image.open(source) as image:
+        # JPEGs are decoded at a reduced scale, other formats ignore it
+        image.draft("RGB", (sizes[0], sizes[0]))
+        image = ImageOps.exif_transpose(image)
+        image = _for_format(image, thumbnail_format)
+        for size in sizes:
+            # Each size is scaled down from the previous one
+            image.thumbnail((size, size))
+            buffer = BytesIO()
+            image.save(buffer, thumbnail_format, quality=80)
+            data = buffer.getvalue()
+            digest = hashlib.sha256(data).hexdigest()
+            thumbnail = (
+                f"{THUMBNAIL_DIR}/{digest}-{size}.{thumbnail_format.lower()}"
+            )
+            if not default_storage.exists(thumbnail):
+                thumbnail = default_storage.save(thumbnail, ContentFile(data))
+            thumbnails[str(size)] = thumbnail
+    return thumbnails
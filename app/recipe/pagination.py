@@ -0,0 +1,162 @@
+"""
+Keyset (cursor) pagination for the recipe API
+"""
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import BooleanField, Expression, F, Value
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class RowComparison(Expression):
+    """Row value comparison, e.g. (price, id) < (%s, %s), to filter on"""
+
+    output_field = BooleanField()
+
+    def __init__(self, lhs, operator, rhs):
+        super().__init__()
+        self.lhs, self.operator, self.rhs = list(lhs), operator, list(rhs)
+
+    def get_source_expressions(self):
+        return self.lhs + self.rhs
+
+    def set_source_expressions(self, exprs):
+        self.lhs, self.rhs = exprs[:len(self.lhs)], exprs[len(self.lhs):]
+
+    def as_sql(self, compiler, connection):
+        sql, params = [], []
+        for expression in self.get_source_expressions():
+            part, part_params = compiler.compile(expression)
+            sql.append(part)
+            params.extend(part_params)
+        size = len(self.lhs)
+        lhs, rhs = ", ".join(sql[:size]), ", ".join(sql[size:])
+        return f"({lhs}) {self.operator} ({rhs})", params
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Pages recipes newest first using the id as the keyset
+
+    Search results are paged by relevance instead, and ?ordering= picks
+    one of ordering_fields (descending with a leading "-"). Every
+    ordering ends with the id, and the cursor position holds the value
+    of each key, so pages seek past it with a single row comparison,
+    (field, id) < (value, id), through the (user, field, id) index.
+    Positions are unique, so cursors never carry an offset. The cursor
+    links keep the ordering parameter.
+    """
+
+    ordering = "-id"
+    search_ordering = ("-rank", "-id")
+    ordering_param = "ordering"
+    ordering_fields = ("price", "time_minutes", "title")
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_param)
+        if ordering:
+            if ordering.lstrip("-") not in self.ordering_fields:
+                choices = ", ".join(self.ordering_fields)
+                raise ValidationError(
+                    {self.ordering_param: [f"Choose one of {choices}."]}
+                )
+            return (ordering, "-id" if ordering[0] == "-" else "id")
+        if request.query_params.get("search"):
+            return self.search_ordering
+        return super().get_ordering(request, queryset, view)
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        # Offsets only skip rows sharing a position, which can't happen
+        return cursor and cursor._replace(offset=0)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor and self.cursor.position
+
+        ordering = self.ordering
+        if reverse:
+            ordering = _reverse_ordering(ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                self._seek(queryset, ordering, position)
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > self.page_size:
+            following = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = following is not None
+            self.next_position = position
+            self.previous_position = following
+        else:
+            self.has_next = following is not None
+            self.has_previous = position is not None
+            self.next_position = following
+            self.previous_position = position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _seek(self, queryset, ordering, position):
+        """Return the filter for the rows after position in ordering"""
+        names = [key.lstrip("-") for key in ordering]
+        try:
+            raw = json.loads(position)
+            if not isinstance(raw, list) or len(raw) != len(names):
+                raise ValueError("Position doesn't match the ordering")
+            values = [
+                Value(field.to_python(value), output_field=field)
+                for field, value in zip(
+                    (self._field(queryset, name) for name in names), raw
+                )
+            ]
+        except (ValueError, DjangoValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+
+        # Every key sorts in the same direction, see get_ordering
+        operator = "<" if ordering[0].startswith("-") else ">"
+        return RowComparison([F(name) for name in names], operator, values)
+
+    def _field(self, queryset, name):
+        """Return the model field or annotation output field of a key"""
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(name)
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps(
+            [str(instance[key.lstrip("-")]) for key in ordering]
+        )
+
+
+class TagCursorPagination(CursorPagination):
+    """Pages tags alphabetically using the name as the keyset"""
+
+    ordering = "name"
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 500
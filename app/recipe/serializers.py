@@ -1,17 +1,229 @@
 """
 Serializer for the Recipe API data
 """
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import (
+    Prefetch,
+    prefetch_related_objects,
+)
+from django.utils import timezone
 from rest_framework import serializers
 
+from core.instrumentation import TimedSerializerMixin, timed
 from core.models import (
     Recipe,
+    RecipeStats,
     Tag,
 )
+from recipe import stats
+from recipe.cache import bump_user_version
+
+
+BULK_BATCH_SIZE = 1000
+
+
+def tags_prefetch():
+    """Prefetch of recipe tags loading only the serialized columns"""
+    return Prefetch(
+        "tag", queryset=Tag.objects.only("id", "name").order_by("name")
+    )
+
+
+def _tag_names(tags):
+    """Return the names of validated nested tags, keeping None"""
+    if tags is None:
+        return None
+    return [tag["name"] for tag in tags]
+
+
+def _field_names(query_params, name):
+    """Return the comma separated names of a query parameter"""
+    value = query_params.get(name, "")
+    return [field for field in value.split(",") if field]
+
+
+def select_fields(query_params, serializer_class):
+    """Return the fields asked for with ?fields= and ?expand=
+
+    ?fields= picks any of the serializer's fields, ?expand= adds its
+    expandable_fields to the ones rendered by default. Unknown names
+    are rejected.
+    """
+    available = serializer_class.Meta.fields
+    expandable = getattr(serializer_class, "expandable_fields", [])
+    fields = _field_names(query_params, "fields")
+    expand = _field_names(query_params, "expand")
+    for param, names, allowed in [
+        ("fields", fields, available),
+        ("expand", expand, expandable),
+    ]:
+        unknown = sorted(set(names) - set(allowed))
+        if unknown:
+            raise serializers.ValidationError(
+                {param: [f"Unknown fields: {', '.join(unknown)}."]}
+            )
+
+    if fields:
+        return [name for name in available if name in fields + expand]
+    return [
+        name for name in available if name not in expandable or name in expand
+    ]
+
+
+def field_columns(fields, *keys):
+    """Return the recipe columns read to render fields, plus keys"""
+    names = [name for name in fields if name != "tags"]
+    return list(dict.fromkeys([*names, "id", *keys]))
+
+
+class SparseFieldsMixin:
+    """Renders only the fields named in the fields argument
+
+    Without it, all fields but the expandable_fields are rendered.
+    """
+
+    expandable_fields = []
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            fields = [
+                name
+                for name in self.Meta.fields
+                if name not in self.expandable_fields
+            ]
+        for name in set(self.fields) - set(fields):
+            self.fields.pop(name)
+
+
+def set_recipe_tags(user, recipes, tag_names, replace=True):
+    """Replace the tags of recipes with one batched through table insert
+
+    tag_names holds a list of names per recipe, or None to leave that
+    recipe's tags alone. Pass replace=False for freshly created recipes
+    which can't have tags to remove yet.
+    """
+    Through = Recipe.tag.through
+    changed = [
+        (recipe, names)
+        for recipe, names in zip(recipes, tag_names)
+        if names is not None
+    ]
+    if not changed:
+        return
+
+    tags = Tag.objects.get_or_create_many(
+        user, [name for _, names in changed for name in names]
+    )
+    before = []
+    if replace:
+        replaced = Through.objects.filter(
+            recipe_id__in=[recipe.id for recipe, _ in changed]
+        )
+        before = list(replaced.values_list("tag_id", flat=True))
+        replaced.delete()
+    rows = Through.objects.bulk_create(
+        [
+            Through(recipe_id=recipe.id, tag_id=tags[name].id)
+            for recipe, names in changed
+            for name in set(names)
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    # The batched writes skip the m2m_changed signal
+    stats.retag(user.pk, stats.tag_deltas(before, [r.tag_id for r in rows]))
+    bump_user_version(user.pk)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(serializers.ListSerializer):
+    """Writes lists of recipes with batched SQL"""
+
+    def create(self, validated_data):
+        """Create all recipes with bulk inserts"""
+        tags = [attrs.pop("tag", None) for attrs in validated_data]
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create(
+                [Recipe(**attrs) for attrs in validated_data],
+                batch_size=BULK_BATCH_SIZE,
+            )
+            # bulk_create() skips the post_save signal
+            stats.record(
+                self.context["request"].user.pk,
+                added=[stats.recipe_totals(recipe) for recipe in recipes],
+            )
+            set_recipe_tags(
+                self.context["request"].user,
+                recipes,
+                [_tag_names(recipe_tags) for recipe_tags in tags],
+                replace=False,
+            )
+        prefetch_related_objects(recipes, tags_prefetch())
+
+        return recipes
+
+    def update(self, instance, validated_data):
+        """Update the recipes in instance, matched to data by position"""
+        tags = []
+        fields = {"updated_at"}
+        now = timezone.now()
+        before = [stats.recipe_totals(recipe) for recipe in instance]
+        for recipe, attrs in zip(instance, validated_data):
+            tags.append(attrs.pop("tag", None))
+            for field, value in attrs.items():
+                setattr(recipe, field, value)
+                fields.add(field)
+            # bulk_update() doesn't apply auto_now
+            recipe.updated_at = now
+
+        changed = [
+            (old, new)
+            for old, new in zip(
+                before, map(stats.recipe_totals, instance)
+            )
+            if old != new
+        ]
+        with transaction.atomic():
+            Recipe.objects.bulk_update(
+                instance, fields, batch_size=BULK_BATCH_SIZE
+            )
+            # Nor does it send post_save
+            stats.record(
+                self.context["request"].user.pk,
+                added=[new for _, new in changed],
+                removed=[old for old, _ in changed],
+            )
+            set_recipe_tags(
+                self.context["request"].user,
+                instance,
+                [_tag_names(recipe_tags) for recipe_tags in tags],
+            )
+        for recipe in instance:
+            recipe._prefetched_objects_cache = {}
+        prefetch_related_objects(instance, tags_prefetch())
+
+        return instance
+
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Tag Endpoint CRUD"""
+
+    class Meta:
+        model = Tag
+        fields = ["id", "name"]
+        read_only_fields = ["id"]
+
+
+class RecipeSerializer(
+    SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer
+):
     """Parsing the recipe api data"""
 
+    tags = TagSerializer(many=True, required=False, source="tag")
+
     class Meta:
         model = Recipe
         fields = [
@@ -21,21 +233,215 @@ class RecipeSerializer(serializers.ModelSerializer):
             "price",
             # "description",
             "link",
+            "tags",
         ]
         read_only_fields = ["id"]
 
+    def create(self, validated_data):
+        """Create a recipe, getting or creating its tags by name"""
+        tags = validated_data.pop("tag", None)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data)
+            set_recipe_tags(
+                self.context["request"].user,
+                [recipe],
+                [_tag_names(tags)],
+                replace=False,
+            )
+
+        return recipe
+
+    def update(self, instance, validated_data):
+        """Update a recipe, replacing its tags when given"""
+        tags = validated_data.pop("tag", None)
+        with transaction.atomic():
+            recipe = super().update(instance, validated_data)
+            set_recipe_tags(
+                self.context["request"].user, [recipe], [_tag_names(tags)]
+            )
+
+        return recipe
+
+
+class ValuesListSerializer(serializers.ListSerializer):
+    """Represents .values() rows in one pass of the child serializer"""
+
+    def to_representation(self, data):
+        with timed("serialize"):
+            return self.child.represent_rows(list(data))
+
+
+class TagValuesSerializer(TagSerializer):
+    """Read-only TagSerializer for .values() rows of the list action
+
+    Dicts are built directly from the rows, skipping the per-field
+    to_representation calls of the field objects.
+    """
+
+    class Meta(TagSerializer.Meta):
+        list_serializer_class = ValuesListSerializer
+
+    def represent_rows(self, rows):
+        return [{"id": row["id"], "name": row["name"]} for row in rows]
+
+    def to_representation(self, instance):
+        return self.represent_rows([instance])[0]
+
+
+class RecipeValuesSerializer(RecipeSerializer):
+    """Read-only RecipeSerializer for .values() rows of the list action
+
+    The tags of all rows are loaded with one query, as the prefetch
+    does for model instances. The description is only rendered when
+    asked for, as the rows only hold the columns of rendered fields.
+    """
+
+    expandable_fields = ["description"]
+    price_exponent = Decimal(1).scaleb(
+        -Recipe._meta.get_field("price").decimal_places
+    )
+
+    class Meta(RecipeSerializer.Meta):
+        # Tags last, as represent_rows() adds them
+        fields = [
+            "id",
+            "title",
+            "time_minutes",
+            "price",
+            "link",
+            "description",
+            "tags",
+        ]
+        list_serializer_class = ValuesListSerializer
+
+    def represent_rows(self, rows):
+        names = [name for name in self.fields if name != "tags"]
+        tags = None
+        if "tags" in self.fields:
+            tags = self._row_tags(rows)
+
+        exponent = self.price_exponent
+        results = []
+        for row in rows:
+            item = {name: row[name] for name in names}
+            if "price" in item:
+                # As DecimalField renders it
+                item["price"] = format(item["price"].quantize(exponent), "f")
+            if tags is not None:
+                item["tags"] = tags[row["id"]]
+            results.append(item)
+        return results
+
+    def _row_tags(self, rows):
+        """Return {recipe id: tags} for the rows"""
+        tags = defaultdict(list)
+        if rows:
+            tagged = (
+                Recipe.tag.through.objects.filter(
+                    recipe_id__in=[row["id"] for row in rows]
+                )
+                .order_by("tag__name")
+                .values_list("recipe_id", "tag_id", "tag__name")
+            )
+            for recipe_id, tag_id, name in tagged:
+                tags[recipe_id].append({"id": tag_id, "name": name})
+        return tags
+
+    def to_representation(self, instance):
+        return self.represent_rows([instance])[0]
+
+
+class ThumbnailsField(serializers.ReadOnlyField):
+    """Renders {size: stored name} thumbnails as {size: URL}"""
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        urls = {}
+        for size, name in value.items():
+            url = default_storage.url(name)
+            urls[size] = request.build_absolute_uri(url) if request else url
+        return urls
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Recipe Detail Endpoint"""
 
+    thumbnails = ThumbnailsField()
+
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ["description"]
+        fields = RecipeSerializer.Meta.fields + [
+            "description",
+            "image",
+            "thumbnails",
+        ]
+        # Uploaded with the upload-image action
+        read_only_fields = ["id", "image"]
+        list_serializer_class = RecipeListSerializer
 
 
-class TagSerializer(serializers.ModelSerializer):
-    """Tag Endpoint CRUD"""
+class RecipeImageSerializer(serializers.ModelSerializer):
+    """The image of a recipe and its thumbnails"""
+
+    thumbnails = ThumbnailsField()
+
+    class Meta:
+        model = Recipe
+        fields = ["id", "image", "thumbnails"]
+        read_only_fields = fields
+
+
+class TagCountSerializer(serializers.ModelSerializer):
+    """A tag with the number of recipes carrying it"""
 
     class Meta:
         model = Tag
-        fields = ["id", "name"]
-        read_only_fields = ["id"]
+        fields = ["id", "name", "recipe_count"]
+        read_only_fields = fields
+
+
+class RecipeStatsSerializer(serializers.ModelSerializer):
+    """Aggregates over the user's recipes, from their RecipeStats"""
+
+    average_time_minutes = serializers.SerializerMethodField()
+    average_price = serializers.SerializerMethodField()
+    price_range = serializers.SerializerMethodField()
+    tags = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RecipeStats
+        fields = [
+            "recipe_count",
+            "average_time_minutes",
+            "average_price",
+            "price_range",
+            "tags",
+        ]
+        read_only_fields = fields
+
+    def get_average_time_minutes(self, obj):
+        if not obj.recipe_count:
+            return None
+        return round(obj.total_time_minutes / obj.recipe_count, 1)
+
+    def get_average_price(self, obj):
+        if not obj.recipe_count:
+            return None
+        average = obj.total_price / obj.recipe_count
+        return format(
+            average.quantize(RecipeValuesSerializer.price_exponent), "f"
+        )
+
+    def get_price_range(self, obj):
+        field = serializers.DecimalField(max_digits=5, decimal_places=2)
+        return {
+            "min": None if obj.min_price is None
+            else field.to_representation(obj.min_price),
+            "max": None if obj.max_price is None
+            else field.to_representation(obj.max_price),
+        }
+
+    def get_tags(self, obj):
+        tags = Tag.objects.filter(
+            user_id=obj.user_id, recipe_count__gt=0
+        ).order_by("-recipe_count", "name")
+        return TagCountSerializer(tags, many=True).data
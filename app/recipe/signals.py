@@ -0,0 +1,147 @@
+"""
+Signal handlers keeping the recipe API caches and statistics in step
+with writes
+"""
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+from recipe import stats
+from recipe.cache import bump_user_version
+
+STATS_FIELDS = {"time_minutes", "price"}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Bump the owner's data version when a recipe or tag changes"""
+    bump_user_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+def invalidate_user_cache_on_tagging(sender, instance, action, **kwargs):
+    """Bump the owner's data version when recipe tags change"""
+    if action.startswith("post_"):
+        bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_recipes_of_tag(sender, instance, created=False, **kwargs):
+    """Move updated_at of recipes showing a renamed or deleted tag
+
+    Recipes embed their tags, so their ETags must change with them.
+    """
+    if not created:
+        Recipe.objects.filter(tag=instance).update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+def touch_retagged_recipes(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """Move updated_at of recipes whose tags were added or removed"""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        recipes = Recipe.objects.filter(pk=instance.pk)
+    elif action == "pre_clear":
+        recipes = Recipe.objects.filter(tag=instance)
+    else:
+        recipes = Recipe.objects.filter(pk__in=pk_set)
+    recipes.update(updated_at=timezone.now())
+
+
+@receiver(pre_save, sender=Recipe)
+def load_recipe_totals(sender, instance, update_fields=None, **kwargs):
+    """Remember the stored time and price of a recipe being updated"""
+    if instance._state.adding or (
+        update_fields is not None and not STATS_FIELDS & set(update_fields)
+    ):
+        return
+    instance._stats_before = (
+        Recipe.objects.filter(pk=instance.pk)
+        .values_list("time_minutes", "price")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def count_saved_recipe(sender, instance, created, **kwargs):
+    """Add a new recipe to the statistics, or the change of an update"""
+    totals = stats.recipe_totals(instance)
+    if created:
+        stats.record(instance.user_id, added=[totals])
+        return
+    before = instance.__dict__.pop("_stats_before", None)
+    if before is not None and tuple(before) != totals:
+        stats.record(instance.user_id, added=[totals], removed=[before])
+
+
+@receiver(pre_delete, sender=Recipe)
+def load_recipe_tags(sender, instance, **kwargs):
+    """Remember the tags of a recipe, its tagging goes with it"""
+    if stats.deferring():
+        return
+    instance._stats_tags = list(
+        Recipe.tag.through.objects.filter(recipe_id=instance.pk).values_list(
+            "tag_id", flat=True
+        )
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_deleted_recipe(sender, instance, **kwargs):
+    """Remove a deleted recipe and its tagging from the statistics"""
+    stats.record(instance.user_id, removed=[stats.recipe_totals(instance)])
+    stats.retag(
+        instance.user_id,
+        stats.tag_deltas(instance.__dict__.pop("_stats_tags", []), []),
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+def count_tagging(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep tag recipe counts in step with tags added and removed
+
+    Removal and clearing look up the existing rows first, as they are
+    reported with the requested rather than the removed ids.
+    """
+    through = Recipe.tag.through.objects
+    if reverse:
+        existing = through.filter(tag_id=instance.pk)
+    else:
+        existing = through.filter(recipe_id=instance.pk)
+    if action == "pre_remove":
+        column = "recipe_id" if reverse else "tag_id"
+        existing = existing.filter(**{f"{column}__in": pk_set})
+    if action in ("pre_remove", "pre_clear"):
+        instance._stats_removed = existing.count() if reverse else list(
+            existing.values_list("tag_id", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if action == "post_add":
+        added, removed = pk_set, ()
+    else:
+        added, removed = (), instance.__dict__.pop("_stats_removed", ())
+    if reverse:
+        # instance is the tag, pk_set and the removed rows are recipes
+        delta = len(added) - (removed or 0)
+        stats.retag(instance.user_id, {instance.pk: delta})
+    else:
+        stats.retag(instance.user_id, stats.tag_deltas(removed, added))
@@ -0,0 +1,219 @@
+"""
+Per-user recipe statistics maintained incrementally
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.db.models import (
+    Count,
+    DecimalField,
+    F,
+    Max,
+    Min,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce, Greatest, Least
+
+from core.models import (
+    Recipe,
+    RecipeStats,
+    Tag,
+)
+
+TOTALS = {
+    "recipe_count": Count("id"),
+    "total_time_minutes": Sum("time_minutes"),
+    "total_price": Sum("price"),
+    "min_price": Min("price"),
+    "max_price": Max("price"),
+}
+
+_deferred = ContextVar("recipe_stats_deferred", default=None)
+
+
+def recipe_totals(recipe):
+    """Return the (time_minutes, price) a recipe adds to the statistics
+
+    Values assigned in code may still be strings or floats when saved.
+    """
+    price = Recipe._meta.get_field("price").to_python(recipe.price)
+    return int(recipe.time_minutes), price
+
+
+@contextmanager
+def deferred(rebuild_with=None):
+    """Rebuild the touched users' statistics once, on exit
+
+    For batched writes where per-recipe updates would cost a few
+    queries per row; record() and retag() only note the user inside.
+    rebuild_with is called with the user ids in place of rebuild(),
+    to queue the rebuild for instance.
+    """
+    if _deferred.get() is not None:
+        yield
+        return
+    users = set()
+    token = _deferred.set(users)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+    if users:
+        (rebuild_with or rebuild)(sorted(users))
+
+
+def deferring():
+    """Return whether updates are deferred to a rebuild"""
+    return _deferred.get() is not None
+
+
+def _defer(user_id):
+    users = _deferred.get()
+    if users is not None:
+        users.add(user_id)
+        return True
+    return False
+
+
+def _price(value):
+    # Cast, or SQLite compares the bound string with the stored numbers
+    field = Recipe._meta.get_field("price")
+    return Cast(
+        Value(value),
+        DecimalField(
+            max_digits=field.max_digits, decimal_places=field.decimal_places
+        ),
+    )
+
+
+def record(user_id, added=(), removed=()):
+    """Apply recipes added and removed, as (time_minutes, price) pairs
+
+    One UPDATE adjusts the counts and totals. The price range widens
+    with added recipes; it is only recomputed from the recipes when a
+    removed price was the cheapest or dearest.
+    """
+    if (not added and not removed) or _defer(user_id):
+        return
+
+    using = router.db_for_write(RecipeStats)
+    stats = RecipeStats.objects.using(using).filter(user_id=user_id)
+    changes = {
+        "recipe_count": F("recipe_count") + len(added) - len(removed),
+        "total_time_minutes": F("total_time_minutes")
+        + sum(time for time, _ in added)
+        - sum(time for time, _ in removed),
+        "total_price": F("total_price")
+        + sum((price for _, price in added), Decimal(0))
+        - sum((price for _, price in removed), Decimal(0)),
+    }
+    if added:
+        low = _price(min(price for _, price in added))
+        high = _price(max(price for _, price in added))
+        changes["min_price"] = Least(Coalesce("min_price", low), low)
+        changes["max_price"] = Greatest(Coalesce("max_price", high), high)
+    extrema = None
+    if removed:
+        extrema = stats.values_list("min_price", "max_price").first()
+
+    if not stats.update(**changes):
+        # Not computed yet, get_stats() builds them on first use
+        return
+
+    if extrema and extrema[0] is not None and any(
+        price <= extrema[0] or price >= extrema[1] for _, price in removed
+    ):
+        stats.update(
+            **Recipe.objects.using(using)
+            .filter(user_id=user_id)
+            .aggregate(min_price=Min("price"), max_price=Max("price"))
+        )
+
+
+def retag(user_id, deltas):
+    """Apply {tag id: change in recipes carrying it} to tag counts"""
+    if _defer(user_id):
+        return
+    by_delta = defaultdict(list)
+    for tag_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(tag_id)
+    for delta, tag_ids in by_delta.items():
+        Tag.objects.filter(id__in=tag_ids).update(
+            recipe_count=F("recipe_count") + delta
+        )
+
+
+def tag_deltas(before, after):
+    """Return tag count changes between two iterables of tag ids"""
+    deltas = Counter(after)
+    deltas.subtract(before)
+    return deltas
+
+
+def rebuild(user_ids):
+    """Recompute the statistics of users from their recipes
+
+    Run while the users' recipes change, a write committing between the
+    aggregation and the rewrite can be missed; rebuild again to repair.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    # Aggregate on the primary, never a lagging replica
+    using = router.db_for_write(RecipeStats)
+    tagged = (
+        Recipe.tag.through.objects.filter(tag_id=OuterRef("pk"))
+        .order_by()
+        .values("tag_id")
+        .annotate(count=Count("recipe_id"))
+        .values("count")
+    )
+    with transaction.atomic(using=using):
+        # Users deleted since the rebuild was asked for are skipped
+        user_ids = list(
+            get_user_model()
+            .objects.using(using)
+            .filter(pk__in=user_ids)
+            .values_list("pk", flat=True)
+        )
+        rows = {
+            row.pop("user_id"): row
+            for row in Recipe.objects.using(using)
+            .filter(user_id__in=user_ids)
+            .values("user_id")
+            .annotate(**TOTALS)
+            .order_by()
+        }
+        RecipeStats.objects.using(using).filter(
+            user_id__in=user_ids
+        ).delete()
+        # A concurrent rebuild of the same user inserts the same rows
+        RecipeStats.objects.using(using).bulk_create(
+            [
+                RecipeStats(user_id=user_id, **rows.get(user_id, {}))
+                for user_id in user_ids
+            ],
+            ignore_conflicts=True,
+        )
+        Tag.objects.using(using).filter(user_id__in=user_ids).update(
+            recipe_count=Coalesce(Subquery(tagged), 0)
+        )
+
+
+def get_stats(user_id):
+    """Return the user's RecipeStats, computing them on first use"""
+    stats = RecipeStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        rebuild([user_id])
+        stats = RecipeStats.objects.using(
+            router.db_for_write(RecipeStats)
+        ).get(user_id=user_id)
+    return stats
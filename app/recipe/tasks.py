@@ -0,0 +1,28 @@
+"""
+Background tasks of the recipe API
+"""
+from django.utils import timezone
+
+from core.models import Recipe
+from core.tasks import task
+from recipe import images, stats
+from recipe.cache import bump_user_version
+
+
+@task
+def rebuild_stats(user_ids):
+    """Recompute the recipe statistics of users"""
+    stats.rebuild(user_ids)
+
+
+@task
+def make_thumbnails(recipe_id, name):
+    """Make the thumbnails of an uploaded recipe image"""
+    thumbnails = images.make_thumbnails(name)
+    # Unless deleted or given another image since
+    recipe = Recipe.objects.filter(pk=recipe_id, image=name)
+    if recipe.update(thumbnails=thumbnails, updated_at=timezone.now()):
+        # update() skips the signal invalidating cached responses
+        bump_user_version(
+            Recipe.objects.values_list("user_id", flat=True).get(pk=recipe_id)
+        )
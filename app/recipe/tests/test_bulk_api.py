@@ -0,0 +1,200 @@
+"""
+Tests for the bulk recipe endpoint
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+
+BULK_URL = reverse("recipe:recipe-bulk")
+
+
+def create_recipe(user, **params):
+    """Helper to create and return a sample recipe"""
+    defaults = {
+        "title": "Sample recipe",
+        "time_minutes": 10,
+        "price": Decimal("2.50"),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def recipe_payload(i, **params):
+    """Return a recipe payload for the bulk endpoint"""
+    payload = {
+        "title": f"Recipe {i}",
+        "time_minutes": 5 + i,
+        "price": "1.50",
+    }
+    payload.update(params)
+    return payload
+
+
+class BulkRecipeAPITests(TestCase):
+    """Tests for bulk create, update and delete"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            password="TestPass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_with_tags(self):
+        """Test recipes and their tags are created in one request"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        payload = [
+            recipe_payload(0, tags=[{"name": "Vegan"}, {"name": "Quick"}]),
+            recipe_payload(1, tags=[{"name": "Quick"}]),
+            recipe_payload(2),
+        ]
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        self.assertEqual(
+            [t["name"] for t in res.data[0]["tags"]], ["Quick", "Vegan"]
+        )
+        recipes = Recipe.objects.filter(user=self.user).order_by("title")
+        self.assertEqual(
+            [r.title for r in recipes], ["Recipe 0", "Recipe 1", "Recipe 2"]
+        )
+        self.assertEqual(
+            {t.name for t in recipes[0].tag.all()}, {"Vegan", "Quick"}
+        )
+        self.assertEqual(recipes[2].tag.count(), 0)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_create_query_count_is_constant(self):
+        """Test inserts are batched rather than issued per recipe"""
+        counts = []
+        for size in [5, 50]:
+            payload = [
+                recipe_payload(
+                    i, tags=[{"name": f"A{size}"}, {"name": f"B{size}"}]
+                )
+                for i in range(size)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(BULK_URL, payload, format="json")
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 55)
+
+    def test_bulk_create_reports_item_errors(self):
+        """Test invalid items are reported by position and nothing saved"""
+        payload = [recipe_payload(0), {"title": "Missing fields"}]
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn("time_minutes", res.data[1])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_bulk_create_requires_list(self):
+        """Test a single object is rejected"""
+        res = self.client.post(BULK_URL, recipe_payload(0), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        """Test many recipes are updated and retagged at once"""
+        first = create_recipe(self.user, title="First")
+        second = create_recipe(self.user, title="Second")
+        payload = [
+            {
+                "id": first.id,
+                "title": "First changed",
+                "tags": [{"name": "New"}],
+            },
+            {"id": second.id, "price": "9.99"},
+        ]
+        res = self.client.patch(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.title, "First changed")
+        self.assertEqual([t.name for t in first.tag.all()], ["New"])
+        self.assertEqual(second.title, "Second")
+        self.assertEqual(second.price, Decimal("9.99"))
+
+    def test_bulk_update_other_users_recipe_fails(self):
+        """Test recipes of other users can't be updated"""
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            password="TestPass123",
+        )
+        mine = create_recipe(self.user)
+        theirs = create_recipe(other)
+        payload = [
+            {"id": mine.id, "title": "Mine"},
+            {"id": theirs.id, "title": "Hijacked"},
+        ]
+        res = self.client.patch(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn("id", res.data[1])
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.title, "Sample recipe")
+
+    def test_bulk_update_repeated_id_fails(self):
+        """Test a recipe can't be listed twice in one update"""
+        recipe = create_recipe(self.user)
+        payload = [
+            {"id": recipe.id, "title": "First"},
+            {"id": recipe.id, "title": "Second"},
+        ]
+        res = self.client.patch(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn("id", res.data[1])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, "Sample recipe")
+
+    def test_bulk_delete_repeated_id_fails(self):
+        """Test repeated ids are reported by position, nothing deleted"""
+        recipe = create_recipe(self.user)
+        ids = [recipe.id, create_recipe(self.user).id, recipe.id]
+
+        res = self.client.delete(BULK_URL, {"ids": ids}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(res.json()["ids"]), ["2"])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_delete(self):
+        """Test only the user's listed recipes are deleted"""
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            password="TestPass123",
+        )
+        delete = [create_recipe(self.user) for _ in range(3)]
+        keep = create_recipe(self.user)
+        theirs = create_recipe(other)
+        ids = [r.id for r in delete] + [theirs.id]
+
+        res = self.client.delete(BULK_URL, {"ids": ids}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(Recipe.objects.filter(user=self.user)), [keep]
+        )
+        self.assertTrue(Recipe.objects.filter(id=theirs.id).exists())
@@ -0,0 +1,181 @@
+"""
+Tests for ETag / Last-Modified handling in the recipe API
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.conf import settings
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL"""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Helper to create and return a sample recipe"""
+    defaults = {
+        "title": "Sample recipe",
+        "time_minutes": 10,
+        "price": Decimal("2.50"),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ConditionalGetTests(TestCase):
+    """Tests for conditional list and detail requests"""
+
+    def setUp(self):
+        caches[settings.API_CACHE_ALIAS].clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            password="TestPass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_not_modified(self):
+        """Test a matching If-None-Match returns 304 with no body"""
+        create_recipe(self.user)
+        res = self.client.get(RECIPES_URL)
+        etag = res["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res["ETag"], etag)
+        self.assertEqual(res.content, b"")
+
+    def test_list_etag_changes_on_write(self):
+        """Test creating and deleting recipes changes the list ETag"""
+        recipe = create_recipe(self.user)
+        etag = self.client.get(RECIPES_URL)["ETag"]
+
+        create_recipe(self.user, title="Another")
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        etag = res["ETag"]
+        recipe.delete()
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_list_etag_depends_on_query(self):
+        """Test each page has its own ETag"""
+        create_recipe(self.user)
+        etag = self.client.get(RECIPES_URL)["ETag"]
+
+        res = self.client.get(
+            RECIPES_URL, {"page_size": 1}, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_detail_not_modified(self):
+        """Test detail honours both If-None-Match and If-Modified-Since"""
+        recipe = create_recipe(self.user)
+        url = detail_url(recipe.id)
+        res = self.client.get(url)
+        self.assertIn("Last-Modified", res)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        later = recipe.updated_at + timedelta(seconds=5)
+        res = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=http_date(later.timestamp())
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_modified_after_update(self):
+        """Test an updated recipe is returned in full"""
+        recipe = create_recipe(self.user)
+        url = detail_url(recipe.id)
+        etag = self.client.get(url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {"title": "Changed"})
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["title"], "Changed")
+
+    def test_detail_of_other_user_not_found(self):
+        """Test validators don't leak other users' recipes"""
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            password="TestPass123",
+        )
+        recipe = create_recipe(other)
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH="*")
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tag_list_not_modified(self):
+        """Test the tag list supports conditional requests"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        etag = self.client.get(TAGS_URL)["ETag"]
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_assigned_tag_list_etag_changes_on_retagging(self):
+        """Test moving a recipe between tags changes ?assigned_only="""
+        first, second, shared = (
+            Tag.objects.create(user=self.user, name=name)
+            for name in ["A", "B", "C"]
+        )
+        recipe = create_recipe(self.user)
+        recipe.tag.set([first, shared])
+        params = {"assigned_only": "1"}
+        etag = self.client.get(TAGS_URL, params)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tag.set([second, shared])
+        res = self.client.get(TAGS_URL, params, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag["name"] for tag in res.data["results"]], ["B", "C"]
+        )
+
+    def test_detail_etag_changes_with_tags(self):
+        """Test renaming or attaching a tag changes the recipe ETag"""
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        url = detail_url(recipe.id)
+        etag = self.client.get(url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tag.add(tag)
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        etag = res["ETag"]
+        tag.name = "Vegetarian"
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.save()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["tags"][0]["name"], "Vegetarian")
@@ -0,0 +1,109 @@
+"""
+Tests for the streaming recipe export
+"""
+import csv
+import io
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+
+EXPORT_URL = reverse("recipe:recipe-export")
+
+
+def create_recipe(user, **params):
+    """Helper to create and return a sample recipe"""
+    defaults = {
+        "title": "Sample recipe",
+        "time_minutes": 10,
+        "price": Decimal("2.50"),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ExportAPITests(TestCase):
+    """Tests for the export endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            password="TestPass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_export_requires_auth(self):
+        """Test anonymous users can't export"""
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_ndjson(self):
+        """Test recipes stream as one JSON document per line"""
+        first = create_recipe(self.user, title="First")
+        create_recipe(self.user, title="Second", price=Decimal("3.10"))
+        first.tag.add(
+            Tag.objects.create(user=self.user, name="Vegan"),
+            Tag.objects.create(user=self.user, name="Dinner"),
+        )
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            password="TestPass123",
+        )
+        create_recipe(other, title="Not mine")
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([r["title"] for r in rows], ["First", "Second"])
+        self.assertEqual(rows[0]["tags"], ["Dinner", "Vegan"])
+        self.assertEqual(rows[1]["tags"], [])
+        self.assertEqual(rows[1]["price"], "3.10")
+
+    def test_export_csv(self):
+        """Test recipes stream as CSV with a header row"""
+        recipe = create_recipe(self.user, description="Line one, two")
+        recipe.tag.add(Tag.objects.create(user=self.user, name="Quick"))
+
+        res = self.client.get(EXPORT_URL, {"type": "csv"})
+
+        self.assertEqual(res["Content-Type"], "text/csv")
+        content = b"".join(res.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["description"], "Line one, two")
+        self.assertEqual(rows[0]["tags"], "Quick")
+
+    def test_export_invalid_type(self):
+        """Test unknown file types are rejected"""
+        res = self.client.get(EXPORT_URL, {"type": "xml"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_tags_fetched_per_chunk(self):
+        """Test the tag query count grows with chunks, not recipes"""
+        tag = Tag.objects.create(user=self.user, name="Tag")
+        for i in range(30):
+            create_recipe(self.user).tag.add(tag)
+
+        # one query for the recipes and one for the tags of the chunk
+        with self.assertNumQueries(2):
+            res = self.client.get(EXPORT_URL)
+            lines = b"".join(res.streaming_content).splitlines()
+
+        self.assertEqual(len(lines), 30)
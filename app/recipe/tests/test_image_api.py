@@ -0,0 +1,273 @@
+"""
+Tests for the recipe image upload
+"""
+import hashlib
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import tasks
+from core.models import Recipe, Task
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL"""
+    return reverse("recipe:recipe-upload-image", args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL"""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Helper to create and return a sample recipe"""
+    defaults = {
+        "title": "Sample recipe",
+        "time_minutes": 10,
+        "price": Decimal("2.50"),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def make_image(size=(1200, 800), image_format="JPEG", mode="RGB"):
+    """Return the bytes of a generated image"""
+    buffer = BytesIO()
+    color = (200, 80, 20, 0) if mode == "RGBA" else (200, 80, 20)
+    Image.new(mode, size, color).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def upload(data, name="photo.jpg"):
+    """Return a named file for a multipart payload"""
+    file = BytesIO(data)
+    file.name = name
+    return file
+
+
+class ImageUploadTests(TestCase):
+    """Tests for uploading recipe images"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            RECIPE_IMAGE_THUMBNAIL_SIZES=[160, 480],
+        )
+        self.override.enable()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            password="TestPass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_upload_image(self):
+        """Test the image is stored under its hash and thumbnails queued"""
+        data = make_image()
+
+        res = self.client.post(
+            image_upload_url(self.recipe.id),
+            {"image": upload(data)},
+            format="multipart",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        digest = hashlib.sha256(data).hexdigest()
+        self.assertEqual(
+            self.recipe.image.name, f"recipes/images/{digest}.jpg"
+        )
+        self.assertTrue(default_storage.exists(self.recipe.image.name))
+        self.assertTrue(res.data["image"].endswith(f"{digest}.jpg"))
+        self.assertEqual(res.data["thumbnails"], {})
+        self.assertEqual(
+            Task.objects.get().name, "recipe.tasks.make_thumbnails"
+        )
+
+    def test_thumbnails_made_by_worker(self):
+        """Test the worker saves bounded thumbnails listed by the detail"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                image_upload_url(self.recipe.id),
+                {"image": upload(make_image())},
+                format="multipart",
+            )
+        # Cached without thumbnails, refreshed once the worker is done
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.data["thumbnails"], {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(tasks.work(), 1)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(set(self.recipe.thumbnails), {"160", "480"})
+        for size, name in self.recipe.thumbnails.items():
+            with default_storage.open(name) as file, Image.open(file) as im:
+                self.assertEqual(im.format, "WEBP")
+                self.assertEqual(max(im.size), int(size))
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(
+            res.data["thumbnails"]["160"].startswith("http://testserver/")
+        )
+
+    @override_settings(RECIPE_IMAGE_THUMBNAIL_FORMAT="JPEG")
+    def test_transparent_image_jpeg_thumbnails(self):
+        """Test transparency is flattened for formats without alpha"""
+        data = make_image(image_format="PNG", mode="RGBA")
+        self.client.post(
+            image_upload_url(self.recipe.id),
+            {"image": upload(data, "a.png")},
+            format="multipart",
+        )
+
+        self.assertEqual(tasks.work(), 1)
+
+        self.assertFalse(Task.objects.exists())
+        self.recipe.refresh_from_db()
+        self.assertEqual(len(self.recipe.thumbnails), 2)
+        with default_storage.open(self.recipe.thumbnails["160"]) as file:
+            with Image.open(file) as im:
+                self.assertEqual((im.format, im.mode), ("JPEG", "RGB"))
+                red, green, blue = im.getpixel((0, 0))
+                self.assertGreater(min(red, green, blue), 240)
+
+    def test_replaced_image_keeps_new_thumbnails(self):
+        """Test thumbnails of a replaced image aren't saved"""
+        url = image_upload_url(self.recipe.id)
+        self.client.post(
+            url, {"image": upload(make_image())}, format="multipart"
+        )
+        self.client.post(
+            url,
+            {"image": upload(make_image(image_format="PNG"), "a.png")},
+            format="multipart",
+        )
+
+        self.assertEqual(tasks.work(), 2)
+
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image.name.endswith(".png"))
+        self.assertEqual(len(self.recipe.thumbnails), 2)
+
+    def test_same_image_stored_once(self):
+        """Test uploads of the same image share the stored file"""
+        other = create_recipe(self.user)
+        data = make_image()
+        for recipe in (self.recipe, other):
+            self.client.post(
+                image_upload_url(recipe.id),
+                {"image": upload(data)},
+                format="multipart",
+            )
+
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, other.image.name)
+        _, files = default_storage.listdir("recipes/images")
+        self.assertEqual(len(files), 1)
+
+    def test_upload_not_an_image(self):
+        """Test files that aren't images are rejected"""
+        res = self.client.post(
+            image_upload_url(self.recipe.id),
+            {"image": upload(b"not an image", "photo.jpg")},
+            format="multipart",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+        self.assertFalse(Task.objects.exists())
+
+    def test_upload_unsupported_format(self):
+        """Test images in other formats are rejected"""
+        res = self.client.post(
+            image_upload_url(self.recipe.id),
+            {"image": upload(make_image(image_format="GIF"), "a.gif")},
+            format="multipart",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=1000)
+    def test_upload_too_many_pixels(self):
+        """Test images over the pixel limit are rejected"""
+        res = self.client.post(
+            image_upload_url(self.recipe.id),
+            {"image": upload(make_image())},
+            format="multipart",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=1024)
+    def test_upload_too_large(self):
+        """Test uploads over the size limit are cut off"""
+        res = self.client.post(
+            image_upload_url(self.recipe.id),
+            {"image": upload(make_image(image_format="PNG"), "a.png")},
+            format="multipart",
+        )
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.assertFalse(Task.objects.exists())
+
+    def test_upload_missing(self):
+        """Test a request without an image is rejected"""
+        res = self.client.post(
+            image_upload_url(self.recipe.id),
+            {"other": "value"},
+            format="multipart",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_other_users_recipe(self):
+        """Test images can't be set on other users' recipes"""
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            password="TestPass123",
+        )
+        recipe = create_recipe(other)
+
+        res = self.client.post(
+            image_upload_url(recipe.id),
+            {"image": upload(make_image())},
+            format="multipart",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_media_cached_forever(self):
+        """Test uploaded files are served with an immutable cache header"""
+        res = self.client.post(
+            image_upload_url(self.recipe.id),
+            {"image": upload(make_image())},
+            format="multipart",
+        )
+
+        res = self.client.get(res.data["image"])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("immutable", res["Cache-Control"])
+        self.assertIn("max-age=31536000", res["Cache-Control"])
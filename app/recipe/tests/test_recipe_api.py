@@ -1,21 +1,36 @@
 """
 Tests of the recipe API
 """
+from base64 import b64decode, b64encode
 from decimal import Decimal
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.conf import settings
 
+from recipe.cache import get_user_version
 from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer,
+    RecipeValuesSerializer,
+    field_columns,
+    select_fields,
+    tags_prefetch,
 )
 
-from core.models import Recipe
+from core.models import (
+    Recipe,
+    Tag,
+)
 
 RECIPES_URL = reverse("recipe:recipe-list")
 
@@ -61,6 +76,7 @@ class PrivateRecipeAPITests(TestCase):
     """Tests for protected recipe endpoints"""
 
     def setUp(self):
+        caches[settings.API_CACHE_ALIAS].clear()
         self.client = APIClient()
         self.user = create_user(
             email="test@example.com",
@@ -78,7 +94,25 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
+
+    def test_values_serializer_matches_recipe_serializer(self):
+        """Test list rows render exactly like RecipeSerializer"""
+        recipe = create_recipe(self.user, price=Decimal("5.5"), link="")
+        recipe.tag.add(
+            Tag.objects.create(user=self.user, name="Vegan"),
+            Tag.objects.create(user=self.user, name="Dinner"),
+        )
+        create_recipe(self.user, title="Untagged")
+        recipes = Recipe.objects.order_by("-id")
+
+        columns = field_columns(select_fields({}, RecipeValuesSerializer))
+        fast = RecipeValuesSerializer(recipes.values(*columns), many=True)
+        slow = RecipeSerializer(
+            recipes.prefetch_related(tags_prefetch()), many=True
+        )
+
+        self.assertEqual(fast.data, slow.data)
 
     def test_get_recipe_list_limited_to_user(self):
         """Confirm users see only their recipes"""
@@ -96,7 +130,32 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
+
+    def test_recipe_list_paginated_by_cursor(self):
+        """Test the list is split into pages linked by opaque cursors"""
+        for i in range(5):
+            create_recipe(self.user, title=f"Recipe {i}")
+
+        res = self.client.get(RECIPES_URL, {"page_size": 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 2)
+        self.assertIsNone(res.data["previous"])
+        self.assertIn("cursor=", res.data["next"])
+
+        seen = [r["id"] for r in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            seen += [r["id"] for r in res.data["results"]]
+
+        expected = Recipe.objects.filter(user=self.user).order_by("-id")
+        self.assertEqual(seen, [r.id for r in expected])
+
+    def test_recipe_list_invalid_cursor(self):
+        """Test a tampered cursor is rejected"""
+        res = self.client.get(RECIPES_URL, {"cursor": "not-a-cursor"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_get_recipe_detail(self):
         """Test get recipe detail"""
@@ -203,3 +262,312 @@ class PrivateRecipeAPITests(TestCase):
         # check also recipe still in db
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
         self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_filter_by_tags_any(self):
+        """Test recipes carrying any of the tags are returned"""
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        quick = Tag.objects.create(user=self.user, name="Quick")
+        r1 = create_recipe(self.user, title="Curry")
+        r1.tag.add(vegan)
+        r2 = create_recipe(self.user, title="Toast")
+        r2.tag.add(quick, vegan)
+        r3 = create_recipe(self.user, title="Steak")
+
+        res = self.client.get(RECIPES_URL, {"tags": f"{vegan.id},{quick.id}"})
+
+        ids = [r["id"] for r in res.data["results"]]
+        self.assertEqual(ids, [r2.id, r1.id])
+        self.assertNotIn(r3.id, ids)
+
+    def test_filter_by_tags_all(self):
+        """Test tags_match=all only returns recipes with every tag"""
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        quick = Tag.objects.create(user=self.user, name="Quick")
+        r1 = create_recipe(self.user, title="Curry")
+        r1.tag.add(vegan)
+        r2 = create_recipe(self.user, title="Toast")
+        r2.tag.add(quick, vegan)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {"tags": f"{vegan.id},{quick.id}", "tags_match": "all"},
+        )
+
+        self.assertEqual([r["id"] for r in res.data["results"]], [r2.id])
+
+    def test_failed_tag_write_rolls_back_recipe(self):
+        """Test a recipe isn't saved without the tags it was sent with"""
+        payload = {
+            "title": "Soup",
+            "time_minutes": 20,
+            "price": Decimal("3.00"),
+            "tags": [{"name": "Vegan"}],
+        }
+
+        with patch(
+            "recipe.serializers.set_recipe_tags", side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_filter_by_tags_single_query(self):
+        """Test the tag filter doesn't issue a query per tag"""
+        tags = [Tag.objects.create(user=self.user, name=f"T{i}")
+                for i in range(5)]
+        ids = ",".join(str(t.id) for t in tags)
+
+        get_user_version(self.user.pk)
+        # Data version, ETag validators and the page
+        with self.assertNumQueries(3):
+            self.client.get(RECIPES_URL, {"tags": ids, "tags_match": "all"})
+
+    def test_filter_by_invalid_tags(self):
+        """Test non numeric tag ids are rejected"""
+        res = self.client.get(RECIPES_URL, {"tags": "1,abc"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_by_time_and_price_range(self):
+        """Test quick, cheap recipes are found with inclusive bounds"""
+        match = create_recipe(self.user, time_minutes=15, price="9.99")
+        edge = create_recipe(self.user, time_minutes=20, price="10.00")
+        create_recipe(self.user, time_minutes=45, price="4.00")
+        create_recipe(self.user, time_minutes=10, price="12.00")
+
+        res = self.client.get(
+            RECIPES_URL,
+            {"time_minutes_max": 20, "price_max": "10", "price_min": "5"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r["id"] for r in res.data["results"]], [edge.id, match.id]
+        )
+
+    def test_filter_by_invalid_range(self):
+        """Test bounds that aren't numbers are rejected"""
+        for params in [
+            {"price_min": "cheap"},
+            {"price_max": "NaN"},
+            {"time_minutes_max": "1.5"},
+        ]:
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(list(params)[0], res.data)
+
+    def test_ordering_pages_through_ties(self):
+        """Test each sort key pages in order, ties broken by id"""
+        for i in range(7):
+            create_recipe(
+                self.user,
+                title=f"Recipe {i % 3}",
+                time_minutes=i % 2,
+                price=Decimal(i % 3),
+            )
+
+        for ordering in ["price", "-price", "time_minutes", "-title"]:
+            field = ordering.lstrip("-")
+            res = self.client.get(
+                RECIPES_URL, {"ordering": ordering, "page_size": 2}
+            )
+            seen = [r["id"] for r in res.data["results"]]
+            while res.data["next"]:
+                self.assertIn(f"ordering={ordering}", res.data["next"])
+                res = self.client.get(res.data["next"])
+                seen += [r["id"] for r in res.data["results"]]
+
+            tiebreak = "-id" if ordering.startswith("-") else "id"
+            expected = Recipe.objects.filter(user=self.user).order_by(
+                ordering, tiebreak
+            )
+            self.assertEqual(seen, [r.id for r in expected], field)
+
+    def test_ordering_cursor_seeks_past_ties(self):
+        """Test pages of equal keys seek on (value, id), never an offset"""
+        ids = [
+            create_recipe(self.user, price=Decimal("5.00")).id
+            for _ in range(5)
+        ]
+
+        res = self.client.get(
+            RECIPES_URL, {"ordering": "price", "page_size": 2}
+        )
+        pages = [[r["id"] for r in res.data["results"]]]
+        while res.data["next"]:
+            cursor = parse_qs(urlparse(res.data["next"]).query)["cursor"][0]
+            self.assertNotIn("o=", b64decode(cursor).decode())
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(res.data["next"])
+            pages.append([r["id"] for r in res.data["results"]])
+        self.assertEqual(sum(pages, []), sorted(ids))
+        self.assertIn(
+            '("core_recipe"."price", "core_recipe"."id") >',
+            " ".join(query["sql"] for query in queries),
+        )
+
+        back = []
+        while res.data["previous"]:
+            res = self.client.get(res.data["previous"])
+            back.insert(0, [r["id"] for r in res.data["results"]])
+        self.assertEqual(back, pages[:-1])
+
+    def test_ordering_cursor_position_checked(self):
+        """Test positions not matching the ordering are rejected"""
+        for position in ["5.00", '["5.00"]', '["cheap", "1"]']:
+            cursor = b64encode(f"p={position}".encode()).decode()
+            res = self.client.get(
+                RECIPES_URL, {"ordering": "price", "cursor": cursor}
+            )
+
+            self.assertEqual(
+                res.status_code, status.HTTP_404_NOT_FOUND, position
+            )
+
+    def test_ordering_not_allowed(self):
+        """Test only the allowlisted fields can be sorted on"""
+        res = self.client.get(RECIPES_URL, {"ordering": "description"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("ordering", res.data)
+
+    def test_list_sparse_fields(self):
+        """Test ?fields= renders and reads only the named fields"""
+        create_recipe(self.user, title="Soup").tag.add(
+            Tag.objects.create(user=self.user, name="Vegan")
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                RECIPES_URL, {"fields": "id,title", "ordering": "price"}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(res.data["results"][0]), ["id", "title"])
+        sql = " ".join(query["sql"] for query in queries)
+        self.assertNotIn("description", sql)
+        self.assertNotIn("core_recipe_tag", sql)
+
+    def test_list_expand_description(self):
+        """Test ?expand=description adds it to the default fields"""
+        create_recipe(self.user, description="Slow cooked")
+
+        res = self.client.get(RECIPES_URL, {"expand": "description"})
+
+        self.assertEqual(
+            list(res.data["results"][0]),
+            [
+                "id",
+                "title",
+                "time_minutes",
+                "price",
+                "link",
+                "description",
+                "tags",
+            ],
+        )
+        self.assertEqual(res.data["results"][0]["description"], "Slow cooked")
+
+    def test_detail_sparse_fields(self):
+        """Test the detail view renders and reads only the named fields"""
+        recipe = create_recipe(self.user, description="Slow cooked")
+        url = create_url(recipe.id)
+        etag = self.client.get(url)["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, {"fields": "title,price"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {"title": recipe.title, "price": "5.50"})
+        self.assertNotEqual(res["ETag"], etag)
+        sql = " ".join(query["sql"] for query in queries)
+        self.assertNotIn("description", sql)
+
+    def test_unknown_fields_rejected(self):
+        """Test fields the serializer doesn't have are rejected"""
+        for params in [{"fields": "id,secret"}, {"expand": "title"}]:
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(list(params)[0], res.data)
+
+    def test_create_recipe_with_new_tags(self):
+        """Test creating a recipe creates its tags"""
+        payload = {
+            "title": "Thai Prawn Curry",
+            "time_minutes": 30,
+            "price": Decimal("2.50"),
+            "tags": [{"name": "Thai"}, {"name": "Dinner"}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.tag.count(), 2)
+        for tag in payload["tags"]:
+            self.assertTrue(
+                recipe.tag.filter(name=tag["name"], user=self.user).exists()
+            )
+
+    def test_create_recipe_with_existing_tags(self):
+        """Test existing tags are reused rather than duplicated"""
+        tag_indian = Tag.objects.create(user=self.user, name="Indian")
+        payload = {
+            "title": "Pongal",
+            "time_minutes": 60,
+            "price": Decimal("4.50"),
+            "tags": [{"name": "Indian"}, {"name": "Breakfast"}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertIn(tag_indian, recipe.tag.all())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_update_recipe_assigns_tags(self):
+        """Test updating tags replaces the recipe's tags"""
+        tag_breakfast = Tag.objects.create(user=self.user, name="Breakfast")
+        recipe = create_recipe(user=self.user)
+        recipe.tag.add(tag_breakfast)
+
+        payload = {"tags": [{"name": "Lunch"}]}
+        res = self.client.patch(create_url(recipe.id), payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t["name"] for t in res.data["tags"]], ["Lunch"])
+        self.assertNotIn(tag_breakfast, recipe.tag.all())
+
+    def test_clear_recipe_tags(self):
+        """Test an empty tag list removes every tag"""
+        recipe = create_recipe(user=self.user)
+        recipe.tag.add(Tag.objects.create(user=self.user, name="Dessert"))
+
+        payload = {"tags": []}
+        res = self.client.patch(create_url(recipe.id), payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(recipe.tag.count(), 0)
+
+    def test_list_query_count_constant(self):
+        """Test listing tagged recipes doesn't query per recipe"""
+        tags = [Tag.objects.create(user=self.user, name=f"T{i}")
+                for i in range(3)]
+
+        def count_list_queries():
+            caches[settings.API_CACHE_ALIAS].clear()
+            get_user_version(self.user.pk)
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(RECIPES_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        for _ in range(2):
+            create_recipe(self.user).tag.add(*tags)
+        few = count_list_queries()
+        for _ in range(10):
+            create_recipe(self.user).tag.add(*tags)
+        many = count_list_queries()
+
+        self.assertEqual(few, many)
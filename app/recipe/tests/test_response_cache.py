@@ -0,0 +1,183 @@
+"""
+Tests for the per-user recipe API response cache
+"""
+from decimal import Decimal
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+from core.db import router
+from recipe.cache import CachedResponseMixin, get_user_version
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+CACHE_STATS_URL = reverse("recipe:cache-stats")
+
+
+def create_recipe(user, **params):
+    """Helper to create and return a sample recipe"""
+    defaults = {
+        "title": "Sample recipe",
+        "time_minutes": 10,
+        "price": Decimal("2.50"),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+    """Tests for cached list and detail responses"""
+
+    def setUp(self):
+        caches[settings.API_CACHE_ALIAS].clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            password="TestPass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_repeated_list_is_served_from_cache(self):
+        """Test the second identical request skips query and serializer"""
+        create_recipe(self.user)
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res["X-Cache"], "MISS")
+
+        # Only the data version and conditional GET validator queries
+        # are left
+        with self.assertNumQueries(2):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["X-Cache"], "HIT")
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_query_params_are_part_of_key(self):
+        """Test different query strings are cached separately"""
+        create_recipe(self.user)
+        self.client.get(RECIPES_URL)
+        res = self.client.get(RECIPES_URL, {"page_size": 1})
+
+        self.assertEqual(res["X-Cache"], "MISS")
+
+    def test_recipe_write_invalidates(self):
+        """Test creating, updating and deleting recipes refreshes the list"""
+        self.client.get(RECIPES_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                RECIPES_URL,
+                {"title": "New", "time_minutes": 5, "price": Decimal("1.00")},
+            )
+        recipe_id = res.data["id"]
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(len(res.data["results"]), 1)
+
+        detail_url = reverse("recipe:recipe-detail", args=[recipe_id])
+        self.client.get(detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(detail_url, {"title": "Changed"})
+        res = self.client.get(detail_url)
+        self.assertEqual(res.data["title"], "Changed")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(detail_url)
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.data["results"], [])
+
+    def test_tag_write_invalidates(self):
+        """Test tag changes made outside the API refresh the tag list"""
+        self.client.get(TAGS_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name="Vegan")
+
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_other_users_writes_keep_cache(self):
+        """Test one user's writes don't invalidate another's entries"""
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            password="TestPass123",
+        )
+        self.client.get(RECIPES_URL)
+        create_recipe(other)
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res["X-Cache"], "HIT")
+
+    def test_cache_miss_reads_primary(self):
+        """Test cached entries are never built from replica reads"""
+        reads = []
+
+        def handler(request):
+            reads.append(router._reads.get())
+            return Response({"ok": True})
+
+        view = CachedResponseMixin()
+        view.action = "list"
+        request = Request(APIRequestFactory().get(RECIPES_URL))
+        request.user = self.user
+
+        with router.replica_reads():
+            view.cached_response(request, handler)
+            view.cached_response(request, handler)
+            self.assertTrue(router._reads.get())
+
+        self.assertEqual(reads, [False])
+
+    def test_version_bumped_after_commit(self):
+        """Test writes invalidate the cache only when they commit"""
+        version = get_user_version(self.user.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            create_recipe(self.user).tag.add(
+                Tag.objects.create(user=self.user, name="Vegan")
+            )
+            self.assertEqual(get_user_version(self.user.pk), version)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_user_version(self.user.pk), version)
+
+    def test_version_store_must_be_shared(self):
+        """Test several workers refuse a version store of their own"""
+        config = apps.get_app_config("recipe")
+        with override_settings(API_CACHE_VERSION_ALIAS="api"):
+            with override_settings(WEB_CONCURRENCY=1):
+                config.ready()
+            with override_settings(WEB_CONCURRENCY=2):
+                with self.assertRaises(ImproperlyConfigured):
+                    config.ready()
+
+    def test_cache_stats_admin_only(self):
+        """Test statistics are reported to staff only"""
+        res = self.client.get(CACHE_STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(res.data["responses"]["hits"], 1)
+        self.assertIn("evictions", res.data["store"])
+        self.assertIn("bytes", res.data["store"])
@@ -0,0 +1,98 @@
+"""
+Tests for full-text recipe search
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def create_recipe(user, **params):
+    """Helper to create and return a sample recipe"""
+    defaults = {
+        "title": "Sample recipe",
+        "time_minutes": 10,
+        "price": Decimal("2.50"),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeSearchAPITests(TestCase):
+    """Tests for ?search= on the recipe list"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            password="TestPass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_search_matches_title_and_description(self):
+        """Test recipes match on stemmed words in title or description"""
+        curry = create_recipe(self.user, title="Chickpea curry")
+        soup = create_recipe(
+            self.user, title="Soup", description="Uses leftover chickpeas"
+        )
+        create_recipe(self.user, title="Pancakes")
+
+        res = self.client.get(RECIPES_URL, {"search": "chickpea"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [r["id"] for r in res.data["results"]]
+        self.assertEqual(ids, [curry.id, soup.id])
+
+    def test_search_ranks_title_matches_first(self):
+        """Test a title match outranks a newer description match"""
+        title_match = create_recipe(self.user, title="Lentil stew")
+        create_recipe(self.user, title="Salad", description="Lentil salad")
+
+        res = self.client.get(RECIPES_URL, {"search": "lentil"})
+
+        self.assertEqual(res.data["results"][0]["id"], title_match.id)
+
+    def test_search_tracks_updates(self):
+        """Test the search document follows edits to the recipe"""
+        recipe = create_recipe(self.user, title="Plain rice")
+        recipe.title = "Fried noodles"
+        recipe.save()
+
+        res = self.client.get(RECIPES_URL, {"search": "noodles"})
+        self.assertEqual(len(res.data["results"]), 1)
+        res = self.client.get(RECIPES_URL, {"search": "rice"})
+        self.assertEqual(len(res.data["results"]), 0)
+
+    def test_search_limited_to_user(self):
+        """Test other users' recipes never match"""
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            password="TestPass123",
+        )
+        create_recipe(other, title="Secret tacos")
+
+        res = self.client.get(RECIPES_URL, {"search": "tacos"})
+
+        self.assertEqual(res.data["results"], [])
+
+    def test_search_results_paginate(self):
+        """Test relevance ordered results page through cursors"""
+        for i in range(5):
+            create_recipe(self.user, title=f"Bean dish {i}")
+
+        res = self.client.get(RECIPES_URL, {"search": "bean", "page_size": 2})
+        seen = [r["id"] for r in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            seen += [r["id"] for r in res.data["results"]]
+
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
@@ -0,0 +1,313 @@
+"""
+Tests for the recipe statistics and their endpoint
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import tasks
+from core.models import (
+    Recipe,
+    RecipeStats,
+    Tag,
+)
+from recipe import stats
+
+STATS_URL = reverse("recipe:recipe-stats")
+RECIPES_URL = reverse("recipe:recipe-list")
+BULK_URL = reverse("recipe:recipe-bulk")
+
+
+def create_recipe(user, **params):
+    """Helper to create and return a sample recipe"""
+    defaults = {
+        "title": "Sample recipe",
+        "time_minutes": 10,
+        "price": Decimal("2.50"),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def snapshot(user):
+    """Return the stored statistics and tag counts of a user"""
+    row = RecipeStats.objects.filter(user=user).values().first()
+    tags = dict(
+        Tag.objects.filter(user=user).values_list("name", "recipe_count")
+    )
+    return row, tags
+
+
+class RecipeStatsTests(TestCase):
+    """Tests for the incremental maintenance of the statistics"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            password="TestPass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        stats.get_stats(self.user.pk)
+
+    def assertConsistent(self):
+        """Assert the maintained statistics match a rebuild"""
+        maintained = snapshot(self.user)
+        stats.rebuild([self.user.pk])
+        self.assertEqual(maintained, snapshot(self.user))
+
+    def test_create_update_delete(self):
+        """Test saves and deletes of recipes are counted"""
+        first = create_recipe(self.user, price=Decimal("1.00"))
+        second = create_recipe(self.user, price=Decimal("9.00"))
+        create_recipe(self.user, time_minutes=30, price=Decimal("4.00"))
+        self.assertConsistent()
+
+        second.price = Decimal("3.00")
+        second.save()
+        self.assertConsistent()
+        self.assertEqual(
+            RecipeStats.objects.get(user=self.user).max_price,
+            Decimal("4.00"),
+        )
+
+        first.delete()
+        self.assertConsistent()
+        row = RecipeStats.objects.get(user=self.user)
+        self.assertEqual(row.recipe_count, 2)
+        self.assertEqual(row.min_price, Decimal("3.00"))
+
+    def test_update_of_other_fields_skips_statistics(self):
+        """Test saving only unrelated fields doesn't read the recipe"""
+        recipe = create_recipe(self.user)
+        recipe.title = "Renamed"
+        with self.assertNumQueries(1):
+            recipe.save(update_fields=["title"])
+
+    def test_tagging_is_counted(self):
+        """Test tags added, removed and cleared both ways are counted"""
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        quick = Tag.objects.create(user=self.user, name="Quick")
+        first = create_recipe(self.user)
+        second = create_recipe(self.user)
+
+        first.tag.add(vegan, quick)
+        first.tag.add(vegan)
+        vegan.recipe_set.add(second)
+        self.assertEqual(snapshot(self.user)[1], {"Vegan": 2, "Quick": 1})
+        self.assertConsistent()
+
+        first.tag.remove(vegan, Tag.objects.create(user=self.user, name="X"))
+        self.assertConsistent()
+        quick.recipe_set.clear()
+        self.assertConsistent()
+        second.tag.clear()
+        self.assertEqual(
+            snapshot(self.user)[1], {"Vegan": 0, "Quick": 0, "X": 0}
+        )
+        self.assertConsistent()
+
+    def test_deleted_recipe_untags(self):
+        """Test deleting a recipe uncounts its tags"""
+        recipe = create_recipe(self.user)
+        recipe.tag.add(Tag.objects.create(user=self.user, name="Vegan"))
+        recipe.delete()
+
+        self.assertEqual(snapshot(self.user)[1], {"Vegan": 0})
+        self.assertConsistent()
+
+    def test_api_writes(self):
+        """Test recipes written through the API are counted"""
+        res = self.client.post(
+            RECIPES_URL,
+            {
+                "title": "Soup",
+                "time_minutes": 20,
+                "price": "3.00",
+                "tags": [{"name": "Vegan"}],
+            },
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertConsistent()
+
+        url = reverse("recipe:recipe-detail", args=[res.data["id"]])
+        res = self.client.patch(
+            url, {"price": "5.00", "tags": [{"name": "Quick"}]}, format="json"
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(snapshot(self.user)[1], {"Vegan": 0, "Quick": 1})
+        self.assertConsistent()
+
+    def test_bulk_writes(self):
+        """Test the batched create, update and delete are counted"""
+        payload = [
+            {
+                "title": f"Recipe {i}",
+                "time_minutes": 5 + i,
+                "price": f"{i + 1}.00",
+                "tags": [{"name": "Bulk"}],
+            }
+            for i in range(4)
+        ]
+        res = self.client.post(BULK_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertConsistent()
+
+        ids = [recipe["id"] for recipe in res.data]
+        res = self.client.patch(
+            BULK_URL,
+            [
+                {"id": ids[0], "price": "7.50", "tags": []},
+                {"id": ids[3], "time_minutes": 1},
+            ],
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertConsistent()
+
+        res = self.client.delete(BULK_URL, {"ids": ids[1:]}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(snapshot(self.user)[1], {"Bulk": 3})
+        self.assertEqual(tasks.work(), 1)
+        self.assertEqual(snapshot(self.user)[1], {"Bulk": 0})
+        self.assertConsistent()
+
+    def test_deferred_rebuilds_once(self):
+        """Test changes inside deferred() are applied by one rebuild"""
+        with stats.deferred():
+            create_recipe(self.user, price=Decimal("6.00"))
+            create_recipe(self.user, price=Decimal("8.00"))
+            self.assertEqual(
+                RecipeStats.objects.get(user=self.user).recipe_count, 0
+            )
+
+        self.assertEqual(
+            RecipeStats.objects.get(user=self.user).recipe_count, 2
+        )
+        self.assertConsistent()
+
+    def test_user_deletion(self):
+        """Test a user with recipes and statistics can be deleted"""
+        create_recipe(self.user).tag.add(
+            Tag.objects.create(user=self.user, name="Vegan")
+        )
+        self.user.delete()
+
+        self.assertFalse(RecipeStats.objects.exists())
+
+
+class RecipeStatsApiTests(TestCase):
+    """Tests for the statistics endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            password="TestPass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        """Test the statistics aren't public"""
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_no_recipes(self):
+        """Test statistics of a user without recipes"""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.json(),
+            {
+                "recipe_count": 0,
+                "average_time_minutes": None,
+                "average_price": None,
+                "price_range": {"min": None, "max": None},
+                "tags": [],
+            },
+        )
+
+    def test_statistics(self):
+        """Test the user's recipes are summarised, not other users'"""
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            password="TestPass123",
+        )
+        create_recipe(other, price=Decimal("99.00"))
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        quick = Tag.objects.create(user=self.user, name="Quick")
+        Tag.objects.create(user=self.user, name="Unused")
+        create_recipe(self.user, time_minutes=10, price=Decimal("1.00"))
+        create_recipe(self.user, time_minutes=15, price=Decimal("2.00"))
+        create_recipe(
+            self.user, time_minutes=20, price=Decimal("4.00")
+        ).tag.add(vegan, quick)
+        Recipe.objects.filter(user=self.user).first().tag.add(vegan)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.json(),
+            {
+                "recipe_count": 3,
+                "average_time_minutes": 15.0,
+                "average_price": "2.33",
+                "price_range": {"min": "1.00", "max": "4.00"},
+                "tags": [
+                    {"id": vegan.id, "name": "Vegan", "recipe_count": 2},
+                    {"id": quick.id, "name": "Quick", "recipe_count": 1},
+                ],
+            },
+        )
+
+
+class RebuildRecipeStatsCommandTests(TestCase):
+    """Tests for the rebuild_recipe_stats command"""
+
+    def test_rebuild_repairs_drift(self):
+        """Test the command recomputes statistics of the given users"""
+        users = [
+            get_user_model().objects.create_user(
+                email=f"user{i}@example.com", password="TestPass123"
+            )
+            for i in range(3)
+        ]
+        for user in users:
+            create_recipe(user).tag.add(
+                Tag.objects.create(user=user, name="Vegan")
+            )
+            stats.get_stats(user.pk)
+        RecipeStats.objects.update(recipe_count=42)
+        Tag.objects.update(recipe_count=7)
+
+        out = StringIO()
+        call_command(
+            "rebuild_recipe_stats",
+            users=f"{users[0].pk},{users[1].pk}",
+            batch_size=1,
+            workers=1,
+            stdout=out,
+        )
+
+        self.assertIn("Rebuilt 2/2 users", out.getvalue())
+        self.assertEqual(
+            [stats.get_stats(user.pk).recipe_count for user in users],
+            [1, 1, 42],
+        )
+        self.assertEqual(
+            list(Tag.objects.order_by("user").values_list(
+                "recipe_count", flat=True
+            )),
+            [1, 1, 7],
+        )
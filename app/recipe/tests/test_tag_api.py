@@ -1,16 +1,25 @@
 """
 Tests for Tag API
 """
+from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.conf import settings
 from django.urls import reverse
 from django.test import TestCase
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from recipe.serializers import TagSerializer
-from core.models import Tag
+from recipe.serializers import (
+    TagSerializer,
+    TagValuesSerializer,
+)
+from core.models import (
+    Recipe,
+    Tag,
+)
 
 TAGS_URL = reverse("recipe:tag-list")
 
@@ -36,6 +45,7 @@ class PrivateTagAPITests(TestCase):
     """For tag api tests requiring auth"""
 
     def setUp(self):
+        caches[settings.API_CACHE_ALIAS].clear()
         self.user = create_user()
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
@@ -46,11 +56,23 @@ class PrivateTagAPITests(TestCase):
         Tag.objects.create(user=self.user, name="Dessert")
 
         res = self.client.get(TAGS_URL)
-        tags = Tag.objects.all().order_by("-name")
+        tags = Tag.objects.all().order_by("name")
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
+
+    def test_values_serializer_matches_tag_serializer(self):
+        """Test list rows render exactly like TagSerializer"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        Tag.objects.create(user=self.user, name="Dessert")
+        tags = Tag.objects.order_by("name")
+
+        fast = TagValuesSerializer(
+            tags.values(*TagValuesSerializer.Meta.fields), many=True
+        )
+
+        self.assertEqual(fast.data, TagSerializer(tags, many=True).data)
 
     def test_tag_limited_to_user(self):
         """Test tags list is only for user authenticated"""
@@ -60,6 +82,54 @@ class PrivateTagAPITests(TestCase):
 
         res = self.client.get(TAGS_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["name"], "Comfort Food")
-        self.assertEqual(res.data[0]["id"], tag.id)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["name"], "Comfort Food")
+        self.assertEqual(res.data["results"][0]["id"], tag.id)
+
+    def test_tags_paginated_by_name(self):
+        """Test tags are paged alphabetically through cursors"""
+        for name in ["Lunch", "Breakfast", "Dinner"]:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {"page_size": 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        names = [t["name"] for t in res.data["results"]]
+        self.assertEqual(names, ["Breakfast", "Dinner"])
+
+        res = self.client.get(res.data["next"])
+        names = [t["name"] for t in res.data["results"]]
+        self.assertEqual(names, ["Lunch"])
+        self.assertIsNone(res.data["next"])
+
+    def test_filter_assigned_only(self):
+        """Test assigned_only lists tags used by at least one recipe"""
+        used = Tag.objects.create(user=self.user, name="Breakfast")
+        Tag.objects.create(user=self.user, name="Unused")
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title="Eggs",
+            time_minutes=5,
+            price=Decimal("1.00"),
+        )
+        recipe.tag.add(used)
+
+        res = self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        self.assertEqual(
+            [t["id"] for t in res.data["results"]], [used.id]
+        )
+
+    def test_assigned_only_tags_unique(self):
+        """Test tags on several recipes are listed once"""
+        tag = Tag.objects.create(user=self.user, name="Dinner")
+        for title in ["Pasta", "Pizza"]:
+            Recipe.objects.create(
+                user=self.user,
+                title=title,
+                time_minutes=30,
+                price=Decimal("4.00"),
+            ).tag.add(tag)
+
+        res = self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        self.assertEqual(len(res.data["results"]), 1)
@@ -14,4 +14,6 @@ app_name = "recipe"
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("stats/", views.RecipeStatsView.as_view(), name="recipe-stats"),
+    path("cache/stats/", views.CacheStatsView.as_view(), name="cache-stats"),
 ]
@@ -1,57 +1,494 @@
 """
 Views for the recipe api
 """
+from decimal import Decimal
 
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+)
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import (
+    Count,
+    Exists,
+    F,
+    FloatField,
+    Max,
+    OuterRef,
+)
+from django.db.models.functions import Cast
+from django.http import StreamingHttpResponse
 from rest_framework import (
     viewsets,
     mixins,
+    status,
 )
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import (
+    IsAdminUser,
+    IsAuthenticated,
+)
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from recipe.conditional import (
+    ConditionalListMixin,
+    ConditionalRetrieveMixin,
+)
+from recipe.cache import (
+    CachedListMixin,
+    CachedRetrieveMixin,
+    bump_user_version,
+    get_cache_stats,
+)
+from recipe import images, stats, tasks
+from recipe.export import (
+    FORMATS,
+    iter_recipes,
+)
+from recipe.pagination import (
+    RecipeCursorPagination,
+    TagCursorPagination,
+)
 from recipe.serializers import (
-    RecipeSerializer,
     RecipeDetailSerializer,
+    RecipeImageSerializer,
+    RecipeStatsSerializer,
+    RecipeValuesSerializer,
     TagSerializer,
+    TagValuesSerializer,
+    field_columns,
+    select_fields,
+    tags_prefetch,
+)
+from user.authentication import CachedTokenAuthentication
+from core.views import (
+    AsyncViewSetMixin,
+    ReplicaReadMixin,
 )
 from core.models import (
     Recipe,
     Tag,
 )
 
+MAX_BULK_ITEMS = 5000
+# Filtered on with ?<field>_min= and ?<field>_max=
+RANGE_FIELDS = ("time_minutes", "price")
 
-class RecipeViewset(viewsets.ModelViewSet):
+
+def _as_id(value):
+    """Return value as a primary key or None if it isn't one"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _repeated(ids):
+    """Return the positions of ids already listed before them"""
+    seen = set()
+    repeated = set()
+    for index, pk in enumerate(ids):
+        if pk in seen:
+            repeated.add(index)
+        seen.add(pk)
+    return repeated
+
+
+class RecipeViewset(
+    AsyncViewSetMixin,
+    ReplicaReadMixin,
+    ConditionalListMixin,
+    ConditionalRetrieveMixin,
+    CachedListMixin,
+    CachedRetrieveMixin,
+    viewsets.ModelViewSet,
+):
     """Manages the recipe endpoints"""
 
     serializer_class = RecipeDetailSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    pagination_class = RecipeCursorPagination
+    throttle_scope = "recipes"
     queryset = Recipe.objects.all()
+    _fields = None
+
+    def _params_to_ints(self, name):
+        """Convert a comma separated list of ids into integers"""
+        value = self.request.query_params.get(name, "")
+        try:
+            return [int(str_id) for str_id in value.split(",") if str_id]
+        except ValueError:
+            raise ValidationError({name: ["Expected comma separated ids."]})
+
+    def _filter_tags(self, queryset):
+        """Filter on ?tags= with any (default) or all tags matching
+
+        Both modes are a single correlated EXISTS on the recipe-tag
+        table served by its (recipe_id, tag_id) unique index.
+        """
+        tag_ids = self._params_to_ints("tags")
+        if not tag_ids:
+            return queryset
+
+        tagged = Recipe.tag.through.objects.filter(
+            recipe_id=OuterRef("pk"), tag_id__in=tag_ids
+        )
+        match = self.request.query_params.get("tags_match", "any")
+        if match == "all":
+            tagged = (
+                tagged.values("recipe_id")
+                .annotate(matched=Count("tag_id"))
+                .filter(matched=len(set(tag_ids)))
+            )
+        elif match != "any":
+            raise ValidationError({"tags_match": ["Choose any or all."]})
+
+        return queryset.filter(Exists(tagged))
+
+    def _filter_ranges(self, queryset):
+        """Filter on the inclusive bounds given for RANGE_FIELDS"""
+        for field in RANGE_FIELDS:
+            for bound, lookup in (("min", "gte"), ("max", "lte")):
+                name = f"{field}_{bound}"
+                value = self.request.query_params.get(name)
+                if not value:
+                    continue
+                try:
+                    value = Recipe._meta.get_field(field).to_python(value)
+                except DjangoValidationError:
+                    value = None
+                if value is None or not Decimal(value).is_finite():
+                    raise ValidationError({name: ["Expected a number."]})
+                queryset = queryset.filter(**{f"{field}__{lookup}": value})
+        return queryset
+
+    def requested_fields(self):
+        """Return the fields to render, see select_fields()"""
+        if self._fields is None:
+            self._fields = select_fields(
+                self.request.query_params, self.get_serializer_class()
+            )
+        return self._fields
 
     def get_queryset(self):
         """Retrieve updates for the authenticated user"""
-        return self.queryset.filter(user=self.request.user).order_by("-id")
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action == "retrieve":
+            fields = self.requested_fields()
+            if "tags" in fields:
+                queryset = queryset.prefetch_related(tags_prefetch())
+            # Columns of fields left out, like description, aren't read
+            return queryset.only(*field_columns(fields)).order_by("-id")
+        if self.action in ("update", "partial_update"):
+            queryset = queryset.prefetch_related(tags_prefetch())
+        if self.action != "list":
+            return queryset.order_by("-id")
+
+        queryset = self._filter_ranges(self._filter_tags(queryset))
+        search = self.request.query_params.get("search")
+        if search:
+            # Matches through the GIN index on search_vector; results
+            # are paged by relevance unless ordered otherwise (see
+            # RecipeCursorPagination)
+            query = SearchQuery(
+                search, config="english", search_type="websearch"
+            )
+            # The real ts_rank() as double precision, whose text form
+            # compares back exactly when it's the cursor position
+            queryset = (
+                queryset.filter(search_vector=query)
+                .annotate(
+                    rank=Cast(
+                        SearchRank(F("search_vector"), query), FloatField()
+                    )
+                )
+                .order_by("-rank", "-id")
+            )
+        else:
+            queryset = queryset.order_by("-id")
+
+        # Rows for RecipeValuesSerializer, with the pagination keys
+        keys = [
+            key.lstrip("-")
+            for key in self.paginator.get_ordering(
+                self.request, queryset, self
+            )
+        ]
+        return queryset.values(
+            *field_columns(self.requested_fields(), *keys)
+        )
 
     def get_serializer_class(self):
         """Choose the serializer class for the request"""
         if self.action == "list":
-            return RecipeSerializer
+            return RecipeValuesSerializer
 
         return self.serializer_class
 
+    def get_serializer(self, *args, **kwargs):
+        """Render only the requested fields of read actions"""
+        if self.action in ("list", "retrieve"):
+            kwargs["fields"] = self.requested_fields()
+        return super().get_serializer(*args, **kwargs)
+
     def perform_create(self, serializer):
         """While creating the recipe"""
         serializer.save(user=self.request.user)
 
+    @action(methods=["POST", "PATCH", "DELETE"], detail=False)
+    def bulk(self, request):
+        """Create, update or delete many recipes in one transaction
+
+        POST and PATCH take a list of recipes (PATCH items carry their
+        id); DELETE takes {"ids": [...]}. Errors are reported per item
+        in the order they were sent and nothing is written unless every
+        item is valid.
+        """
+        if request.method == "DELETE":
+            return self._bulk_delete(request)
+
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {"non_field_errors": ["Expected a list of recipes."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > MAX_BULK_ITEMS:
+            return Response(
+                {
+                    "non_field_errors": [
+                        f"At most {MAX_BULK_ITEMS} recipes per request."
+                    ]
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if request.method == "POST":
+            serializer = self.get_serializer(data=items, many=True)
+            save_kwargs = {"user": request.user}
+            success = status.HTTP_201_CREATED
+        else:
+            instances, errors = self._bulk_instances(items)
+            if errors:
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            serializer = self.get_serializer(
+                instances, data=items, many=True, partial=True
+            )
+            save_kwargs = {}
+            success = status.HTTP_200_OK
+
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save(**save_kwargs)
+        bump_user_version(request.user.pk)
+
+        return Response(serializer.data, status=success)
+
+    @action(methods=["GET"], detail=False)
+    def export(self, request):
+        """Stream all of the user's recipes as NDJSON (default) or CSV
+
+        The file type is picked with ?type=ndjson|csv; "format" is
+        already taken by DRF's renderer override.
+        """
+        file_type = request.query_params.get("type", "ndjson")
+        if file_type not in FORMATS:
+            return Response(
+                {"type": [f"Choose one of {', '.join(FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        stream, content_type = FORMATS[file_type]
+        response = StreamingHttpResponse(
+            stream(iter_recipes(self.get_queryset())),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="recipes.{file_type}"'
+        )
+        return response
 
-class TagViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    @action(
+        methods=["POST"],
+        detail=True,
+        url_path="upload-image",
+        parser_classes=[MultiPartParser],
+    )
+    def upload_image(self, request, pk=None):
+        """Set the recipe's image from the multipart field "image"
+
+        The upload is streamed to disk in chunks and checked from its
+        header, then stored under its content hash. Thumbnails are made
+        by a task worker and listed once done.
+        """
+        recipe = self.get_object()
+        handler = images.HashingUploadHandler(request)
+        # Before request.FILES parses the body
+        request.upload_handlers = [handler]
+        upload = request.FILES.get("image")
+        if handler.too_large:
+            return Response(
+                {
+                    "image": [
+                        f"Images can be at most "
+                        f"{settings.RECIPE_IMAGE_MAX_SIZE} bytes."
+                    ]
+                },
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        if upload is None:
+            return Response(
+                {"image": ["No image was uploaded."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            image_format = images.inspect(upload)
+        except images.InvalidImage as exc:
+            return Response(
+                {"image": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        recipe.image = images.store(upload, image_format)
+        recipe.thumbnails = {}
+        with transaction.atomic():
+            recipe.save(update_fields=["image", "thumbnails", "updated_at"])
+            tasks.make_thumbnails.enqueue(recipe.pk, recipe.image.name)
+
+        return Response(
+            RecipeImageSerializer(recipe, context={"request": request}).data
+        )
+
+    def _bulk_instances(self, items):
+        """Return the user's recipes matching the item ids, in order"""
+        ids = [_as_id(item.get("id")) if isinstance(item, dict) else None
+               for item in items]
+        found = self.get_queryset().in_bulk(
+            [pk for pk in ids if pk is not None]
+        )
+
+        repeated = _repeated(ids)
+        errors = [
+            {"id": ["Recipe listed more than once."]} if index in repeated
+            else {} if pk in found
+            else {"id": ["Recipe not found."]}
+            for index, pk in enumerate(ids)
+        ]
+        if any(errors):
+            return None, errors
+        return [found[pk] for pk in ids], None
+
+    def _bulk_delete(self, request):
+        """Delete the user's recipes listed in ids"""
+        ids = request.data.get("ids") if hasattr(request.data, "get") else None
+        if isinstance(ids, list):
+            ids = [_as_id(pk) for pk in ids]
+        if not isinstance(ids, list) or None in ids:
+            return Response(
+                {"ids": ["Expected a list of recipe ids."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        repeated = _repeated(ids)
+        if repeated:
+            # Per position, like DRF reports the items of a ListField
+            return Response(
+                {
+                    "ids": {
+                        index: ["Recipe listed more than once."]
+                        for index in sorted(repeated)
+                    }
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Rebuilt once by a worker instead of updated per deleted recipe,
+        # queued in the same transaction as the deletion
+        with transaction.atomic(), stats.deferred(tasks.rebuild_stats.enqueue):
+            self.get_queryset().filter(id__in=ids).delete()
+        bump_user_version(request.user.pk)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TagViewSet(
+    AsyncViewSetMixin,
+    ReplicaReadMixin,
+    ConditionalListMixin,
+    CachedListMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
     """Tags endpoints for CRUD"""
 
     serializer_class = TagSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = TagCursorPagination
+    throttle_scope = "tags"
     queryset = Tag.objects.all()
 
     def get_queryset(self):
         """Return tags dependent on user and ordered"""
-        return self.queryset.filter(user=self.request.user).order_by("name")
+        queryset = self.queryset.filter(user=self.request.user)
+        if self._assigned_only():
+            # Served by the (tag_id, recipe_id) index on the through table
+            assigned = Recipe.tag.through.objects.filter(tag_id=OuterRef("pk"))
+            queryset = queryset.filter(Exists(assigned))
+
+        queryset = queryset.order_by("name")
+        if self.action == "list":
+            queryset = queryset.values(*TagValuesSerializer.Meta.fields)
+        return queryset
+
+    def _assigned_only(self):
+        return self.request.query_params.get("assigned_only") in ("1", "true")
+
+    def list_validator_parts(self, request):
+        """Add the user's tagging state, which ?assigned_only= depends on
+
+        Retagging a recipe only writes the through table. Its rows are
+        never updated, so the highest id and the count change with it.
+        """
+        if not self._assigned_only():
+            return []
+        summary = Recipe.tag.through.objects.filter(
+            tag__user=request.user
+        ).aggregate(latest=Max("id"), count=Count("id"))
+        return [summary["latest"], summary["count"]]
+
+    def get_serializer_class(self):
+        """Choose the serializer class for the request"""
+        if self.action == "list":
+            return TagValuesSerializer
+
+        return self.serializer_class
+
+
+class CacheStatsView(APIView):
+    """Reports response cache statistics for sizing the cache"""
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """Return hit rate, evictions and bytes held by this process"""
+        return Response(get_cache_stats())
+
+
+class RecipeStatsView(ReplicaReadMixin, APIView):
+    """Reports aggregates over the authenticated user's recipes"""
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_scope = "recipes"
+
+    def get(self, request):
+        """Return recipe count, averages, price range and tag counts"""
+        return Response(
+            RecipeStatsSerializer(stats.get_stats(request.user.pk)).data
+        )
@@ -0,0 +1,97 @@
+"""
+Authentication classes for the API
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core.instrumentation import timed
+
+
+def _user_fields():
+    """Return the cached user columns, all but the password hash"""
+    return [
+        field.attname
+        for field in get_user_model()._meta.concrete_fields
+        if field.attname != "password"
+    ]
+
+
+def _to_entry(user):
+    return {name: getattr(user, name) for name in _user_fields()}
+
+
+def _from_entry(entry):
+    """Return a user with the password deferred, loaded if accessed
+
+    Its database is the one save() writes to, so saving it only updates
+    the loaded columns rather than reloading and rewriting the rest.
+    """
+    model = get_user_model()
+    return model.from_db(
+        router.db_for_write(model), list(entry), list(entry.values())
+    )
+
+
+def _cache_key(key):
+    # Never store raw token keys in a (possibly shared) cache
+    return "auth-token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _token_caches():
+    """Return the in-process cache followed by the optional shared one"""
+    aliases = [settings.AUTH_TOKEN_CACHE_ALIAS]
+    if settings.AUTH_TOKEN_SHARED_CACHE_ALIAS:
+        aliases.append(settings.AUTH_TOKEN_SHARED_CACHE_ALIAS)
+    return [caches[alias] for alias in aliases]
+
+
+def invalidate_token(key):
+    """Forget the cached user of a token"""
+    for cache in _token_caches():
+        cache.delete(_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication with token -> user lookups cached
+
+    Lookups hit a bounded in-process LRU with a short TTL first, then the
+    optional shared cache, and only then the database. Entries hold the
+    user's columns but the password hash, which is loaded from the
+    database only if used. They are dropped when the token is deleted or
+    its user is saved (see user.signals); the TTL bounds staleness in
+    other processes.
+    """
+
+    def authenticate(self, request):
+        with timed("auth"):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        local, *shared = _token_caches()
+        entry = local.get(cache_key)
+        if entry is None and shared:
+            entry = shared[0].get(cache_key)
+            if entry is not None:
+                local.set(cache_key, entry)
+
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            entry = _to_entry(user)
+            for cache in (local, *shared):
+                cache.set(cache_key, entry)
+            return user, token
+
+        user = _from_entry(entry)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+        return user, self.get_model()(key=key, user=user)
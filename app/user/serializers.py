@@ -8,8 +8,10 @@ from django.contrib.auth import (
 from django.utils.translation import gettext as _tr
 from rest_framework import serializers
 
+from core.instrumentation import TimedSerializerMixin
 
-class UserSerializers(serializers.ModelSerializer):
+
+class UserSerializers(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for model serialization of the User"""
 
     class Meta:
@@ -23,7 +25,7 @@ class UserSerializers(serializers.ModelSerializer):
 
     def update(self, instance, validate_data):
         """Updat and return user"""
-        password = validate_data.pop("password")
+        password = validate_data.pop("password", None)
         user = super().update(instance, validate_data)
 
         if password:
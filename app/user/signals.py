@@ -0,0 +1,28 @@
+"""
+Signal handlers keeping the token authentication cache in step
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_token
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a token as soon as it is deleted"""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Drop cached copies of a user that changed or was deactivated"""
+    if created:
+        return
+    keys = Token.objects.filter(user=instance).values_list("key", flat=True)
+    for key in keys:
+        invalidate_token(key)
@@ -0,0 +1,114 @@
+"""
+Tests for the cached token authentication
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import _cache_key, _from_entry, _to_entry
+
+ME_URL = reverse("user:me")
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Tests for token lookups served from the cache"""
+
+    def setUp(self):
+        caches[settings.AUTH_TOKEN_CACHE_ALIAS].clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            password="TestPass123",
+            name="Test User",
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_second_request_skips_token_query(self):
+        """Test the token lookup only hits the database once"""
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["email"], self.user.email)
+
+    def test_password_hash_not_cached(self):
+        """Test cache entries leave out the password hash"""
+        self.client.get(ME_URL)
+
+        entry = caches[settings.AUTH_TOKEN_CACHE_ALIAS].get(
+            _cache_key(self.token.key)
+        )
+        self.assertEqual(entry["email"], self.user.email)
+        self.assertNotIn("password", entry)
+        self.assertNotIn(self.user.password, repr(entry))
+
+    def test_update_with_cached_user_keeps_password(self):
+        """Test saving a user rebuilt from the cache keeps its password"""
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {"name": "New Name"})
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, "New Name")
+        self.assertTrue(self.user.check_password("TestPass123"))
+
+    def test_cached_user_saves_loaded_fields_only(self):
+        """Test saving a cached user doesn't load or rewrite the hash"""
+        user = _from_entry(_to_entry(self.user))
+        user.name = "New Name"
+
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+
+        sql = " ".join(query["sql"] for query in queries)
+        self.assertIn('UPDATE "core_user"', sql)
+        self.assertNotIn("password", sql)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, "New Name")
+
+    def test_invalid_token_rejected(self):
+        """Test unknown tokens are still rejected"""
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """Test a cached token stops working once deleted"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a cached user stops authenticating once deactivated"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_refreshes_cached_user(self):
+        """Test changes made through the API are visible next request"""
+        self.client.get(ME_URL)
+        payload = {"name": "New Name", "password": "NewPass123"}
+        self.client.patch(ME_URL, payload)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data["name"], "New Name")
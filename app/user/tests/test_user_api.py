@@ -3,6 +3,8 @@ Tests for the User API
 """
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.conf import settings
 from django.urls import reverse
 
 from rest_framework.test import APIClient
@@ -22,6 +24,7 @@ class PublicUserApiTests(TestCase):
     """Tests for the public features of the User API"""
 
     def setUp(self):
+        caches[settings.RATE_LIMIT_CACHE_ALIAS].clear()
         self.client = APIClient()
 
     def test_user_create_success(self):
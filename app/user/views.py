@@ -1,9 +1,10 @@
 """
 Views for the User API
 """
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from user.authentication import CachedTokenAuthentication
 from user.serializers import (
     UserSerializers,
     AuthTokenSerializer,
@@ -14,6 +15,7 @@ class CreateUserView(generics.CreateAPIView):
     """Creating a User"""
 
     serializer_class = UserSerializers
+    throttle_scope = "user-create"
 
 
 class CreateAuthTokenView(ObtainAuthToken):
@@ -21,14 +23,18 @@ class CreateAuthTokenView(ObtainAuthToken):
 
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # Every attempt costs a password hash
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = "token"
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manages the authenticated user"""
 
     serializer_class = UserSerializers
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = "user"
 
     def get_object(self):
         """Retrieve and return the updated user"""